@@ -0,0 +1,119 @@
+"""Biomarker screening: evaluation cost, prompt size and report cache key spread.
+
+Generates ``--users`` synthetic users with ``--markers`` lab results each, most
+inside their reference range. It then reports:
+
+* the time to classify every reading, with :func:`classify_ranges` over columns
+  and with a plain Python loop over the same rows;
+* the time to screen one request's observation objects with :func:`flag_biomarkers`;
+* prompt tokens for the biomarker section with every marker listed against
+  only the out-of-range ones;
+* distinct report cache keys for one stack when keyed on raw values against
+  the bucketed state. Fewer keys means more hits.
+
+No provider is contacted.
+
+    python -m benchmarks.bench_biomarkers [--users 100000] [--markers 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import timeit
+from bisect import bisect_right
+from typing import List, Tuple
+
+import numpy as np
+
+from src.ai.biomarkers import _SEVERITY_EDGES, classify_ranges, flag_biomarkers
+from src.ai.cache import build_cache_key
+from src.ai.config import load_settings
+from src.ai.prompts import estimate_tokens
+from src.models import BiomarkerObservation, SupplementInteractionRequest
+
+PANEL = [
+    ("Vitamin D", "ng/mL", 30.0, 100.0), ("Ferritin", "ng/mL", 30.0, 400.0), ("Magnesium", "mg/dL", 1.7, 2.2),
+    ("Vitamin B12", "pg/mL", 200.0, 900.0), ("Zinc", "µg/dL", 60.0, 120.0), ("Copper", "µg/dL", 70.0, 140.0),
+    ("TSH", "mIU/L", 0.4, 4.0), ("LDL Cholesterol", "mg/dL", None, 100.0), ("HbA1c", "%", None, 5.7),
+    ("hs-CRP", "mg/L", None, 3.0), ("Folate", "ng/mL", 3.0, None), ("Homocysteine", "µmol/L", None, 15.0),
+]
+STACK = ["Vitamin D3 5000 IU", "Magnesium Glycinate 400 mg", "Zinc Picolinate 30 mg", "Fish Oil 1000 mg"]
+
+
+def _columns(users: int, markers: int, seed: int):
+    rng = np.random.default_rng(seed)
+    panel = [PANEL[index % len(PANEL)] for index in range(markers)]
+    lows = np.tile(np.array([np.nan if low is None else low for _, _, low, _ in panel]), users)
+    highs = np.tile(np.array([np.nan if high is None else high for _, _, _, high in panel]), users)
+    # Readings centred in the range (or near the open bound) with enough spread that ~15 % fall outside.
+    centre = np.where(np.isnan(lows), highs * 0.7, np.where(np.isnan(highs), lows * 1.6, (lows + highs) / 2))
+    width = np.where(np.isnan(lows) | np.isnan(highs), centre * 0.3, (highs - lows) * 0.35)
+    values = np.abs(rng.normal(centre, width))
+    return panel, values, lows, highs
+
+
+def _python_loop(values: List[float], lows: List[float], highs: List[float]) -> List[Tuple[int, int]]:
+    """The same rules as :func:`classify_ranges`, one reading at a time."""
+
+    results = []
+    for value, low, high in zip(values, lows, highs):
+        if value < low:
+            results.append((-1, bisect_right(_SEVERITY_EDGES, (low - value) / (abs(low) or 1.0))))
+        elif value > high:
+            results.append((1, bisect_right(_SEVERITY_EDGES, (value - high) / (abs(high) or 1.0))))
+        else:
+            results.append((0, 0))
+    return results
+
+
+def _observations(panel, values) -> List[BiomarkerObservation]:
+    return [
+        BiomarkerObservation(name=name, value=float(value), unit=unit, reference_min=low, reference_max=high)
+        for (name, unit, low, high), value in zip(panel, values)
+    ]
+
+
+def run(users: int, markers: int, seed: int) -> None:
+    panel, values, lows, highs = _columns(users, markers, seed)
+    readings = users * markers
+    vectorized = min(timeit.repeat(lambda: classify_ranges(values, lows, highs), number=1, repeat=3))
+    rows = values.tolist(), lows.tolist(), highs.tolist()
+    looped = min(timeit.repeat(lambda: _python_loop(*rows), number=1, repeat=3))
+    directions, _ = classify_ranges(values, lows, highs)
+    print(f"{users} users x {markers} markers = {readings} readings, {np.count_nonzero(directions) / readings:.1%} "
+          f"out of range")
+    print(f"classify_ranges (NumPy)  {vectorized * 1000:8.1f} ms  ({vectorized / readings * 1e9:.1f} ns/reading)")
+    print(f"Python loop, same rows   {looped * 1000:8.1f} ms  ({looped / readings * 1e9:.1f} ns/reading)")
+
+    sample = [_observations(panel, values[user * markers : (user + 1) * markers]) for user in range(min(users, 2000))]
+    per_request = min(timeit.repeat(lambda: [flag_biomarkers(user) for user in sample], number=1, repeat=3))
+    print(f"flag_biomarkers          {per_request / len(sample) * 1e6:8.1f} µs per request")
+
+    every = sum(estimate_tokens("".join(f"- {o.name}: {o.value:.1f} {o.unit}\n" for o in user)) for user in sample)
+    flagged = sum(estimate_tokens("".join(f"- {flag.label}\n" for flag in flag_biomarkers(user))) for user in sample)
+    print(f"\nbiomarker prompt tokens per request: every marker {every / len(sample):.0f}, "
+          f"out-of-range only {flagged / len(sample):.0f}")
+
+    settings = load_settings()
+    raw_keys, bucketed_keys = set(), set()
+    for user in sample:
+        request = SupplementInteractionRequest(supplements=STACK, biomarkers=user)
+        raw_keys.add(hashlib.sha256(repr([(o.name, o.value) for o in user]).encode()).hexdigest())
+        bucketed_keys.add(build_cache_key(request, settings))
+    print(f"distinct cache keys for {len(sample)} users with the same stack: raw values {len(raw_keys)}, "
+          f"bucketed state {len(bucketed_keys)} (buckets at {', '.join(f'{edge:.0%}' for edge in _SEVERITY_EDGES)} "
+          f"past the bound)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--markers", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.users, args.markers, args.seed)
+
+
+if __name__ == "__main__":
+    main()
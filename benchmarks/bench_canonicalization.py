@@ -0,0 +1,92 @@
+"""Supplement name canonicalization: lookup latency and report cache key collapse.
+
+Times :class:`src.ai.canonicalization.Canonicalizer` per kind of match, cold and
+memoized. Then it generates stacks from groups of spellings of the same product,
+as users type them, and counts the distinct report cache keys with raw names
+(before) against canonical names (now). Fewer distinct keys means more hits
+for the same traffic. No provider is contacted.
+
+    python -m benchmarks.bench_canonicalization [--stacks 5000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import timeit
+from typing import List
+
+from src.ai.cache import build_cache_key
+from src.ai.canonicalization import Canonicalizer, canonical_labels
+from src.ai.config import load_settings
+from src.models import SupplementInteractionRequest
+
+# Each group is one product as different users spell it.
+VARIANTS: List[List[str]] = [
+    ["Vitamin D3", "Vit D3", "vitamin d3", "cholecalciferol", "Vitamin D-3", "vitamn d3", "D3"],
+    ["Vitamin D3 5000 IU", "Vitamin D3 5000IU", "vit d3 5,000 iu", "Cholecalciferol 5000 IU softgels"],
+    ["Magnesium Glycinate", "magnesium glycinate", "Mag Glycinate", "Mg glycinate", "magnesium glycinat"],
+    ["Magnesium Glycinate 400mg", "magnesium glycinate 400 mg", "Magnesium Glycinate 0.4 g"],
+    ["Zinc Picolinate 30 mg", "zinc picolinate 30mg", "NOW Zinc Picolinate 30 mg", "Zn picolinate 30 mg"],
+    ["Fish Oil", "fish oil", "Omega-3", "omega 3", "EPA/DHA", "Omega3 capsules"],
+    ["Vitamin B12", "B12", "Vitamin B-12", "vit b12", "Cobalamin"],
+    ["Coenzyme Q10", "CoQ10", "Co-Q10", "coq10", "Ubiquinone"],
+    ["Ashwagandha", "ashwagandha", "KSM-66", "Ashwaganda", "Withania somnifera"],
+    ["Turmeric", "turmeric", "Turmeric Extract", "Organic Turmeric Root"],
+    ["L-Theanine", "l-theanine", "L Theanine", "Theanine"],
+    ["Iron Bisglycinate", "iron bisglycinate", "Ferrous Bisglycinate", "ferrochel"],
+]
+
+TIMED = {
+    "exact": "Vitamin D3 5,000 IU softgels",
+    "fuzzy": "magnesum glycinate",
+    "partial": "NOW Foods Zinc Picolinate 50 mg",
+    "unknown": "Tongkat Ali 400 mg",
+}
+
+
+def _time_lookups(canonicalizer: Canonicalizer) -> None:
+    print(f"{'match':<9} {'name':<34} {'cold µs':>9} {'memo µs':>9}  canonical")
+    for kind, name in TIMED.items():
+        cold = min(timeit.repeat(lambda: canonicalizer._resolve(name), number=200, repeat=3)) / 200
+        canonicalizer.canonicalize(name)
+        memo = min(timeit.repeat(lambda: canonicalizer.canonicalize(name), number=20000, repeat=3)) / 20000
+        result = canonicalizer.canonicalize(name)
+        assert result.match.value == kind, (name, result)
+        print(f"{kind:<9} {name:<34} {cold * 1e6:9.1f} {memo * 1e6:9.2f}  {result.label}")
+
+
+def _key_collapse(canonicalizer: Canonicalizer, stacks: int, seed: int) -> None:
+    settings = load_settings()
+    rng = random.Random(seed)
+    raw_keys, canonical_keys = set(), set()
+    for _ in range(stacks):
+        groups = rng.sample(VARIANTS, rng.randint(2, 4))
+        supplements = [rng.choice(group) for group in groups]
+        # Before, the key folded only case and whitespace.
+        raw_keys.add(frozenset(" ".join(name.split()).casefold() for name in supplements))
+        labels = canonical_labels(canonicalizer.canonicalize_stack(supplements))
+        canonical_keys.add(build_cache_key(SupplementInteractionRequest(supplements=labels), settings))
+
+    print()
+    print(f"stacks generated                {stacks}")
+    print(f"distinct cache keys, raw names  {len(raw_keys)}  (hit rate at best {1 - len(raw_keys) / stacks:.1%})")
+    print(f"distinct cache keys, canonical  {len(canonical_keys)}  "
+          f"(hit rate at best {1 - len(canonical_keys) / stacks:.1%})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stacks", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    canonicalizer = Canonicalizer.load()
+    build = min(timeit.repeat(Canonicalizer.load, number=1, repeat=3))
+    print(f"index build {build * 1000:.1f} ms for {len(canonicalizer)} synonyms\n")
+    _time_lookups(canonicalizer)
+    _key_collapse(canonicalizer, args.stacks, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Cost of a one-supplement stack edit: full re-analysis against an incremental update.
+
+Builds a previous report for a stack of ``--stack`` supplements with one
+conflict or synergy per pair and one depletion, optimization and dosage warning
+per supplement. Then it swaps one supplement for another. Before, the edit re-ran
+the monolithic prompt for the whole new stack. Now only the units involving the
+added supplement are generated, in parallel, and the rest is merged locally.
+
+Token counts are estimates (about four characters per token). Latency uses a
+simple decode model: time to first token plus completion tokens over the decode
+rate, with unit calls running ``PAIRWISE_MAX_CONCURRENCY`` at a time. The local
+merge is timed for real. No provider is contacted.
+
+    python -m benchmarks.bench_incremental [--stack 8] [--ttft 0.4] [--decode-tps 60]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import timeit
+from typing import Dict, List
+
+from pydantic import BaseModel
+
+from src.ai.config import load_settings
+from src.ai.findings import PairFindings, SupplementFindings
+from src.ai.incremental import apply_edit, plan_edit, plan_update_units
+from src.ai.pairwise import PAIR_UNIT, SOURCE_MODEL, AnalysisUnit, merge_findings, plan_units
+from src.ai.prompts import build_interaction_prompt, estimate_tokens
+from src.models import SupplementInteractionRequest
+
+NAMES = [
+    "Zinc Picolinate 30 mg", "Magnesium Glycinate 400 mg", "Vitamin D3 5000 IU", "Fish Oil 1000 mg",
+    "Iron Bisglycinate 25 mg", "Vitamin C 500 mg", "Ashwagandha 600 mg", "Coenzyme Q10 100 mg",
+    "Curcumin 500 mg", "Vitamin B12 1000 mcg", "L-Theanine 200 mg", "Creatine Monohydrate 5000 mg",
+]
+ADDED = "Berberine 500 mg"
+
+
+def _pair_findings(first: str, second: str, index: int) -> PairFindings:
+    detail = {
+        "supplements": [first, second],
+        "mechanism": f"{first} and {second} share an intestinal transport pathway and compete for uptake "
+        "when taken together in the same meal.",
+        "evidence_level": "moderate",
+    }
+    if index % 2:
+        return PairFindings(synergies=[{**detail, "category": "absorption"}])
+    return PairFindings(conflicts=[{
+        **detail,
+        "severity": "moderate",
+        "management_strategy": "temporal_separation",
+        "management_instruction": f"Take {first} and {second} at least two hours apart.",
+    }])
+
+
+def _supplement_findings(name: str) -> SupplementFindings:
+    return SupplementFindings(
+        depletions=[{
+            "offending_supplement": name,
+            "depleted_nutrient": "copper",
+            "mechanism": f"Long-term {name} intake lowers copper absorption through metallothionein induction.",
+            "severity": "low",
+            "recommendation": "Check copper status yearly when supplementing long term.",
+        }],
+        optimizations=[{
+            "supplement": name,
+            "suggested_form": f"chelated {name}",
+            "rationale": "Chelated forms are better absorbed and cause less stomach upset.",
+        }],
+        dosage_warnings=[{"supplement": name, "warning": f"Stay below the tolerable upper intake level for {name}."}],
+    )
+
+
+def _findings(units: List[AnalysisUnit]) -> Dict[AnalysisUnit, BaseModel]:
+    findings: Dict[AnalysisUnit, BaseModel] = {}
+    for index, unit in enumerate(units):
+        if unit.kind == PAIR_UNIT:
+            findings[unit] = _pair_findings(*unit.supplements, index)
+        else:
+            findings[unit] = _supplement_findings(unit.supplements[0])
+    return findings
+
+
+def _latency(completion_tokens: int, ttft: float, decode_tps: float) -> float:
+    return ttft + completion_tokens / decode_tps
+
+
+def run(stack_size: int, ttft: float, decode_tps: float) -> None:
+    settings = load_settings()
+    system_tokens = estimate_tokens(settings.system_prompt)
+    previous_stack = NAMES[:stack_size]
+    previous = merge_findings(previous_stack, _findings(plan_units(previous_stack)))
+
+    edit = plan_edit(previous_stack, [ADDED], [previous_stack[0]])
+    units = plan_update_units(edit)
+    fresh = _findings(units)
+    sources = dict.fromkeys(units, SOURCE_MODEL)
+
+    # Before: the whole new stack through the monolithic prompt.
+    full_report = merge_findings(edit.supplements, _findings(plan_units(edit.supplements)))
+    full_prompt = system_tokens + estimate_tokens(
+        build_interaction_prompt(SupplementInteractionRequest(supplements=edit.supplements))
+    )
+    full_completion = estimate_tokens(full_report.model_dump_json())
+    full_seconds = _latency(full_completion, ttft, decode_tps)
+
+    # Now: one small call per new unit, PAIRWISE_MAX_CONCURRENCY at a time.
+    unit_prompt = sum(system_tokens + estimate_tokens(unit.prompt()) for unit in units)
+    unit_completions = [estimate_tokens(fresh[unit].model_dump_json()) for unit in units]
+    waves = math.ceil(len(units) / settings.pairwise_max_concurrency)
+    unit_seconds = waves * _latency(max(unit_completions), ttft, decode_tps)
+    merge_seconds = min(
+        timeit.repeat(lambda: apply_edit(previous, edit, units, fresh, sources), number=50, repeat=3)
+    ) / 50
+
+    report = apply_edit(previous, edit, units, fresh, sources)
+    print(f"stack {stack_size} -> swap {previous_stack[0]!r} for {ADDED!r}")
+    print(f"previous entries kept / dropped   {report.meta['incremental']['kept']} / "
+          f"{report.meta['incremental']['dropped']}")
+    print()
+    print(f"{'':24} {'calls':>6} {'prompt tok':>11} {'output tok':>11} {'latency s':>10}")
+    print(f"{'full re-analysis':24} {1:6} {full_prompt:11} {full_completion:11} {full_seconds:10.2f}")
+    print(f"{'incremental update':24} {len(units):6} {unit_prompt:11} {sum(unit_completions):11} "
+          f"{unit_seconds + merge_seconds:10.2f}")
+    print()
+    print(f"local merge {merge_seconds * 1000:.2f} ms; output tokens {full_completion / sum(unit_completions):.1f}x "
+          f"fewer, latency {full_seconds / (unit_seconds + merge_seconds):.1f}x lower")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stack", type=int, default=8, choices=range(2, len(NAMES) + 1), metavar="N")
+    parser.add_argument("--ttft", type=float, default=0.4, help="Seconds to first token per call.")
+    parser.add_argument("--decode-tps", type=float, default=60.0, help="Generated tokens per second per call.")
+    args = parser.parse_args()
+    run(args.stack, args.ttft, args.decode_tps)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Insight analytics over a synthetic cohort: vectorized engine against a per-user loop.
+
+Generates ``--users`` users with up to 8 supplements, ``--days`` days of
+adherence (with random lapses) and 6 lab results for each of 6 biomarkers.
+Some users respond to a supplement, so that marker follows their adherence over
+the previous two weeks. It then reports:
+
+* the time :func:`analyse_cohort` takes for every user, against the same
+  streak, correlation and lab rules in plain Python on ``--reference-users``
+  users, extrapolated;
+* the time to build one user's ``Insight`` list and ``VitalityScore``;
+* how many planted responders got a confident correlation, and how many
+  confident correlations point at a pair with no effect planted;
+* prompt tokens per user when the model only rewords the top findings,
+  against the raw series a model would need to find them itself.
+
+No provider is contacted. ``--save`` also writes the cohort in the format
+``python -m src.services.insights`` reads.
+
+    python -m benchmarks.bench_insights [--users 100000] [--days 90] [--save cohort.npz]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from src.ai.analytics import (
+    DEFAULT_WINDOW,
+    MIN_OBSERVATIONS,
+    CohortSeries,
+    analyse_cohort,
+    top_insights,
+    vitality_score,
+)
+from src.ai.prompts import INSIGHT_PROMPT_PREFIX, build_insight_prompt, estimate_tokens
+
+SUPPLEMENTS = (
+    "Vitamin D3", "Magnesium Glycinate", "Iron Bisglycinate", "Vitamin B12", "Zinc Picolinate", "Fish Oil",
+    "Folate", "Coenzyme Q10",
+)
+# Biomarker, reference range and how far a fully adherent responder moves from their baseline.
+# Marker i responds to supplement i.
+BIOMARKERS = (
+    ("Vitamin D", 30.0, 100.0, 25.0), ("Magnesium", 1.7, 2.2, 0.3), ("Ferritin", 30.0, 400.0, 40.0),
+    ("Vitamin B12", 200.0, 900.0, 250.0), ("Zinc", 60.0, 120.0, 20.0), ("Omega-3 Index", 8.0, float("nan"), 3.0),
+)
+RESULTS = 6
+
+
+def synthetic_cohort(users: int, days: int, seed: int) -> Tuple[CohortSeries, Any]:
+    """A cohort and a ``(users, markers)`` mask of the responders planted in it."""
+
+    rng = np.random.default_rng(seed)
+    supplements, markers = len(SUPPLEMENTS), len(BIOMARKERS)
+    on_stack = rng.random((users, supplements)) < 0.45
+    propensity = rng.beta(8, 2, (users, supplements, 1))
+    adherence = (rng.random((users, supplements, days)) < propensity) & on_stack[..., None]
+    # One lapse of 10-30 days for most supplements gives exposure something to vary over.
+    lapse_start = rng.integers(0, days, (users, supplements, 1))
+    lapse_length = np.where(rng.random((users, supplements, 1)) < 0.7, rng.integers(10, 31, (users, supplements, 1)), 0)
+    day = np.arange(days)
+    adherence &= ~((day >= lapse_start) & (day < lapse_start + lapse_length))
+
+    spacing = days / RESULTS
+    lab_days = (np.arange(RESULTS) * spacing + rng.uniform(0, spacing, (users, markers, RESULTS))).astype(np.int32)
+    taken = np.concatenate([np.zeros((users, markers, 1)), adherence[:, :markers].cumsum(-1)], axis=-1)
+    begin = np.maximum(lab_days + 1 - DEFAULT_WINDOW, 0)
+    exposure = (np.take_along_axis(taken, lab_days + 1, -1) - np.take_along_axis(taken, begin, -1)) / (
+        lab_days + 1 - begin
+    )
+
+    lows = np.array([low for _, low, _, _ in BIOMARKERS])
+    highs = np.array([high for _, _, high, _ in BIOMARKERS])
+    effects = np.array([effect for _, _, _, effect in BIOMARKERS])
+    baseline = lows * rng.uniform(0.7, 1.6, (users, markers))
+    responders = on_stack[:, :markers] & (rng.random((users, markers)) < 0.5)
+    lab_values = (
+        baseline[..., None]
+        + (responders * effects)[..., None] * exposure
+        + rng.normal(0, 1, (users, markers, RESULTS)) * (effects * 0.1)[:, None]
+    )
+    lab_values[rng.random(lab_values.shape) < 0.1] = np.nan
+
+    series = CohortSeries(
+        supplements=SUPPLEMENTS,
+        biomarkers=tuple(name for name, _, _, _ in BIOMARKERS),
+        on_stack=on_stack,
+        adherence=adherence,
+        lab_values=lab_values,
+        lab_days=lab_days,
+        reference_min=lows,
+        reference_max=highs,
+    )
+    return series, responders
+
+
+def _python_user(series: CohortSeries, user: int) -> Dict[str, Any]:
+    """The engine's streak, correlation and latest-result rules for one user, one value at a time."""
+
+    stack = [index for index, active in enumerate(series.on_stack[user]) if active]
+    adherence = series.adherence[user].tolist()
+    days = len(adherence[0])
+    full = [bool(stack) and all(adherence[index][day] for index in stack) for day in range(days)]
+    current = next((count for count, taken in enumerate(reversed(full)) if not taken), days)
+    longest = run = 0
+    for taken in full:
+        run = run + 1 if taken else 0
+        longest = max(longest, run)
+
+    correlations: Dict[Tuple[int, int], float] = {}
+    latest: List[float] = []
+    for marker, (values, lab_days) in enumerate(zip(series.lab_values[user].tolist(), series.lab_days[user].tolist())):
+        results = [(day, value) for day, value in zip(lab_days, values) if value == value]
+        latest.append(max(results)[1] if results else float("nan"))
+        if len(results) < MIN_OBSERVATIONS:
+            continue
+        for index in stack:
+            exposure = []
+            for day, _ in results:
+                begin = max(day + 1 - DEFAULT_WINDOW, 0)
+                exposure.append(sum(adherence[index][begin : day + 1]) / (day + 1 - begin))
+            try:
+                correlations[index, marker] = statistics.correlation(exposure, [value for _, value in results])
+            except statistics.StatisticsError:
+                continue
+    return {"current": current, "longest": longest, "correlations": correlations, "latest": latest}
+
+
+def _raw_series_prompt(series: CohortSeries, user: int) -> str:
+    """What a prompt asking the model to find the insights itself would have to carry."""
+
+    lines = [
+        f"- {name}: " + "".join("1" if taken else "0" for taken in series.adherence[user, index])
+        for index, name in enumerate(series.supplements)
+        if series.on_stack[user, index]
+    ]
+    for marker, name in enumerate(series.biomarkers):
+        results = zip(series.lab_days[user, marker], series.lab_values[user, marker])
+        lines.append(f"- {name}: " + ", ".join(f"day {day}: {value:.1f}" for day, value in results if value == value))
+    return "\n".join(lines)
+
+
+def run(users: int, days: int, reference_users: int, seed: int, save: str) -> None:
+    series, responders = synthetic_cohort(users, days, seed)
+    if save:
+        np.savez_compressed(save, users=np.array([f"user-{index}" for index in range(users)]), **vars(series))
+        print(f"cohort written to {save}")
+
+    started = time.perf_counter()
+    analytics = analyse_cohort(series)
+    vectorized = time.perf_counter() - started
+    sample = range(min(reference_users, users))
+    started = time.perf_counter()
+    for user in sample:
+        _python_user(series, user)
+    looped = (time.perf_counter() - started) / len(sample)
+    print(f"{users} users x {len(SUPPLEMENTS)} supplements x {days} days, "
+          f"{len(BIOMARKERS)} markers x {RESULTS} results")
+    print(f"analyse_cohort (NumPy)     {vectorized:8.2f} s   ({vectorized / users * 1e6:7.1f} µs/user)")
+    print(f"Python loop, same rules    {looped * users:8.2f} s   ({looped * 1e6:7.1f} µs/user, "
+          f"{len(sample)} users extrapolated)")
+
+    started = time.perf_counter()
+    insights = [top_insights(analytics, user) for user in sample]
+    scores = [vitality_score(analytics, user) for user in sample]
+    building = (time.perf_counter() - started) / len(sample)
+    print(f"top_insights + vitality_score      {building * 1e6:7.1f} µs/user")
+
+    markers = len(BIOMARKERS)
+    planted = np.zeros(analytics.correlation.shape, dtype=bool)
+    planted[:, np.arange(markers), np.arange(markers)] = responders
+    confident = analytics.confidence >= 0.9
+    found = (confident & planted & (analytics.correlation > 0)).sum()
+    spurious = (confident & ~planted).sum()
+    print(f"\nplanted responders with a confident correlation: {found / planted.sum():.1%} of {planted.sum()}; "
+          f"confident correlations without an effect planted: {spurious} ({spurious / users:.3f} per user)")
+    levels = statistics.mode(score.level for score in scores)
+    print(f"mean vitality score {analytics.vitality.mean():.1f}, most common level {levels}")
+
+    phrased = [estimate_tokens(build_insight_prompt([(i.title, i.content) for i in user])) for user in insights if user]
+    raw = [estimate_tokens(_raw_series_prompt(series, user)) for user in sample]
+    print(f"\nmodel calls: none for the analysis; one per user with findings ({len(phrased)} of {len(sample)}) "
+          f"to reword them, {np.mean(phrased):.0f} prompt tokens each, {estimate_tokens(INSIGHT_PROMPT_PREFIX)} "
+          f"of them a cacheable prefix")
+    print(f"the raw series alone, for a model to analyse itself: {np.mean(raw):.0f} tokens per user, "
+          f"before any instructions")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--reference-users", type=int, default=2000, help="Users timed with the Python loop.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--save", default="", help="Also write the cohort to this .npz file.")
+    args = parser.parse_args()
+    run(args.users, args.days, args.reference_users, args.seed, args.save)
+
+
+if __name__ == "__main__":
+    main()
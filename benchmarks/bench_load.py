@@ -0,0 +1,192 @@
+"""End-to-end load test of ``POST /generate-interactions`` at several concurrency levels.
+
+By default the API runs in this process (through ``httpx.ASGITransport``, with
+the application lifespan) against a fake provider: the OpenAI-compatible
+:class:`~benchmarks.fake_provider.FakeProvider`, or with ``--provider bedrock``
+the :class:`~benchmarks.fake_provider.FakeBedrockClient` stub. The report cache
+and the knowledge base are off unless enabled in the environment, so every
+request reaches the provider. With ``--url`` the load goes to a running server
+instead, e.g. one started with ``LOCAL_API_BASE`` pointing at
+``python -m benchmarks.fake_provider``.
+
+For each level, ``--requests`` requests with random stacks are sent by that
+many concurrent workers. Throughput, error rate and p50/p95/p99 latency are
+printed; ``--output`` saves them as JSON and ``--compare`` prints the change
+against an earlier run.
+
+    python -m benchmarks.bench_load --concurrency 1,8,32,64 --requests 400 --output before.json
+    python -m benchmarks.bench_load --concurrency 1,8,32,64 --requests 400 --compare before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_provider import FakeBedrockClient, FakeProvider, FakeProviderProfile
+from benchmarks.results import load_results, percentiles, print_comparison, save_results
+
+NAMES = [
+    "Zinc Picolinate 30 mg", "Copper Bisglycinate 2 mg", "Magnesium Glycinate 400 mg", "Vitamin D3 5000 IU",
+    "Vitamin K2 MK-7 100 mcg", "Fish Oil 1000 mg", "Iron Bisglycinate 25 mg", "Vitamin C 500 mg",
+    "Calcium Citrate 500 mg", "Ashwagandha 600 mg", "Coenzyme Q10 100 mg", "Curcumin 500 mg",
+    "Vitamin B12 1000 mcg", "L-Theanine 200 mg", "Creatine Monohydrate 5000 mg", "Berberine 500 mg",
+    "Green Tea Extract 500 mg", "Ginkgo Biloba 120 mg", "Melatonin 3 mg", "Probiotic 10 billion CFU",
+]
+
+# Environment for the in-process API; variables already set in the shell take precedence.
+_IN_PROCESS_DEFAULTS = {
+    "REPORT_CACHE_BACKEND": "none",
+    "KNOWLEDGE_BASE_ENABLED": "false",
+    "WARMUP_COMPLETION": "false",
+    "LLM_HTTP2": "false",
+}
+
+
+def _stacks(count: int, seed: int) -> List[List[str]]:
+    rng = random.Random(seed)
+    return [rng.sample(NAMES, rng.randint(2, 6)) for _ in range(count)]
+
+
+async def _level(
+    client: httpx.AsyncClient, endpoint: str, stacks: List[List[str]], concurrency: int
+) -> Dict[str, float]:
+    pending = iter(stacks)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def worker() -> None:
+        for stack in pending:
+            started = time.perf_counter()
+            try:
+                response = await client.post(endpoint, json={"supplements": stack})
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    errors = len(stacks) - len(latencies)
+    result: Dict[str, float] = {
+        "requests": len(stacks),
+        "errors": errors,
+        "error_rate": round(errors / len(stacks), 4),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+    }
+    result.update({name: round(value, 2) for name, value in percentiles(latencies).items()})
+    failed = [f"{status or 'transport'}: {count}" for status, count in sorted(statuses.items()) if status != 200]
+    print(
+        f"c={concurrency:<4} {result['throughput_rps']:8.1f} req/s  p50 {result['p50']:8.1f} ms  "
+        f"p95 {result['p95']:8.1f} ms  p99 {result['p99']:8.1f} ms  errors {errors}"
+        + (f" ({', '.join(failed)})" if failed else "")
+    )
+    return result
+
+
+async def _run_levels(
+    client: httpx.AsyncClient, endpoint: str, levels: List[int], requests: int, warmup: int, seed: int
+) -> Dict[str, Dict[str, float]]:
+    if warmup:
+        await _level(client, endpoint, _stacks(warmup, seed - 1), min(levels))
+        print("(warm-up)\n")
+    return {
+        f"c={concurrency}": await _level(client, endpoint, _stacks(requests, seed + index), concurrency)
+        for index, concurrency in enumerate(levels)
+    }
+
+
+async def _against_url(url: str, args: argparse.Namespace, levels: List[int]) -> Dict[str, Dict[str, float]]:
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        return await _run_levels(client, args.endpoint, levels, args.requests, args.warmup, args.seed)
+
+
+async def _in_process(
+    profile: FakeProviderProfile, args: argparse.Namespace, levels: List[int]
+) -> Dict[str, Dict[str, float]]:
+    for name, value in _IN_PROCESS_DEFAULTS.items():
+        os.environ.setdefault(name, value)
+    os.environ["LLM_ROUTER_BACKENDS"] = "[]"
+
+    provider: Optional[FakeProvider] = None
+    bedrock: Optional[FakeBedrockClient] = None
+    if args.provider == "bedrock":
+        bedrock = FakeBedrockClient(profile)
+        os.environ.update(LLM_PROVIDER="bedrock", BEDROCK_REGION="us-east-1", BEDROCK_MODEL_ID="fake-model")
+    else:
+        provider = FakeProvider(profile).start()
+        os.environ.update(LLM_PROVIDER="local", LOCAL_API_BASE=provider.api_base)
+
+    # Imported only now: settings are read from the environment set up above.
+    from src.ai.config import load_settings
+    from src.ai.registry import ClientRegistry, set_client_registry
+    from src.api.main import app
+
+    set_client_registry(ClientRegistry(load_settings(), bedrock_client=bedrock))
+    try:
+        async with app.router.lifespan_context(app):
+            # Unhandled errors become 500 responses, as they would behind a server.
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+                return await _run_levels(client, args.endpoint, levels, args.requests, args.warmup, args.seed)
+    finally:
+        if provider is not None:
+            provider.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", default="1,8,32,64", help="Comma-separated concurrency levels.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level.")
+    parser.add_argument("--warmup", type=int, default=10, help="Requests sent before measuring.")
+    parser.add_argument("--endpoint", default="/generate-interactions")
+    parser.add_argument("--url", help="Load a running server instead of the in-process API.")
+    parser.add_argument("--provider", choices=("local", "bedrock"), default="local", help="Fake provider to use.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Median fake provider latency in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--stall-probability", type=float, default=0.0)
+    parser.add_argument("--error-probability", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Client timeout per request in seconds.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Compare with the results in this JSON file.")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    profile = FakeProviderProfile(
+        latency=args.latency,
+        jitter=args.jitter,
+        stall_probability=args.stall_probability,
+        error_probability=args.error_probability,
+        seed=args.seed,
+    )
+    if args.url:
+        cases = asyncio.run(_against_url(args.url, args, levels))
+    else:
+        cases = asyncio.run(_in_process(profile, args, levels))
+
+    if args.compare:
+        print_comparison(load_results(args.compare), cases)
+    if args.output:
+        parameters: Dict[str, Any] = {
+            key: value for key, value in vars(args).items() if key not in ("output", "compare")
+        }
+        if not args.url:
+            names = (*_IN_PROCESS_DEFAULTS, "ANALYSIS_MODE")
+            parameters["environment"] = {name: os.environ.get(name) for name in names}
+        save_results(args.output, "bench_load", parameters, cases)
+
+
+if __name__ == "__main__":
+    main()
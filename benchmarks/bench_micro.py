@@ -0,0 +1,107 @@
+"""Micro-benchmarks for the per-request CPU work around one model call.
+
+Times, in microseconds per operation:
+
+* ``prompt/*``: building the monolithic prompt for each recorded stack, and one
+  pairwise unit prompt;
+* ``schema/*``: generating the report JSON schema from the Pydantic models, and
+  building and encoding the chat completion body with the precompiled schema;
+* ``validate/*``: validating each recorded report (``benchmarks/corpus/reports.jsonl``)
+  from raw model text, alone and through the full parse path with repair;
+* ``serialize/*``: dumping each validated report back to JSON.
+
+Run it before and after a change to :mod:`src.ai.prompts`, :mod:`src.ai.schema`
+or :mod:`src.models.interaction`, saving the first run with ``--output`` and
+passing it to the second with ``--compare``. No provider is contacted.
+
+    python -m benchmarks.bench_micro [--output before.json] [--compare before.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from benchmarks.results import load_results, print_comparison, save_results
+from src.ai.analysis import parse_report_content
+from src.ai.client import LLMClient
+from src.ai.config import LLMSettings, load_settings
+from src.ai.prompts import build_interaction_prompt, build_pair_prompt
+from src.ai.schema import REPORT_SCHEMA, encode_chat_payload
+from src.models import SupplementInteractionRequest, SupplementInteractionResponse
+
+CORPUS = Path(__file__).parent / "corpus" / "reports.jsonl"
+
+
+def _load_corpus() -> List[Dict[str, Any]]:
+    with CORPUS.open(encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def _time(operation: Callable[[], Any], repeat: int) -> float:
+    """Best-of-``repeat`` microseconds per call, with the loop count picked by :meth:`timeit.Timer.autorange`."""
+
+    timer = timeit.Timer(operation)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def _cases(corpus: List[Dict[str, Any]], settings: LLMSettings) -> Dict[str, Callable[[], Any]]:
+    client = LLMClient(settings.model_copy(update={"http2": False}))
+    largest = build_interaction_prompt(SupplementInteractionRequest(supplements=corpus[-1]["supplements"]))
+    cases: Dict[str, Callable[[], Any]] = {}
+
+    for record in corpus:
+        request = SupplementInteractionRequest(supplements=record["supplements"])
+        cases[f"prompt/{record['id']}"] = lambda request=request: build_interaction_prompt(request)
+    cases["prompt/pair"] = lambda: build_pair_prompt("Zinc Picolinate 30 mg", "Copper Bisglycinate 2 mg")
+
+    cases["schema/model_json_schema"] = SupplementInteractionResponse.model_json_schema
+    cases["schema/request_body"] = lambda: encode_chat_payload(
+        client.chat_completion_payload(prompt=largest, response_format=REPORT_SCHEMA.response_format)
+    )
+
+    for record in corpus:
+        content = json.dumps(record["report"])
+        report = REPORT_SCHEMA.parse(content)
+        cases[f"validate/{record['id']}"] = lambda content=content: REPORT_SCHEMA.parse(content)
+        cases[f"validate/{record['id']}+repair"] = lambda content=content: parse_report_content(
+            content, settings=settings
+        )
+        cases[f"serialize/{record['id']}"] = report.model_dump_json
+    return cases
+
+
+def run(repeat: int, selected: str) -> Dict[str, Dict[str, float]]:
+    corpus = _load_corpus()
+    settings = load_settings()
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'case':<34} {'µs/op':>10}")
+    for name, operation in _cases(corpus, settings).items():
+        if selected and not name.startswith(selected):
+            continue
+        results[name] = {"us_per_op": round(_time(operation, repeat), 3)}
+        print(f"{name:<34} {results[name]['us_per_op']:10.1f}")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Timing rounds per case; the fastest is reported.")
+    parser.add_argument("--only", default="", help="Run only cases starting with this prefix, e.g. validate/.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Compare with the results in this JSON file.")
+    args = parser.parse_args()
+
+    cases = run(args.repeat, args.only)
+    if args.compare:
+        print_comparison(load_results(args.compare), cases)
+    if args.output:
+        save_results(args.output, "bench_micro", {"repeat": args.repeat, "only": args.only}, cases)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Report output size and latency: full JSON against the compact wire format.
+
+For each report in ``benchmarks/corpus/reports.jsonl`` it prints the tokens a
+model generates for it in the full format and in the compact format of
+:mod:`src.ai.compact`, also with ``--caps`` applied. It checks that the compact
+output decodes to the same report.
+
+It then sends every stack ``--rounds`` times per format through
+:func:`generate_interaction_report_async` to a fake provider. Each generated
+token adds ``--token-latency`` seconds to that provider's latency. The run
+prints mean latency and completion tokens per format. ``--max-tokens`` sets
+``LLM_OUTPUT_MAX_TOKENS`` for this run and counts the reports cut off by the
+budget.
+
+    python -m benchmarks.bench_output [--rounds 3] [--token-latency 0.002] [--max-tokens 1500]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from benchmarks.fake_provider import FakeProvider, FakeProviderProfile
+from src.ai.analysis import generate_interaction_report_async
+from src.ai.client import AsyncLLMClient
+from src.ai.compact import SECTIONS, SUMMARY_KEY, SUPPLEMENT_KEY, cap_sections, expand_report
+from src.ai.config import LLMSettings
+from src.ai.prompts import estimate_tokens
+from src.ai.schema import COMPACT_REPORT_SCHEMA, REPORT_SCHEMA
+from src.models import SupplementInteractionRequest
+
+CORPUS = Path(__file__).parent / "corpus" / "reports.jsonl"
+
+
+def compact_document(report: Dict[str, Any], supplements: Sequence[str]) -> Dict[str, Any]:
+    """What a model following the compact prompt writes for ``report``."""
+
+    positions = {name.casefold(): index for index, name in enumerate(supplements)}
+
+    def number(name: Any) -> Any:
+        return positions.get(name.casefold(), name) if isinstance(name, str) else name
+
+    document: Dict[str, Any] = {SUMMARY_KEY: report["analysis_summary"]}
+    for key, (section, fields) in SECTIONS.items():
+        items = []
+        for item in report["interactions"].get(section, []):
+            short = {}
+            for short_key, field in fields.items():
+                value = item.get(field)
+                if value is None:
+                    continue
+                if short_key == SUPPLEMENT_KEY:
+                    value = [number(name) for name in value] if isinstance(value, list) else number(value)
+                short[short_key] = value
+            items.append(short)
+        if items:
+            document[key] = items
+    return document
+
+
+def _sizes(records: List[Dict[str, Any]], caps: Dict[str, int]) -> None:
+    print(f"{'report':<10} {'full':>6} {'compact':>8} {'saved':>6}   {'capped':>6} {'both':>6}  round trip")
+    totals = [0, 0, 0, 0]
+    for record in records:
+        supplements, report = record["supplements"], record["report"]
+        capped = cap_sections(report, caps)
+        sizes = [
+            estimate_tokens(json.dumps(report)),
+            estimate_tokens(json.dumps(compact_document(report, supplements))),
+            estimate_tokens(json.dumps(capped)),
+            estimate_tokens(json.dumps(compact_document(capped, supplements))),
+        ]
+        totals = [total + size for total, size in zip(totals, sizes)]
+        schema = COMPACT_REPORT_SCHEMA.with_decoder(partial(expand_report, supplements=supplements))
+        decoded = schema.parse(json.dumps(compact_document(report, supplements)))
+        expected = REPORT_SCHEMA.parse(json.dumps(report))
+        same = decoded.model_dump_json().casefold() == expected.model_dump_json().casefold()
+        print(f"{record['id']:<10} {sizes[0]:>6} {sizes[1]:>8} {1 - sizes[1] / sizes[0]:>6.0%}   "
+              f"{sizes[2]:>6} {sizes[3]:>6}  {'identical' if same else 'DIFFERS'}")
+    print(f"{'total':<10} {totals[0]:>6} {totals[1]:>8} {1 - totals[1] / totals[0]:>6.0%}   "
+          f"{totals[2]:>6} {totals[3]:>6}")
+    if caps:
+        print(f"caps {json.dumps(caps)}: compact and capped together save {1 - totals[3] / totals[0]:.0%}")
+
+
+async def _latency(
+    records: List[Dict[str, Any]], provider: FakeProvider, rounds: int, max_tokens: Optional[int]
+) -> None:
+    print(f"\n{'format':<8} {'mean ms':>8} {'p95 ms':>8} {'completion tokens':>18} {'cut off':>8}")
+    for output_format in ("full", "compact"):
+        overrides = {"LLM_OUTPUT_FORMAT": output_format}
+        if max_tokens:
+            overrides["LLM_OUTPUT_MAX_TOKENS"] = str(max_tokens)
+        client = AsyncLLMClient(LLMSettings(**overrides))  # type: ignore[arg-type]
+        latencies: List[float] = []
+        tokens: List[int] = []
+        cut_off = 0
+        try:
+            for _ in range(rounds):
+                for record in records:
+                    provider.profile.content = json.dumps(record["report"])
+                    compact = compact_document(record["report"], record["supplements"])
+                    provider.profile.unit_contents["CompactReport"] = json.dumps(compact)
+                    request = SupplementInteractionRequest(supplements=record["supplements"])
+                    started = time.perf_counter()
+                    try:
+                        report = await generate_interaction_report_async(request, client=client)
+                    except ValueError:
+                        cut_off += 1
+                        continue
+                    latencies.append(time.perf_counter() - started)
+                    tokens.append(report.meta["prompt"]["usage"]["completion_tokens"])
+                    cut_off += bool(report.meta.get("repair", {}).get("lossy"))
+        finally:
+            await client.aclose()
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        print(f"{output_format:<8} {statistics.mean(latencies) * 1000:>8.1f} {p95 * 1000:>8.1f} "
+              f"{statistics.mean(tokens):>18.0f} {cut_off:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, default=3, help="Requests per corpus stack and format.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake provider latency before decoding.")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="Seconds per generated token.")
+    parser.add_argument("--caps", default='{"synergies": 2, "optimizations": 2}', help="JSON section caps.")
+    parser.add_argument("--max-tokens", type=int, default=None, help="LLM_OUTPUT_MAX_TOKENS for the latency run.")
+    args = parser.parse_args()
+
+    records = [json.loads(line) for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+    _sizes(records, json.loads(args.caps))
+
+    provider = FakeProvider(FakeProviderProfile(latency=args.latency, jitter=0.0, token_latency=args.token_latency))
+    provider.start()
+    # Every request reaches the provider; settings are first read when the first report is generated.
+    os.environ.update(
+        LLM_PROVIDER="local",
+        LOCAL_API_BASE=provider.api_base,
+        LLM_ROUTER_BACKENDS="[]",
+        LLM_HTTP2="false",
+        LLM_TIMEOUT="120",
+        REPORT_CACHE_BACKEND="none",
+        KNOWLEDGE_BASE_ENABLED="false",
+        ANALYSIS_MODE="monolithic",
+    )
+    try:
+        asyncio.run(_latency(records, provider, args.rounds, args.max_tokens))
+    finally:
+        provider.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Background precomputation of popular stacks: sketch accuracy, hit rate and interference.
+
+Draws requests from a Zipf distribution (``--zipf``) over ``--stacks`` synthetic
+stacks of 2-5 supplements, then reports:
+
+* how many of the true top-K stacks and pairs the count-min sketch of
+  :mod:`src.ai.precompute` ranks in its top-K after ``--samples`` requests
+  sampled at ``--sample-rate``. Also the cost per observed request and the
+  sketch's memory against exact counting;
+* against a fake provider with ``--latency``, the latency of ``--requests``
+  live requests arriving at ``--rate`` per second. This runs once with an empty
+  precomputed store and once after :class:`src.services.precompute.Precomputer`
+  filled it. The report cache is off, so every hit comes from the store;
+* a model version change that makes every stored report stale. The
+  precomputer refreshes the store while live traffic keeps arriving, and the
+  run shows how often it deferred to live calls and whether live latency moved.
+
+    python -m benchmarks.bench_precompute [--stacks 2000] [--top-k 50] [--requests 600] [--rate 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from benchmarks.fake_provider import FakeProvider, FakeProviderProfile
+from src.ai.analysis import generate_interaction_report_async
+from src.ai.client import AsyncLLMClient
+from src.ai.config import LLMSettings
+from src.ai.precompute import PopularityTracker, PrecomputedStore, stack_id
+from src.models import SupplementInteractionRequest
+
+Stack = Tuple[str, ...]
+
+
+def synthetic_stacks(count: int, seed: int) -> List[Stack]:
+    """``count`` distinct stacks of 2-5 made-up supplements (unknown to the knowledge base)."""
+
+    rng = random.Random(seed)
+    herbs = [f"Botanical {index:03d} {rng.choice((50, 100, 200, 500))} mg" for index in range(80)]
+    stacks: Dict[str, Stack] = {}
+    while len(stacks) < count:
+        stack = tuple(sorted(rng.sample(herbs, rng.randint(2, 5))))
+        stacks.setdefault(stack_id(stack), stack)
+    return list(stacks.values())
+
+
+def zipf_traffic(stacks: Sequence[Stack], requests: int, exponent: float, seed: int) -> List[Stack]:
+    rng = random.Random(seed)
+    weights = [1 / rank**exponent for rank in range(1, len(stacks) + 1)]
+    return rng.choices(stacks, weights=weights, k=requests)
+
+
+def _recall(tracked: Sequence[Stack], counts: Counter, k: int) -> float:
+    truth = {key for key, _ in counts.most_common(k)}
+    return len(truth & {stack_id(names) for names in tracked}) / max(len(truth), 1)
+
+
+def sketch_accuracy(stacks: Sequence[Stack], args: argparse.Namespace) -> None:
+    traffic = zipf_traffic(stacks, args.samples, args.zipf, args.seed + 1)
+    tracker = PopularityTracker(top_k=args.top_k, sample_rate=args.sample_rate, seed=args.seed)
+    requests = [SupplementInteractionRequest(supplements=list(stack)) for stack in traffic]
+    started = time.perf_counter()
+    for request in requests:
+        tracker.observe(request)
+    observe_us = (time.perf_counter() - started) / len(requests) * 1e6
+
+    stack_counts = Counter(stack_id(stack) for stack in traffic)
+    pair_counts = Counter(stack_id(pair) for stack in traffic for pair in combinations(stack, 2))
+    top_stacks = [names for names, _ in tracker.stacks.top(args.top_k)]
+    top_pairs = [names for names, _ in tracker.pairs.top(args.top_k)]
+    covered = sum(count for key, count in stack_counts.most_common(args.top_k)) / len(traffic)
+    counters = 2 * tracker.stacks.sketch.width * tracker.stacks.sketch.depth
+    candidates = tracker.stacks.capacity + tracker.pairs.capacity
+
+    print(f"{len(traffic)} requests over {len(stacks)} stacks (zipf {args.zipf}), sample rate {args.sample_rate}")
+    print(f"observe                         {observe_us:6.2f} µs/request")
+    print(f"top-{args.top_k} stacks recall            {_recall(top_stacks, stack_counts, args.top_k):6.1%}"
+          f"   (they carry {covered:.1%} of requests)")
+    print(f"top-{args.top_k} pairs recall             {_recall(top_pairs, pair_counts, args.top_k):6.1%}")
+    print(f"sketch size                     {counters} counters and {candidates} candidates, fixed; exact "
+          f"counting keeps {len(stack_counts) + len(pair_counts)} keys and grows with every new stack and pair")
+
+
+async def _live(
+    client: AsyncLLMClient, traffic: Sequence[Stack], rate: float, seed: int
+) -> Tuple[List[float], int]:
+    """Open-loop Poisson arrivals; returns latencies and how many were served from the store."""
+
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    served = 0
+
+    async def one(stack: Stack) -> None:
+        nonlocal served
+        started = time.perf_counter()
+        request = SupplementInteractionRequest(supplements=list(stack))
+        report = await generate_interaction_report_async(request, client=client)
+        latencies.append(time.perf_counter() - started)
+        served += bool(report.meta.get("cache", {}).get("precomputed"))
+
+    tasks = []
+    for stack in traffic:
+        tasks.append(asyncio.create_task(one(stack)))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    return latencies, served
+
+
+def _summary(name: str, latencies: List[float], served: int, calls: int) -> None:
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    print(f"{name:<34} {statistics.mean(latencies) * 1000:8.1f} {p95 * 1000:8.1f} "
+          f"{served / len(latencies):>9.1%} {calls:>12}")
+
+
+async def end_to_end(stacks: Sequence[Stack], provider: FakeProvider, args: argparse.Namespace) -> None:
+    # Imported after the environment below is set, so the store is the one under test.
+    from src.ai.precompute import get_precomputed_store
+    from src.services.precompute import Precomputer
+
+    settings = LLMSettings()  # type: ignore[call-arg]
+    store = get_precomputed_store()
+    assert isinstance(store, PrecomputedStore)
+    tracker = PopularityTracker(top_k=args.top_k, sample_rate=args.sample_rate, seed=args.seed)
+    for stack in zipf_traffic(stacks, args.samples, args.zipf, args.seed + 1):
+        tracker.observe(SupplementInteractionRequest(supplements=list(stack)))
+    traffic = zipf_traffic(stacks, args.requests, args.zipf, args.seed + 2)
+
+    print(f"\n{args.requests} live requests at {args.rate}/s, provider latency {args.latency * 1000:.0f} ms")
+    print(f"{'':<34} {'mean ms':>8} {'p95 ms':>8} {'from store':>9} {'model calls':>12}")
+    client = AsyncLLMClient(settings)
+    try:
+        calls = provider.calls
+        latencies, served = await _live(client, traffic, args.rate, args.seed)
+        _summary("no precomputation", latencies, served, provider.calls - calls)
+
+        precomputer = Precomputer(settings, tracker, store)
+        calls, started = provider.calls, time.perf_counter()
+        while await precomputer.run_once(client):
+            pass
+        print(f"{'precompute (idle)':<34} {time.perf_counter() - started:8.1f} s for "
+              f"{store.stats()['entries']} stacks and pairs, {provider.calls - calls} model calls")
+        calls = provider.calls
+        latencies, served = await _live(client, traffic, args.rate, args.seed)
+        _summary("precomputed store", latencies, served, provider.calls - calls)
+    finally:
+        await client.aclose()
+
+    # A new model version: every stored report is stale until refreshed under the new key.
+    changed = LLMSettings(LOCAL_MODEL="bench-model-v2")  # type: ignore[call-arg]
+    client = AsyncLLMClient(changed)
+    precomputer = Precomputer(changed, tracker, store)
+    stop = asyncio.Event()
+
+    async def background() -> None:
+        while not stop.is_set():
+            await precomputer.run_once(client)
+            await asyncio.sleep(args.interval)
+
+    try:
+        calls = provider.calls
+        refreshing = asyncio.create_task(background())
+        latencies, served = await _live(client, traffic, args.rate, args.seed)
+        stop.set()
+        await refreshing
+        _summary("version change, refreshing", latencies, served, provider.calls - calls)
+        stats = precomputer.stats()
+        print(f"refreshed {stats['refreshed']} of {stats['store']['entries']} stored reports during live traffic; "
+              f"{stats['deferred_busy']} of {stats['rounds']} rounds stopped early for live calls")
+    finally:
+        await client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stacks", type=int, default=2000, help="Distinct stacks in the synthetic population.")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of stack popularity.")
+    parser.add_argument("--samples", type=int, default=100_000, help="Requests observed by the sketch.")
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=600, help="Live requests per end-to-end run.")
+    parser.add_argument("--rate", type=float, default=20.0, help="Live arrivals per second.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake provider latency.")
+    parser.add_argument("--interval", type=float, default=0.05, help="Pause between precompute rounds.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    provider = FakeProvider(FakeProviderProfile(latency=args.latency, jitter=0.0))
+    provider.start()
+    with tempfile.TemporaryDirectory() as directory:
+        # Set before anything loads the settings: stack ids canonicalize names with them.
+        os.environ.update(
+            LLM_PROVIDER="local",
+            LOCAL_API_BASE=provider.api_base,
+            LLM_ROUTER_BACKENDS="[]",
+            LLM_HTTP2="false",
+            REPORT_CACHE_BACKEND="none",
+            KNOWLEDGE_BASE_ENABLED="false",
+            ANALYSIS_MODE="monolithic",
+            PRECOMPUTE_ENABLED="true",
+            PRECOMPUTE_TOP_K=str(args.top_k),
+            PRECOMPUTE_PATH=str(Path(directory) / "precomputed.sqlite3"),
+        )
+        try:
+            stacks = synthetic_stacks(args.stacks, args.seed)
+            sketch_accuracy(stacks, args)
+            asyncio.run(end_to_end(stacks, provider, args))
+        finally:
+            provider.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Full retries avoided by repairing malformed model output instead of re-asking.
+
+Replays a corpus of recorded bad model outputs (one JSON object per line with
+``id``, ``kind`` and ``content``) through :func:`src.ai.repair.repair_content`.
+Before, every output that failed strict validation cost a full completion retry.
+Now, syntax fixes and salvage happen locally; only outputs that cannot be repaired
+locally need a small fix-up call. Token costs are estimates (about four characters
+per token). No provider is contacted.
+
+    python -m benchmarks.bench_repair [--corpus benchmarks/corpus/bad_outputs.jsonl]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import timeit
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+from src.ai.config import load_settings
+from src.ai.prompts import build_interaction_prompt, estimate_tokens
+from src.ai.repair import RepairPath, build_fix_prompt, repair_content
+from src.ai.schema import REPORT_SCHEMA
+from src.models import SupplementInteractionRequest
+
+DEFAULT_CORPUS = Path(__file__).parent / "corpus" / "bad_outputs.jsonl"
+PROMPT = build_interaction_prompt(
+    SupplementInteractionRequest(supplements=["Zinc", "Copper", "Magnesium", "Vitamin D3"])
+)
+
+
+def _load(path: Path) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def run(corpus: Path) -> None:
+    rows = _load(corpus)
+    system_tokens = estimate_tokens(load_settings().system_prompt)
+    paths: Counter = Counter()
+    strict_failures = fix_calls = retry_tokens = fix_tokens = 0
+
+    print(f"{'sample':<22} {'path':<9} {'repair µs':>10}  fixes / dropped")
+    for row in rows:
+        content = row["content"]
+        repair = repair_content(REPORT_SCHEMA, content)
+        paths[repair.path] += 1
+        seconds = min(timeit.repeat(lambda: repair_content(REPORT_SCHEMA, content), number=50, repeat=3)) / 50
+        detail = ", ".join(repair.fixes + [item["path"] for item in repair.dropped])
+        print(f"{row['id']:<22} {repair.path.value:<9} {seconds * 1e6:10.1f}  {detail}")
+        if repair.path == RepairPath.NONE:
+            continue
+        strict_failures += 1
+        # A full retry resends the whole prompt and regenerates the whole report.
+        retry_tokens += system_tokens + estimate_tokens(PROMPT) + estimate_tokens(content)
+        if repair.value is None:
+            fix_calls += 1
+            fix_tokens += system_tokens + estimate_tokens(build_fix_prompt(REPORT_SCHEMA, repair))
+            fix_tokens += estimate_tokens(content)
+
+    repaired_locally = paths[RepairPath.SYNTAX] + paths[RepairPath.SALVAGE]
+    print()
+    print(f"samples                         {len(rows)}")
+    print(f"failed strict validation        {strict_failures}  (each a full retry before)")
+    print(f"repaired locally                {repaired_locally}  (syntax {paths[RepairPath.SYNTAX]}, "
+          f"salvage {paths[RepairPath.SALVAGE]})")
+    print(f"needing a fix-up call           {fix_calls}")
+    print(f"full retries avoided            {repaired_locally} locally, up to {fix_calls} more by fix-up calls")
+    if retry_tokens:
+        print(f"estimated tokens, full retries  {retry_tokens}")
+        print(f"estimated tokens, fix-up calls  {fix_tokens}  ({fix_tokens / retry_tokens:.0%} of retry cost)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    args = parser.parse_args()
+    run(args.corpus)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""CPU time per report from raw model output to response bytes.
+
+For each recorded report in ``benchmarks/corpus/reports.jsonl`` it measures,
+in CPU microseconds per report:
+
+* ``parse``: validating the model output into a report, enum normalization included;
+* ``response_model``: what FastAPI does with the returned report: the
+  ``response_model`` pass that serializes it to JSON bytes.
+
+``benchmarks.bench_micro --only validate/`` tracks the parse step on its own
+across changes. No provider is contacted.
+
+    python -m benchmarks.bench_response [--number 2000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from fastapi.routing import APIRoute, serialize_response
+
+from src.ai.schema import REPORT_SCHEMA
+from src.api.main import app
+
+CORPUS = Path(__file__).parent / "corpus" / "reports.jsonl"
+
+
+def _cpu_us(operation: Callable[[], Any], number: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        started = time.process_time()
+        for _ in range(number):
+            operation()
+        best = min(best, time.process_time() - started)
+    return best / number * 1e6
+
+
+def run(number: int) -> None:
+    route = next(r for r in app.routes if isinstance(r, APIRoute) and r.path == "/generate-interactions")
+    loop = asyncio.new_event_loop()
+
+    async def response_model_pass(report: Any, repeat: int) -> None:
+        for _ in range(repeat):
+            await serialize_response(field=route.response_field, response_content=report, dump_json=True)
+
+    print(f"{'report':<10} {'entries':>7} {'parse':>8} {'resp_model':>10} {'total':>8}")
+    for line in CORPUS.read_text(encoding="utf-8").splitlines():
+        record = json.loads(line)
+        content = json.dumps(record["report"])
+        report = REPORT_SCHEMA.parse(content)
+        entries = sum(len(entries) for entries in record["report"]["interactions"].values())
+
+        parse = _cpu_us(lambda: REPORT_SCHEMA.parse(content), number)
+        # One event-loop round trip per batch, so the loop overhead is not counted per report.
+        response_model = _cpu_us(lambda: loop.run_until_complete(response_model_pass(report, 100)), number // 100) / 100
+        print(f"{record['id']:<10} {entries:7} {parse:8.1f} {response_model:10.1f} {parse + response_model:8.1f}")
+    loop.close()
+    print("\nCPU µs per report")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--number", type=int, default=2000, help="Reports processed per timing round.")
+    args = parser.parse_args()
+    run(max(args.number, 100))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Tail latency of one backend versus the router over several fake backends.
+
+Three fake providers share the same median latency. Each stalls on a few
+percent of requests, and one also answers some requests with 429. The same
+load goes once to a single backend and once through :class:`AsyncLLMRouter`
+with hedging and failover, and the latency percentiles are compared.
+
+    python -m benchmarks.bench_router --requests 600 --concurrency 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.fake_provider import FakeProvider, FakeProviderProfile
+from benchmarks.results import percentiles
+from src.ai.client import AsyncLLMClient
+from src.ai.config import LLMSettings
+from src.ai.router import AsyncLLMRouter, BackendHealth, backend_settings
+
+PROMPT = "Analyse: zinc, copper"
+
+
+def _settings(**overrides: Any) -> LLMSettings:
+    values: Dict[str, Any] = {"LLM_PROVIDER": "local", "LLM_HTTP2": False, "LLM_ROUTER_BACKENDS": []}
+    values.update(overrides)
+    return LLMSettings.model_validate(values)
+
+
+async def _load(client: Any, requests: int, concurrency: int) -> Tuple[List[float], int]:
+    slots = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one() -> None:
+        nonlocal errors
+        async with slots:
+            started = time.perf_counter()
+            try:
+                await client.create_chat_completion(prompt=PROMPT)
+            except Exception:  # noqa: BLE001 - counted, not raised
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, errors
+
+
+def _report(label: str, latencies: List[float], errors: int) -> None:
+    stats = percentiles(latencies)
+    print(
+        f"{label:<14} p50 {stats['p50']:7.1f} ms  p95 {stats['p95']:7.1f} ms  "
+        f"p99 {stats['p99']:7.1f} ms  mean {stats['mean']:7.1f} ms  errors {errors}"
+    )
+
+
+async def run(requests: int, concurrency: int) -> None:
+    profiles = [
+        FakeProviderProfile(latency=0.03, stall_probability=0.03, stall_latency=0.6, seed=1),
+        FakeProviderProfile(latency=0.03, stall_probability=0.03, stall_latency=0.6, seed=2),
+        FakeProviderProfile(
+            latency=0.03, stall_probability=0.03, stall_latency=0.6, error_probability=0.1, error_status=429, seed=3
+        ),
+    ]
+    providers = [FakeProvider(profile).start() for profile in profiles]
+    try:
+        single = AsyncLLMClient(_settings(LOCAL_API_BASE=providers[2].api_base))
+        try:
+            _report("single backend", *await _load(single, requests, concurrency))
+        finally:
+            await single.aclose()
+
+        base = _settings(LLM_ROUTER_HEDGE_PERCENTILE=0.9, LLM_ROUTER_HEDGE_MIN_SAMPLES=20)
+        backends = []
+        for index, provider in enumerate(providers):
+            settings = backend_settings(base, {"LOCAL_API_BASE": provider.api_base})
+            backends.append((BackendHealth(f"fake-{index}", base), AsyncLLMClient(settings)))
+        router = AsyncLLMRouter(base, backends)
+        try:
+            _report("router", *await _load(router, requests, concurrency))
+            for name, stats in router.pool_stats().items():
+                print(f"  {name}: {stats['router']}")
+        finally:
+            await router.aclose()
+    finally:
+        for provider in providers:
+            provider.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Per-request cost of building the report response_format and request body.
+
+Compares rebuilding the schema on every request (the previous behaviour) with
+the schemas precompiled in :mod:`src.ai.schema`. No provider is contacted.
+
+    python -m benchmarks.bench_schema
+"""
+
+from __future__ import annotations
+
+import json
+import timeit
+
+from src.ai.prompts import build_interaction_prompt
+from src.ai.schema import REPORT_SCHEMA, encode_chat_payload
+from src.models import SupplementInteractionRequest, SupplementInteractionResponse
+
+PROMPT = build_interaction_prompt(SupplementInteractionRequest(supplements=["Zinc", "Copper", "Magnesium", "Iron"]))
+MESSAGES = [{"role": "system", "content": "system"}, {"role": "user", "content": PROMPT}]
+CONTENT = json.dumps(
+    {
+        "analysis_summary": "Zinc and copper compete for absorption.",
+        "interactions": {
+            "conflicts": [
+                {
+                    "supplements": ["Zinc", "Copper"],
+                    "mechanism": "Metallothionein induction",
+                    "evidence_level": "high",
+                    "severity": "moderate",
+                    "management_strategy": "temporal_separation",
+                    "management_instruction": "Take two hours apart.",
+                }
+            ]
+        },
+    }
+)
+
+
+def per_request_before() -> bytes:
+    schema = SupplementInteractionResponse.model_json_schema()
+    response_format = {"type": "json_schema", "json_schema": {"name": "interaction_report", "schema": schema}}
+    payload = {"model": "model", "messages": MESSAGES, "response_format": response_format}
+    return json.dumps(payload).encode("utf-8")
+
+
+def per_request_after() -> bytes:
+    payload = {"model": "model", "messages": MESSAGES, "response_format": REPORT_SCHEMA.response_format}
+    return encode_chat_payload(payload)
+
+
+def bedrock_before() -> dict:
+    schema = SupplementInteractionResponse.model_json_schema()
+    response_format = {"type": "json_schema", "json_schema": {"name": "interaction_report", "schema": schema}}
+    return {"json": {"schema": response_format.get("json_schema", {}).get("schema")}}
+
+
+def bedrock_after() -> dict:
+    return REPORT_SCHEMA.response_format.bedrock
+
+
+def parse_before() -> SupplementInteractionResponse:
+    return SupplementInteractionResponse.model_validate_json(CONTENT)
+
+
+def parse_after() -> SupplementInteractionResponse:
+    return REPORT_SCHEMA.parse(CONTENT)
+
+
+def _bench(label: str, fn, number: int) -> float:
+    best = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print(f"{label:<40} {best * 1e6:10.2f} µs/request")
+    return best
+
+
+def main() -> None:
+    assert json.loads(per_request_before()) == json.loads(per_request_after())
+    for name, before, after, number in (
+        ("openai body", per_request_before, per_request_after, 2000),
+        ("bedrock responseFormat", bedrock_before, bedrock_after, 2000),
+        ("response parsing", parse_before, parse_after, 20000),
+    ):
+        slow = _bench(f"{name} (per request)", before, number)
+        fast = _bench(f"{name} (precompiled)", after, number)
+        print(f"{'':<40} {slow / fast:10.1f}x faster\n")
+
+
+if __name__ == "__main__":
+    main()
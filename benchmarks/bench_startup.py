@@ -0,0 +1,122 @@
+"""Cold-start cost of the API process: import time and time to ready.
+
+Each run starts a fresh interpreter with ``-X importtime``, imports
+``src.api.main`` and runs the application lifespan (the startup warm-up),
+then reports:
+
+* total import time and the slowest modules by cumulative and self time;
+* warm-up time per step and until ready;
+* provider SDKs that were imported although the active ``LLM_PROVIDER`` does
+  not need them.
+
+``--budget-ms`` makes the run exit non-zero when the median import time exceeds
+the budget, and ``--forbid`` when an unneeded provider SDK was imported, so CI
+can catch startup regressions.
+
+    python -m benchmarks.bench_startup --runs 5 --budget-ms 1500
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Never needed for LLM_PROVIDER=local or openai; boto3/botocore only for bedrock.
+PROVIDER_SDKS = ("openai", "boto3", "botocore")
+
+_CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+from src.api.main import _startup, app
+imported = time.perf_counter()
+
+async def main():
+    async with app.router.lifespan_context(app):
+        while not _startup.get("ready"):
+            await asyncio.sleep(0.005)
+        ready = time.perf_counter()
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "ready_ms": (ready - imported) * 1000,
+        "steps": _startup.get("steps", {}),
+        "modules": sorted(sys.modules),
+    }))
+
+asyncio.run(main())
+"""
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Return ``(module, self_us, cumulative_us)`` rows from ``-X importtime`` output."""
+
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|", 2)
+        rows.append((name.strip(), int(own), int(cumulative)))
+    return rows
+
+
+def _run_once() -> Tuple[Dict[str, object], List[Tuple[str, int, int]]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD],
+        capture_output=True,
+        text=True,
+        env=os.environ.copy(),
+        check=False,
+    )
+    if result.returncode != 0:
+        sys.exit(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1]), _parse_importtime(result.stderr)
+
+
+def run(runs: int, top: int, budget_ms: float, forbid: bool) -> int:
+    samples = [_run_once() for _ in range(runs)]
+    import_ms = [sample["import_ms"] for sample, _ in samples]
+    ready_ms = [sample["ready_ms"] for sample, _ in samples]
+    report, rows = samples[-1]
+
+    print(f"import src.api.main   median {statistics.median(import_ms):8.1f} ms  (runs: {runs})")
+    print(f"startup warm-up       median {statistics.median(ready_ms):8.1f} ms  steps: {report['steps']}")
+    print("\nslowest imports by cumulative time (last run):")
+    for name, own, cumulative in sorted(rows, key=lambda row: -row[2])[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {own / 1000:8.1f} ms self  {name}")
+    print("\nslowest first-party imports by self time:")
+    for name, own, _ in sorted((row for row in rows if row[0].startswith("src.")), key=lambda row: -row[1])[:top]:
+        print(f"  {own / 1000:8.1f} ms  {name}")
+
+    provider = os.environ.get("LLM_PROVIDER", "local").lower()
+    needed = ("boto3", "botocore") if provider == "bedrock" else ()
+    unneeded = sorted(
+        {module.split(".")[0] for module in report["modules"]} & (set(PROVIDER_SDKS) - set(needed))
+    )
+    print(f"\nunneeded provider SDKs imported for LLM_PROVIDER={provider}: {', '.join(unneeded) or 'none'}")
+
+    status = 0
+    if budget_ms and statistics.median(import_ms) > budget_ms:
+        print(f"FAIL: median import time exceeds the {budget_ms:.0f} ms budget")
+        status = 1
+    if forbid and unneeded:
+        print("FAIL: unneeded provider SDKs were imported")
+        status = 1
+    return status
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--budget-ms", type=float, default=0.0, help="Fail if the median import time exceeds this.")
+    parser.add_argument("--forbid", action="store_true", help="Fail if an unneeded provider SDK is imported.")
+    args = parser.parse_args()
+    sys.exit(run(args.runs, args.top, args.budget_ms, args.forbid))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""Fake LLM providers for benchmarks: an OpenAI-compatible server and a Bedrock stub.
+
+:class:`FakeProvider` answers ``POST /v1/chat/completions`` (plain or
+streamed) from a background thread. :class:`FakeBedrockClient` stands in for a
+boto3 ``bedrock-runtime`` client and is passed to the LLM clients through their
+``bedrock_client`` argument. Both answer with a fixed, valid interaction report,
+or with empty pair or supplement findings when the request's response schema
+asks for them (pairwise mode), after a configurable delay plus an optional
+per-token decode time, cut to the request's ``max_tokens``. A fraction of
+requests can stall (to model tail latency) or fail with a status code such as
+429. Streams are sent in chunks with an optional pause between chunks. Only the
+standard library is used, so benchmarks run without a model or network.
+
+The server can also run on its own, for load tests against a real API process
+started with ``LOCAL_API_BASE=http://127.0.0.1:8001/v1``:
+
+    python -m benchmarks.fake_provider --port 8001 --latency 0.2 --error-probability 0.01
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+REPORT: Dict[str, Any] = {
+    "analysis_summary": "Zinc and copper compete for absorption; separate them.",
+    "interactions": {
+        "conflicts": [
+            {
+                "supplements": ["Zinc", "Copper"],
+                "mechanism": "Zinc induces metallothionein, which binds copper.",
+                "evidence_level": "high",
+                "severity": "moderate",
+                "management_strategy": "temporal_separation",
+                "management_instruction": "Take them at least two hours apart.",
+            }
+        ],
+        "synergies": [],
+        "depletions": [],
+        "optimizations": [],
+        "dosage_warnings": [],
+    },
+}
+
+# Answers for pairwise unit prompts, keyed by the title of the requested response schema.
+UNIT_CONTENTS: Dict[str, str] = {
+    "PairFindings": json.dumps({"conflicts": [], "synergies": []}),
+    "SupplementFindings": json.dumps({"depletions": [], "optimizations": [], "dosage_warnings": []}),
+}
+
+
+@dataclass
+class FakeProviderProfile:
+    """Latency, streaming and failure behaviour of one fake backend."""
+
+    latency: float = 0.02
+    jitter: float = 0.005
+    # Seconds per generated token added to the latency, so shorter output answers sooner.
+    token_latency: float = 0.0
+    stall_probability: float = 0.0
+    stall_latency: float = 0.5
+    error_probability: float = 0.0
+    error_status: int = 429
+    chunk_size: int = 32
+    chunk_interval: float = 0.0
+    seed: Optional[int] = None
+    content: str = field(default_factory=lambda: json.dumps(REPORT))
+    unit_contents: Dict[str, str] = field(default_factory=lambda: dict(UNIT_CONTENTS))
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class _FakeBackend:
+    """Shared call accounting and latency/failure sampling."""
+
+    def __init__(self, profile: FakeProviderProfile) -> None:
+        self.profile = profile
+        self.calls = 0
+        self._random = random.Random(profile.seed)
+        self._lock = threading.Lock()
+
+    def _plan(self) -> Tuple[float, int]:
+        profile = self.profile
+        with self._lock:
+            self.calls += 1
+            roll = self._random.random()
+            delay = max(0.0, self._random.gauss(profile.latency, profile.jitter))
+        if roll < profile.error_probability:
+            return delay, profile.error_status
+        if roll < profile.error_probability + profile.stall_probability:
+            return profile.stall_latency, 200
+        return delay, 200
+
+    def _content(self, schema: Optional[Dict[str, Any]], max_tokens: Optional[int] = None) -> str:
+        title = (schema or {}).get("title")
+        content = self.profile.unit_contents.get(title, self.profile.content)
+        # A model stops mid-document when it runs out of budget.
+        return content[: max_tokens * 4] if max_tokens else content
+
+    def _decode_time(self, content: str) -> float:
+        return self.profile.token_latency * _estimate_tokens(content)
+
+    def _chunks(self, content: str) -> Iterator[str]:
+        size = self.profile.chunk_size
+        for start in range(0, len(content), size):
+            if start and self.profile.chunk_interval:
+                time.sleep(self.profile.chunk_interval)
+            yield content[start : start + size]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops SYNs under load and adds a 1 s retransmit to the tail.
+    request_queue_size = 256
+
+
+class FakeProvider(_FakeBackend):
+    """A fake OpenAI-compatible provider listening on ``127.0.0.1`` in a background thread."""
+
+    def __init__(self, profile: FakeProviderProfile, *, port: int = 0) -> None:
+        super().__init__(profile)
+        self._server = _Server(("127.0.0.1", port), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def api_base(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler(self) -> type:
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *_: object) -> None:
+                pass
+
+            def do_POST(self) -> None:  # noqa: N802 - http.server naming
+                length = int(self.headers.get("content-length", 0))
+                raw = self.rfile.read(length)
+                body = json.loads(raw or b"{}")
+                response_format = body.get("response_format") or {}
+                content = provider._content(
+                    response_format.get("json_schema", {}).get("schema"), body.get("max_tokens")
+                )
+                delay, status = provider._plan()
+                time.sleep(delay + (provider._decode_time(content) if status == 200 else 0.0))
+                if status != 200:
+                    payload = json.dumps({"error": {"message": "fake provider error"}}).encode()
+                elif body.get("stream"):
+                    self._stream(content)
+                    return
+                else:
+                    payload = json.dumps(
+                        {
+                            "choices": [{"message": {"role": "assistant", "content": content}}],
+                            "usage": {
+                                "prompt_tokens": _estimate_tokens(raw.decode()),
+                                "completion_tokens": _estimate_tokens(content),
+                            },
+                        }
+                    ).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("content-type", "application/json")
+                    self.send_header("content-length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client gave up, e.g. a cancelled hedge.
+
+            def _stream(self, content: str) -> None:
+                self.send_response(200)
+                self.send_header("content-type", "text/event-stream")
+                self.send_header("connection", "close")
+                self.end_headers()
+                try:
+                    for text in provider._chunks(content):
+                        chunk = {"choices": [{"delta": {"content": text}}]}
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                        self.wfile.flush()
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                self.close_connection = True
+
+        return Handler
+
+    def start(self) -> "FakeProvider":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeProvider":
+        return self.start()
+
+    def __exit__(self, *_: object) -> None:
+        self.stop()
+
+
+class FakeBedrockError(Exception):
+    """Raised by :class:`FakeBedrockClient`; carries a ``response`` shaped like botocore's ``ClientError``."""
+
+    _CODES = {429: "ThrottlingException", 503: "ServiceUnavailableException", 400: "ValidationException"}
+
+    def __init__(self, status: int) -> None:
+        code = self._CODES.get(status, "InternalServerException")
+        super().__init__(f"An error occurred ({code}) when calling the fake Bedrock client")
+        self.response = {
+            "Error": {"Code": code, "Message": "fake provider error"},
+            "ResponseMetadata": {"HTTPStatusCode": status},
+        }
+
+
+class FakeBedrockClient(_FakeBackend):
+    """A stand-in for a boto3 ``bedrock-runtime`` client with ``converse`` and ``converse_stream``.
+
+    Calls block for the sampled latency like the real client, so the async LLM
+    client runs them on its executor as usual.
+    """
+
+    @staticmethod
+    def _schema(request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return request.get("responseFormat", {}).get("json", {}).get("schema")
+
+    def _answer(self, request: Dict[str, Any]) -> str:
+        content = self._content(self._schema(request), request.get("inferenceConfig", {}).get("maxTokens"))
+        delay, status = self._plan()
+        if status != 200:
+            time.sleep(delay)
+            raise FakeBedrockError(status)
+        time.sleep(delay + self._decode_time(content))
+        return content
+
+    def converse(self, **request: Any) -> Dict[str, Any]:
+        content = self._answer(request)
+        return {
+            "output": {"message": {"role": "assistant", "content": [{"text": content}]}},
+            "stopReason": "end_turn",
+            "usage": {
+                "inputTokens": _estimate_tokens(json.dumps(request.get("messages", []))),
+                "outputTokens": _estimate_tokens(content),
+            },
+        }
+
+    def converse_stream(self, **request: Any) -> Dict[str, Any]:
+        content = self._answer(request)
+
+        def events() -> Iterator[Dict[str, Any]]:
+            yield {"messageStart": {"role": "assistant"}}
+            for text in self._chunks(content):
+                yield {"contentBlockDelta": {"contentBlockIndex": 0, "delta": {"text": text}}}
+            yield {"messageStop": {"stopReason": "end_turn"}}
+
+        return {"stream": events()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.2, help="Median seconds before the first byte.")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds per generated token.")
+    parser.add_argument("--stall-probability", type=float, default=0.0)
+    parser.add_argument("--stall-latency", type=float, default=2.0)
+    parser.add_argument("--error-probability", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--chunk-interval", type=float, default=0.0, help="Seconds between streamed chunks.")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    profile = FakeProviderProfile(
+        latency=args.latency,
+        jitter=args.jitter,
+        token_latency=args.token_latency,
+        stall_probability=args.stall_probability,
+        stall_latency=args.stall_latency,
+        error_probability=args.error_probability,
+        error_status=args.error_status,
+        chunk_interval=args.chunk_interval,
+        seed=args.seed,
+    )
+    with FakeProvider(profile, port=args.port) as provider:
+        print(f"fake provider listening on {provider.api_base}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Latency statistics and JSON result files shared by the benchmarks.
+
+A result file records one run: the benchmark name, when and on which commit it
+ran, its parameters, and a mapping of case name to metrics. Two files of the
+same benchmark can be compared case by case with :func:`print_comparison`.
+"""
+
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Metrics compared between runs; any other metric in a case is informational.
+HIGHER_IS_BETTER = ("throughput_rps",)
+LOWER_IS_BETTER = ("p50", "p95", "p99", "mean", "us_per_op", "error_rate")
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    """Return p50/p95/p99 and the mean of ``latencies`` (seconds) in milliseconds."""
+
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0}
+
+    def pick(p: float) -> float:
+        return ordered[min(int(p * len(ordered)), len(ordered) - 1)] * 1000
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "mean": statistics.fmean(ordered) * 1000}
+
+
+def _commit() -> str:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=False)
+    except OSError:
+        return "unknown"
+    return result.stdout.strip() or "unknown"
+
+
+def save_results(path: str, benchmark: str, parameters: Dict[str, Any], cases: Dict[str, Dict[str, float]]) -> None:
+    """Write one run to ``path`` as JSON."""
+
+    document = {
+        "benchmark": benchmark,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "parameters": parameters,
+        "cases": cases,
+    }
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+    print(f"\nresults written to {path}")
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    """Read a result file written by :func:`save_results`."""
+
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def print_comparison(baseline: Dict[str, Any], cases: Dict[str, Dict[str, float]]) -> None:
+    """Print the relative change of every metric shared by ``baseline`` and this run."""
+
+    print(f"\ncompared with {baseline.get('commit', '?')} ({baseline.get('created', '?')}); + is better")
+    for case, metrics in cases.items():
+        before = baseline.get("cases", {}).get(case)
+        if not before:
+            print(f"  {case:<28} (not in baseline)")
+            continue
+        changes = []
+        for metric, value in metrics.items():
+            old = before.get(metric)
+            if not old or metric not in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+                continue
+            change = (value - old) / old
+            if metric in LOWER_IS_BETTER:
+                change = -change
+            changes.append(f"{metric} {change:+.1%}")
+        print(f"  {case:<28} {'  '.join(changes)}")
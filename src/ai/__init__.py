@@ -1,7 +1,29 @@
 """AI-facing utilities for orchestrating LLM backed interaction analysis."""
 
-from .client import LLMClient
+from .client import AsyncLLMClient, LLMClient
 from .config import LLMProvider, LLMSettings, load_settings
 from .prompts import build_interaction_prompt
+from .router import AsyncLLMRouter, LLMRouter
+from .registry import (
+    ClientRegistry,
+    aclose_client_registry,
+    close_client_registry,
+    get_client_registry,
+    set_client_registry,
+)
 
-__all__ = ["LLMClient", "LLMProvider", "LLMSettings", "build_interaction_prompt", "load_settings"]
+__all__ = [
+    "AsyncLLMClient",
+    "AsyncLLMRouter",
+    "ClientRegistry",
+    "LLMClient",
+    "LLMProvider",
+    "LLMRouter",
+    "LLMSettings",
+    "aclose_client_registry",
+    "build_interaction_prompt",
+    "close_client_registry",
+    "get_client_registry",
+    "load_settings",
+    "set_client_registry",
+]
@@ -0,0 +1,403 @@
+"""Client-side admission control for provider calls.
+
+Every asyncio provider client owns an :class:`AdmissionController` that decides
+whether a completion may start now, must wait, or should be refused:
+
+* an AIMD concurrency limit grows by one call per round trip while latency stays
+  near the observed no-load baseline. It shrinks multiplicatively when latency
+  rises past ``LLM_ADMISSION_LATENCY_TOLERANCE`` times that baseline or the
+  provider signals overload (429, 503, timeouts, Bedrock throttling);
+* an optional token bucket (``LLM_RATE_LIMIT_TPM``) charges each call its
+  estimated prompt plus completion tokens and settles the difference once the
+  provider reports actual usage;
+* callers over the limit wait in a bounded priority queue. Interactive requests
+  go ahead of batch work, a full queue evicts its lowest-priority waiter, and a
+  caller whose queue deadline passes (or is predicted to pass) is refused with
+  :class:`AdmissionRejected` straight away instead of timing out later. A
+  caller's request deadline (:mod:`src.ai.deadline`) shortens its queue
+  deadline.
+
+The API maps :class:`AdmissionRejected` to ``503 Service Unavailable``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import json
+import itertools
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+import httpx
+
+from .config import LLMSettings
+from .deadline import remaining
+from .metrics import observe_stage, record_admission_rejection
+from .prompts import estimate_tokens
+
+_OVERLOAD_STATUSES = frozenset({429, 503, 504})
+_OVERLOAD_BEDROCK_CODES = frozenset({"ThrottlingException", "ServiceUnavailableException", "ModelTimeoutException"})
+
+
+class Priority(IntEnum):
+    """Admission priority; lower values are served first."""
+
+    INTERACTIVE = 0
+    BATCH = 10
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a provider call is shed instead of queued or started."""
+
+    def __init__(self, reason: str, *, retry_after: float = 1.0) -> None:
+        super().__init__(f"Provider capacity exhausted ({reason}); retry later.")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+_UNSET: Any = object()
+_priority: ContextVar[Priority] = ContextVar("admission_priority", default=Priority.INTERACTIVE)
+_queue_timeout: ContextVar[Any] = ContextVar("admission_queue_timeout", default=_UNSET)
+
+
+@contextmanager
+def admission_priority(priority: Priority, *, queue_timeout: Any = _UNSET) -> Iterator[None]:
+    """Run provider calls made in this context at ``priority``.
+
+    ``queue_timeout`` overrides ``LLM_ADMISSION_QUEUE_TIMEOUT``; ``None`` waits
+    for a slot indefinitely (offline batch work).
+    """
+
+    priority_token = _priority.set(priority)
+    timeout_token = _queue_timeout.set(queue_timeout)
+    try:
+        yield
+    finally:
+        _queue_timeout.reset(timeout_token)
+        _priority.reset(priority_token)
+
+
+def is_overload(exc: BaseException) -> bool:
+    """Return whether ``exc`` means the provider is saturated rather than the request being bad."""
+
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in _OVERLOAD_STATUSES
+    if isinstance(exc, (httpx.TimeoutException, asyncio.TimeoutError, TimeoutError)):
+        return True
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):  # botocore.exceptions.ClientError
+        return response.get("Error", {}).get("Code") in _OVERLOAD_BEDROCK_CODES
+    return False
+
+
+class TokenBucket:
+    """Tokens-per-minute budget that refills continuously up to one minute's worth."""
+
+    def __init__(self, tokens_per_minute: int, *, clock: Callable[[], float] = time.monotonic) -> None:
+        self.capacity = float(tokens_per_minute)
+        self._rate = tokens_per_minute / 60.0
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def wait_time(self, tokens: int) -> float:
+        """Seconds until ``tokens`` could be taken."""
+
+        self._refill()
+        missing = min(float(tokens), self.capacity) - self._tokens
+        return max(0.0, missing / self._rate)
+
+    async def acquire(self, tokens: int, *, deadline: Optional[float]) -> None:
+        """Take ``tokens``, waiting for the refill unless that would overrun ``deadline``."""
+
+        while True:
+            wait = self.wait_time(tokens)
+            if wait <= 0:
+                self._tokens -= min(float(tokens), self.capacity)
+                return
+            if deadline is not None and self._clock() + wait > deadline:
+                raise AdmissionRejected("token rate limit", retry_after=wait)
+            await asyncio.sleep(wait)
+
+    def settle(self, delta: int) -> None:
+        """Charge (positive) or refund (negative) the gap between estimated and actual usage."""
+
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens - delta)
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+
+class AIMDLimiter:
+    """Additive-increase / multiplicative-decrease concurrency limit driven by latency."""
+
+    def __init__(
+        self,
+        *,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        tolerance: float,
+        backoff: float = 0.9,
+        overload_backoff: float = 0.5,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._clock = clock
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._minimum = minimum
+        self._maximum = maximum
+        self._tolerance = tolerance
+        self._backoff = backoff
+        self._overload_backoff = overload_backoff
+        self.baseline: Optional[float] = None
+        self.ewma_latency: Optional[float] = None
+        self._last_decrease: Optional[float] = None
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def _decrease(self, factor: float) -> None:
+        # At most one decrease per round trip, otherwise one slow burst collapses the limit.
+        now = self._clock()
+        if self._last_decrease is not None and now - self._last_decrease < (self.ewma_latency or 0.0):
+            return
+        self._last_decrease = now
+        self._limit = max(float(self._minimum), self._limit * factor)
+
+    def on_success(self, latency: float) -> None:
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency += 0.2 * (latency - self.ewma_latency)
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            # Let the no-load baseline drift up slowly so a permanent shift (bigger model) is absorbed.
+            self.baseline += 0.01 * (latency - self.baseline)
+        if latency > self.baseline * self._tolerance:
+            self._decrease(self._backoff)
+        else:
+            self._limit = min(float(self._maximum), self._limit + 1.0 / self._limit)
+
+    def on_overload(self) -> None:
+        self._decrease(self._overload_backoff)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    sequence: int
+    future: "asyncio.Future[None]" = field(compare=False)
+
+
+@dataclass
+class Ticket:
+    """Handed to the caller while admitted; set ``actual_tokens`` once usage is known."""
+
+    estimated_tokens: int
+    actual_tokens: Optional[int] = None
+
+
+class AdmissionController:
+    """Concurrency limit, rate limit and priority queue in front of one provider client."""
+
+    def __init__(self, settings: LLMSettings, *, clock: Callable[[], float] = time.monotonic) -> None:
+        self._settings = settings
+        self._clock = clock
+        self._limiter = AIMDLimiter(
+            initial=settings.admission_initial_concurrency,
+            minimum=settings.admission_min_concurrency,
+            maximum=settings.admission_max_concurrency,
+            tolerance=settings.admission_latency_tolerance,
+            clock=clock,
+        )
+        self._bucket = TokenBucket(settings.rate_limit_tpm, clock=clock) if settings.rate_limit_tpm else None
+        self._queue: List[_Waiter] = []
+        self._queued = 0
+        self._in_flight = 0
+        self._sequence = itertools.count()
+        self._counters: Dict[str, int] = {
+            "admitted": 0,
+            "waited": 0,
+            "rejected_queue_full": 0,
+            "rejected_deadline": 0,
+            "rejected_rate_limit": 0,
+            "evicted": 0,
+        }
+
+    def _queue_timeout(self) -> Optional[float]:
+        timeout = _queue_timeout.get()
+        if timeout is _UNSET:
+            timeout = self._settings.admission_queue_timeout_seconds
+        # Never queue past the caller's deadline.
+        left = remaining()
+        if left is not None:
+            timeout = max(left, 0.0) if timeout is None else min(timeout, max(left, 0.0))
+        return timeout
+
+    def _predicted_wait(self) -> float:
+        latency = self._limiter.ewma_latency
+        if latency is None:
+            return 0.0
+        return (self._queued + 1) / max(self._limiter.limit, 1) * latency
+
+    def _reject(self, counter: str, reason: str, retry_after: Optional[float] = None) -> AdmissionRejected:
+        self._counters[counter] += 1
+        record_admission_rejection(counter[len("rejected_") :])
+        return AdmissionRejected(reason, retry_after=retry_after or self._limiter.ewma_latency or 1.0)
+
+    def _grant_next(self) -> None:
+        while self._queue and self._in_flight < self._limiter.limit:
+            waiter = heapq.heappop(self._queue)
+            if waiter.future.done():  # Timed out, cancelled or evicted while queued.
+                continue
+            self._queued -= 1
+            self._in_flight += 1
+            waiter.future.set_result(None)
+
+    def _evict_for(self, priority: int) -> bool:
+        """Make room for a ``priority`` caller by shedding the lowest-priority queued waiter."""
+
+        live = [waiter for waiter in self._queue if not waiter.future.done()]
+        if not live:
+            return False
+        worst = max(live)
+        if worst.priority <= priority:
+            return False
+        self._queued -= 1
+        self._counters["evicted"] += 1
+        record_admission_rejection("evicted")
+        worst.future.set_exception(AdmissionRejected("evicted by higher-priority work"))
+        return True
+
+    async def _acquire_slot(self, priority: int, timeout: Optional[float]) -> None:
+        if self._in_flight < self._limiter.limit and not self._queued:
+            self._in_flight += 1
+            return
+        if timeout is not None and self._predicted_wait() > timeout:
+            raise self._reject("rejected_deadline", "predicted queue wait exceeds deadline")
+        if self._queued >= self._settings.admission_max_queue and not self._evict_for(priority):
+            raise self._reject("rejected_queue_full", "admission queue full")
+
+        future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, _Waiter(priority, next(self._sequence), future))
+        self._queued += 1
+        self._counters["waited"] += 1
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._queued -= 1
+            raise self._reject("rejected_deadline", "queue deadline exceeded") from None
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self._release()  # Granted a slot just as the caller went away.
+            elif not future.done() or future.cancelled():
+                self._queued -= 1
+            raise
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._grant_next()
+
+    @asynccontextmanager
+    async def admit(self, estimated_tokens: int, *, observe_latency: bool = True) -> AsyncIterator[Ticket]:
+        """Hold a call slot (and rate-limit tokens) for the duration of one provider call.
+
+        Streams pass ``observe_latency=False``: their duration tracks output
+        length, not provider load, and would drag the limit down.
+        """
+
+        timeout = self._queue_timeout()
+        deadline = None if timeout is None else self._clock() + timeout
+        arrived = time.perf_counter()
+        await self._acquire_slot(int(_priority.get()), timeout)
+        ticket = Ticket(estimated_tokens=estimated_tokens)
+        started = time.perf_counter()
+        try:
+            if self._bucket is not None:
+                try:
+                    await self._bucket.acquire(estimated_tokens, deadline=deadline)
+                except AdmissionRejected:
+                    self._counters["rejected_rate_limit"] += 1
+                    record_admission_rejection("rate_limit")
+                    raise
+            self._counters["admitted"] += 1
+            started = time.perf_counter()
+            observe_stage("admission_wait", self._settings.provider.value, started - arrived)
+            yield ticket
+        except Exception as exc:
+            if is_overload(exc):
+                self._limiter.on_overload()
+            raise
+        else:
+            if observe_latency:
+                self._limiter.on_success(time.perf_counter() - started)
+            if self._bucket is not None and ticket.actual_tokens is not None:
+                self._bucket.settle(ticket.actual_tokens - estimated_tokens)
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Current limit, occupancy and shedding counters."""
+
+        stats: Dict[str, Any] = {
+            "limit": self._limiter.limit,
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "baseline_latency_ms": _ms(self._limiter.baseline),
+            "ewma_latency_ms": _ms(self._limiter.ewma_latency),
+            **self._counters,
+        }
+        if self._bucket is not None:
+            stats["rate_limit_tokens_available"] = int(self._bucket.available)
+        return stats
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def usage_tokens(raw_response: Dict[str, Any]) -> Optional[int]:
+    """Total tokens reported by an OpenAI-style completion, if any."""
+
+    usage = raw_response.get("usage") or {}
+    if "prompt_tokens" not in usage:
+        return None
+    return int(usage.get("prompt_tokens", 0)) + int(usage.get("completion_tokens", 0))
+
+
+def estimate_call_tokens(
+    settings: LLMSettings,
+    prompt: str,
+    response_format: Optional[Dict[str, Any]],
+    max_tokens: Optional[int] = None,
+) -> int:
+    """Estimate a call's prompt plus completion tokens for the rate limiter.
+
+    A ``max_tokens`` budget below ``LLM_ESTIMATED_COMPLETION_TOKENS`` bounds the completion estimate.
+    """
+
+    schema_chars = 0
+    if response_format:
+        schema_chars = len(getattr(response_format, "encoded", None) or json.dumps(response_format))
+    return (
+        estimate_tokens(settings.system_prompt)
+        + estimate_tokens(prompt)
+        + (schema_chars + 3) // 4
+        + min(settings.estimated_completion_tokens, max_tokens or settings.estimated_completion_tokens)
+    )
+
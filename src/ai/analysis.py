@@ -2,38 +2,515 @@
 
 from __future__ import annotations
 
-from json import JSONDecodeError
+from contextlib import nullcontext
+from functools import partial
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
 
-from pydantic import ValidationError
+from ..models import StackUpdateRequest, SupplementInteractionRequest, SupplementInteractionResponse
+from .biomarkers import flag_biomarkers
+from .cache import ReportCache, build_cache_key, build_update_key, cache_meta, get_report_cache
+from .cascade import (
+    LARGE_TIER,
+    SMALL_TIER,
+    STACK_SIZE,
+    STREAMING,
+    CascadeTrace,
+    escalation_reasons,
+    exceeds_stack_size,
+)
+from .client import AsyncLLMClient, LLMClient
+from .compact import cap_sections, expand_report
+from .config import AnalysisMode, LLMSettings, OutputFormat, load_settings
+from .incremental import StackEdit, apply_edit, plan_edit, plan_update_units
+from .knowledge_base import get_knowledge_base
+from .metrics import record_cache_lookup, stage
+from .pairwise import (
+    analyse_units,
+    analyse_units_async,
+    generate_pairwise_report,
+    generate_pairwise_report_async,
+    knowledge_base_report,
+)
+from .precompute import get_precomputed_store
+from .prompts import PromptParts, build_interaction_prompt_parts, prompt_token_counts
+from .registry import get_client_registry
+from .repair import Repair, completion_content, repair_completion, repair_completion_async, repair_content
+from .schema import COMPACT_REPORT_SCHEMA, REPORT_SCHEMA, CompiledSchema
+from .singleflight import AsyncSingleFlight, SingleFlight
+from .streaming import IncrementalReportParser, StreamEvent, report_events
 
-from ..models import SupplementInteractionRequest, SupplementInteractionResponse
-from .client import LLMClient
-from .config import load_settings
-from .prompts import build_interaction_prompt
+# Process-wide groups so identical concurrent requests share one provider call.
+_flights: SingleFlight[SupplementInteractionResponse] = SingleFlight()
+_async_flights: AsyncSingleFlight[SupplementInteractionResponse] = AsyncSingleFlight()
 
 
-def _response_format_schema() -> dict[str, object]:
-    """Return the structured response schema consumed by the OpenAI API."""
+def generate_interaction_report(
+    request: SupplementInteractionRequest, *, client: Optional[LLMClient] = None
+) -> SupplementInteractionResponse:
+    """Invoke the LLM to produce an interaction report for the given request.
 
-    schema = SupplementInteractionResponse.model_json_schema()
-    return {"type": "json_schema", "json_schema": {"name": "interaction_report", "schema": schema}}
+    The shared client from :func:`get_client_registry` is used unless one is passed in.
+    Stacks fully covered by the local knowledge base are answered without the model.
+    Otherwise reports are served from :func:`get_report_cache` when an equivalent
+    stack was analysed before under the same model and prompt, or from the
+    precomputed reports of popular stacks, and concurrent requests for the same
+    stack share one provider call.
+    """
 
+    if client is None:
+        client = get_client_registry().get_client()
+    curated = _curated_report(request, client.settings)
+    if curated is not None:
+        return curated
+    cache = get_report_cache()
+    key = build_cache_key(request, client.settings)
+    cached = _cached_report(cache, key) or _precomputed_report(key)
+    if cached is not None:
+        return cached
 
-def generate_interaction_report(request: SupplementInteractionRequest) -> SupplementInteractionResponse:
-    """Invoke the LLM to produce an interaction report for the given request."""
+    report, shared = _flights.do(
+        key,
+        lambda: _store_report(cache, key, _generate(request, client)),
+        timeout=client.settings.report_timeout_seconds,
+    )
+    return _coalesced(report) if shared else report
 
-    settings = load_settings()
-    prompt = build_interaction_prompt(request)
-    with LLMClient(settings) as client:
+
+async def generate_interaction_report_async(
+    request: SupplementInteractionRequest, *, client: Optional[AsyncLLMClient] = None
+) -> SupplementInteractionResponse:
+    """Asyncio variant of :func:`generate_interaction_report` that never blocks the event loop."""
+
+    if client is None:
+        client = get_client_registry().get_async_client()
+    curated = _curated_report(request, client.settings)
+    if curated is not None:
+        return curated
+    cache = get_report_cache()
+    key = build_cache_key(request, client.settings)
+    cached = _cached_report(cache, key) or _precomputed_report(key)
+    if cached is not None:
+        return cached
+
+    async def generate() -> SupplementInteractionResponse:
+        return _store_report(cache, key, await _generate_async(request, client))
+
+    report, shared = await _async_flights.do(key, generate, timeout=client.settings.report_timeout_seconds)
+    return _coalesced(report) if shared else report
+
+
+def update_interaction_report(
+    update: StackUpdateRequest, *, client: Optional[LLMClient] = None
+) -> SupplementInteractionResponse:
+    """Re-analyse a stack after an edit, reusing the previous report.
+
+    Findings involving removed supplements are dropped and only the units that
+    involve added supplements are analysed; see :mod:`src.ai.incremental`. When
+    the previous report was loaded through ``previous_key``, the merged report is
+    cached under its own update key so the next edit can pass that key as
+    ``previous_key``; a client-supplied ``previous`` is never cached. If the
+    referenced previous report is no longer cached, the new stack is analysed in full.
+    """
+
+    if client is None:
+        client = get_client_registry().get_client()
+    cache = get_report_cache()
+    edit = plan_edit(update.supplements, update.added, update.removed)
+    request = SupplementInteractionRequest(supplements=edit.supplements)
+    previous = _previous_report(update, cache)
+    if previous is None:
+        return _full_update(generate_interaction_report(request, client=client), edit)
+
+    units = plan_update_units(edit)
+    with stage("report", client.settings.provider.value):
+        report = apply_edit(previous, edit, units, *analyse_units(units, client))
+    return _store_update(update, cache, build_update_key(request, client.settings), report)
+
+
+async def update_interaction_report_async(
+    update: StackUpdateRequest, *, client: Optional[AsyncLLMClient] = None
+) -> SupplementInteractionResponse:
+    """Asyncio variant of :func:`update_interaction_report`."""
+
+    if client is None:
+        client = get_client_registry().get_async_client()
+    cache = get_report_cache()
+    edit = plan_edit(update.supplements, update.added, update.removed)
+    request = SupplementInteractionRequest(supplements=edit.supplements)
+    previous = _previous_report(update, cache)
+    if previous is None:
+        return _full_update(await generate_interaction_report_async(request, client=client), edit)
+
+    units = plan_update_units(edit)
+    with stage("report", client.settings.provider.value):
+        report = apply_edit(previous, edit, units, *await analyse_units_async(units, client))
+    return _store_update(update, cache, build_update_key(request, client.settings), report)
+
+
+async def stream_interaction_report(
+    request: SupplementInteractionRequest, *, client: Optional[AsyncLLMClient] = None
+) -> AsyncIterator[StreamEvent]:
+    """Yield report sections as server-sent events while the model is still generating.
+
+    Knowledge base and cache hits are replayed immediately. Otherwise the
+    monolithic prompt is streamed from the provider and each summary, conflict,
+    synergy, depletion, optimization and dosage warning is emitted as soon as it
+    is complete. A final ``report`` event carries the fully validated report.
+    """
+
+    if client is None:
+        client = get_client_registry().get_async_client()
+    curated = _curated_report(request, client.settings)
+    if curated is not None:
+        for event in report_events(curated):
+            yield event
+        return
+    cache = get_report_cache()
+    key = build_cache_key(request, client.settings)
+    cached = _cached_report(cache, key) or _precomputed_report(key)
+    if cached is not None:
+        for event in report_events(cached):
+            yield event
+        return
+
+    trace: Optional[CascadeTrace] = None
+    if client.settings.analysis_mode == AnalysisMode.CASCADE:
+        # Streamed sections cannot be taken back, so cascade mode streams the large model's answer.
+        client = get_client_registry().get_async_escalation_client()
+        trace = CascadeTrace()
+        trace.reasons = [STREAMING]
+    provider = client.settings.provider.value
+    with stage("prompt_build", provider):
+        # The incremental parser follows the full format's section names, so streams never use compact output.
+        parts, schema = _report_prompt(request, client.settings, compact_allowed=False)
+    response_format = schema.response_format
+    parser = IncrementalReportParser()
+    with trace.tier(LARGE_TIER, client.settings) if trace is not None else nullcontext():
+        async for delta in client.stream_chat_completion(
+            prompt=parts.text, response_format=response_format, max_tokens=client.settings.output_max_tokens
+        ):
+            for event in parser.feed(delta):
+                yield event
+        repair = await repair_completion_async(schema, parser.document, client)
+    report = _repaired_report(repair)
+    report.meta["prompt"] = _prompt_meta(parts, client.settings, response_format)
+    if trace is not None:
+        trace.attach(report)
+    report = _store_report(cache, key, report)
+    yield StreamEvent("report", report.model_dump(mode="json"))
+
+
+def _generate(request: SupplementInteractionRequest, client: LLMClient) -> SupplementInteractionResponse:
+    provider = client.settings.provider.value
+    with stage("report", provider):
+        if client.settings.analysis_mode == AnalysisMode.PAIRWISE:
+            return generate_pairwise_report(request, client)
+        if client.settings.analysis_mode == AnalysisMode.CASCADE:
+            return _generate_cascade(request, client, get_client_registry().get_escalation_client())
+
+        with stage("prompt_build", provider):
+            parts, schema = _report_prompt(request, client.settings)
+        response_format = schema.response_format
         raw_response = client.create_chat_completion(
-            prompt=prompt,
-            response_format=_response_format_schema(),
+            prompt=parts.text,
+            response_format=response_format,
+            max_tokens=client.settings.output_max_tokens,
+        )
+        report = _repaired_report(repair_completion(schema, completion_content(raw_response), client))
+        report.meta["prompt"] = _prompt_meta(parts, client.settings, response_format, raw_response.get("usage"))
+        return report
+
+
+async def _generate_async(
+    request: SupplementInteractionRequest, client: AsyncLLMClient
+) -> SupplementInteractionResponse:
+    provider = client.settings.provider.value
+    with stage("report", provider):
+        if client.settings.analysis_mode == AnalysisMode.PAIRWISE:
+            return await generate_pairwise_report_async(request, client)
+        if client.settings.analysis_mode == AnalysisMode.CASCADE:
+            return await _generate_cascade_async(
+                request, client, get_client_registry().get_async_escalation_client()
+            )
+
+        with stage("prompt_build", provider):
+            parts, schema = _report_prompt(request, client.settings)
+        response_format = schema.response_format
+        raw_response = await client.create_chat_completion(
+            prompt=parts.text,
+            response_format=response_format,
+            max_tokens=client.settings.output_max_tokens,
+        )
+        repair = await repair_completion_async(schema, completion_content(raw_response), client)
+        report = _repaired_report(repair)
+        report.meta["prompt"] = _prompt_meta(parts, client.settings, response_format, raw_response.get("usage"))
+        return report
+
+
+def _report_prompt(
+    request: SupplementInteractionRequest, settings: LLMSettings, *, compact_allowed: bool = True
+) -> Tuple[PromptParts, CompiledSchema[SupplementInteractionResponse]]:
+    """The monolithic prompt for ``request`` and the schema its answer is requested and parsed with."""
+
+    compact = compact_allowed and settings.output_format == OutputFormat.COMPACT
+    parts = build_interaction_prompt_parts(request, compact=compact, caps=settings.output_section_caps)
+    return parts, _report_schema(settings, request.supplements if compact else None)
+
+
+def _report_schema(
+    settings: LLMSettings, compact_stack: Optional[Sequence[str]] = None
+) -> CompiledSchema[SupplementInteractionResponse]:
+    """Parse compact output against ``compact_stack``, and cut sections to ``LLM_OUTPUT_SECTION_CAPS``."""
+
+    caps = settings.output_section_caps
+    if compact_stack is not None:
+        return COMPACT_REPORT_SCHEMA.with_decoder(partial(expand_report, supplements=tuple(compact_stack), caps=caps))
+    if caps:
+        return REPORT_SCHEMA.with_decoder(partial(cap_sections, caps=caps))
+    return REPORT_SCHEMA
+
+
+def _small_tier_repair(
+    schema: CompiledSchema[SupplementInteractionResponse], raw_response: Dict[str, Any], settings: LLMSettings
+) -> Repair[SupplementInteractionResponse]:
+    # No fix-up call: escalating to the large model takes its place.
+    return repair_content(
+        schema,
+        completion_content(raw_response),
+        enabled=settings.repair_enabled,
+        provider=settings.provider.value,
+        final=False,
+    )
+
+
+def _tier_report(
+    trace: CascadeTrace,
+    repair: Repair[SupplementInteractionResponse],
+    parts: PromptParts,
+    settings: LLMSettings,
+    response_format: Dict[str, Any],
+    raw_response: Dict[str, Any],
+) -> SupplementInteractionResponse:
+    report = _repaired_report(repair)
+    report.meta["prompt"] = _prompt_meta(parts, settings, response_format, raw_response.get("usage"))
+    return trace.attach(report)
+
+
+def _generate_cascade(
+    request: SupplementInteractionRequest, client: LLMClient, escalation: LLMClient
+) -> SupplementInteractionResponse:
+    """Answer with ``client`` unless :mod:`src.ai.cascade` calls for ``escalation``."""
+
+    with stage("prompt_build", client.settings.provider.value):
+        parts, schema = _report_prompt(request, client.settings)
+    response_format = schema.response_format
+    max_tokens = client.settings.output_max_tokens
+    trace = CascadeTrace()
+    if exceeds_stack_size(request, client.settings):
+        trace.reasons = [STACK_SIZE]
+    else:
+        with trace.tier(SMALL_TIER, client.settings):
+            raw_response = client.create_chat_completion(
+                prompt=parts.text, response_format=response_format, max_tokens=max_tokens
+            )
+            repair = _small_tier_repair(schema, raw_response, client.settings)
+        trace.reasons = escalation_reasons(repair)
+        if not trace.reasons:
+            return _tier_report(trace, repair, parts, client.settings, response_format, raw_response)
+
+    with trace.tier(LARGE_TIER, escalation.settings):
+        raw_response = escalation.create_chat_completion(
+            prompt=parts.text, response_format=response_format, max_tokens=max_tokens
+        )
+        repair = repair_completion(schema, completion_content(raw_response), escalation)
+    return _tier_report(trace, repair, parts, escalation.settings, response_format, raw_response)
+
+
+async def _generate_cascade_async(
+    request: SupplementInteractionRequest, client: AsyncLLMClient, escalation: AsyncLLMClient
+) -> SupplementInteractionResponse:
+    """Asyncio variant of :func:`_generate_cascade`."""
+
+    with stage("prompt_build", client.settings.provider.value):
+        parts, schema = _report_prompt(request, client.settings)
+    response_format = schema.response_format
+    max_tokens = client.settings.output_max_tokens
+    trace = CascadeTrace()
+    if exceeds_stack_size(request, client.settings):
+        trace.reasons = [STACK_SIZE]
+    else:
+        with trace.tier(SMALL_TIER, client.settings):
+            raw_response = await client.create_chat_completion(
+                prompt=parts.text, response_format=response_format, max_tokens=max_tokens
+            )
+            repair = _small_tier_repair(schema, raw_response, client.settings)
+        trace.reasons = escalation_reasons(repair)
+        if not trace.reasons:
+            return _tier_report(trace, repair, parts, client.settings, response_format, raw_response)
+
+    with trace.tier(LARGE_TIER, escalation.settings):
+        raw_response = await escalation.create_chat_completion(
+            prompt=parts.text, response_format=response_format, max_tokens=max_tokens
         )
+        repair = await repair_completion_async(schema, completion_content(raw_response), escalation)
+    return _tier_report(trace, repair, parts, escalation.settings, response_format, raw_response)
+
+
+def _repaired_report(repair: Repair[SupplementInteractionResponse]) -> SupplementInteractionResponse:
+    report = repair.unwrap(REPORT_SCHEMA)
+    report.meta["repair"] = repair.meta()
+    return report
+
+
+def _prompt_meta(
+    parts: PromptParts,
+    settings: LLMSettings,
+    response_format: Dict[str, Any],
+    usage: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Describe the prompt that was sent: per-section token estimates plus provider-reported usage."""
+
+    meta = prompt_token_counts(
+        parts,
+        system_prompt=settings.system_prompt,
+        response_format=response_format if settings.structured_output else None,
+    )
+    if usage:
+        meta["usage"] = usage
+    return meta
+
+
+def build_report_completion_body(
+    request: SupplementInteractionRequest, client: LLMClient | AsyncLLMClient
+) -> Dict[str, Any]:
+    """Return the chat completion body for a monolithic report, e.g. for offline batch files.
+
+    Batch lines are shared by every ordering of a stack, so they never use compact output,
+    whose supplement numbers depend on the order.
+    """
+
+    parts, schema = _report_prompt(request, client.settings, compact_allowed=False)
+    return client.chat_completion_payload(
+        prompt=parts.text,
+        response_format=schema.response_format,
+        max_tokens=client.settings.output_max_tokens,
+    )
+
+
+def _coalesced(report: SupplementInteractionResponse) -> SupplementInteractionResponse:
+    """Give a follower its own copy of the leader's report so ``meta`` can differ per caller."""
+
+    copy = report.model_copy(deep=True)
+    copy.meta["coalesced"] = True
+    return copy
+
+
+def _previous_report(
+    update: StackUpdateRequest, cache: Optional[ReportCache]
+) -> Optional[SupplementInteractionResponse]:
+    if update.previous is not None:
+        return update.previous
+    if not update.previous_key:
+        return None
+    return _cached_report(cache, update.previous_key) or _precomputed_report(update.previous_key)
+
+
+def _store_update(
+    update: StackUpdateRequest, cache: Optional[ReportCache], key: str, report: SupplementInteractionResponse
+) -> SupplementInteractionResponse:
+    """Cache a merged update report, unless it was built on a client-supplied ``previous``.
+
+    A client can send any report as ``previous``, so merging it must not write to a cache other callers read.
+    """
+
+    if update.previous is not None:
+        report.meta["cache"] = {"hit": False, "stored": False, "enabled": cache is not None}
+        return report
+    return _store_report(cache, key, report)
+
+
+def _full_update(report: SupplementInteractionResponse, edit: StackEdit) -> SupplementInteractionResponse:
+    report.meta["incremental"] = {
+        "added": list(edit.added),
+        "removed": list(edit.removed),
+        "fallback": "previous report not cached; analysed the full stack",
+    }
+    return report
+
+
+def _curated_report(
+    request: SupplementInteractionRequest, settings: LLMSettings
+) -> Optional[SupplementInteractionResponse]:
+    kb = get_knowledge_base()
+    if kb is None:
+        return None
+    if settings.analysis_mode != AnalysisMode.PAIRWISE and flag_biomarkers(request.biomarkers):
+        # Curated findings cannot weigh the user's out-of-range labs; the model prompt does.
+        return None
+    curated = knowledge_base_report(request, kb)
+    record_cache_lookup("knowledge_base", curated is not None)
+    return curated
+
+
+def _cached_report(cache: Optional[ReportCache], key: str) -> Optional[SupplementInteractionResponse]:
+    """Return the cached report for ``key`` with lookup details recorded in ``meta``."""
+
+    if cache is None:
+        return None
+    cached = cache.get(key)
+    record_cache_lookup("report", cached is not None)
+    if cached is None:
+        return None
+    report = REPORT_SCHEMA.parse(cached)
+    report.meta["cache"] = cache_meta(cache, key, hit=True)
+    return report
+
+
+def _precomputed_report(key: str) -> Optional[SupplementInteractionResponse]:
+    """Return the report precomputed for a popular stack under ``key``, if any; see :mod:`src.ai.precompute`."""
+
+    store = get_precomputed_store()
+    if store is None:
+        return None
+    precomputed = store.get(key)
+    record_cache_lookup("precomputed", precomputed is not None)
+    if precomputed is None:
+        return None
+    report = REPORT_SCHEMA.parse(precomputed)
+    report.meta["cache"] = {"key": key, "hit": True, "precomputed": True, **store.stats()}
+    return report
+
+
+def _store_report(
+    cache: Optional[ReportCache], key: str, report: SupplementInteractionResponse
+) -> SupplementInteractionResponse:
+    """Cache a freshly generated report and record the miss in ``meta``.
+
+    Reports whose repair dropped findings or closed cut-off output are returned but not cached.
+    """
+
+    if cache is not None and not report.meta.get("repair", {}).get("lossy"):
+        cache.set(key, report.model_dump_json())
+    report.meta["cache"] = cache_meta(cache, key, hit=False)
+    return report
+
+
+def parse_report_completion(
+    raw_response: Dict[str, Any], *, settings: Optional[LLMSettings] = None
+) -> SupplementInteractionResponse:
+    """Validate the message content of an OpenAI-style chat completion into a report."""
+
+    return parse_report_content(completion_content(raw_response), settings=settings)
+
+
+def parse_report_content(content: str, *, settings: Optional[LLMSettings] = None) -> SupplementInteractionResponse:
+    """Validate raw model output text into a report, repairing it locally if needed.
 
-    choice = raw_response["choices"][0]["message"]
-    content = choice.get("content", "{}")
+    No fix-up call is made here; raises ``ValueError`` if local repair fails.
+    """
 
-    try:
-        return SupplementInteractionResponse.model_validate_json(content)
-    except (ValidationError, JSONDecodeError) as exc:  # pragma: no cover - thin wrapper
-        raise ValueError("Unable to parse LLM response into SupplementInteractionResponse") from exc
+    settings = settings or load_settings()
+    repair = repair_content(
+        _report_schema(settings), content, enabled=settings.repair_enabled, provider=settings.provider.value
+    )
+    return _repaired_report(repair)
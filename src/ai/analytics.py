@@ -0,0 +1,375 @@
+"""Local analytics behind :class:`~src.models.insights.Insight` and :class:`~src.models.insights.VitalityScore`.
+
+Adherence logs and lab results for a whole cohort arrive as columns (see
+:class:`CohortSeries`) and :func:`analyse_cohort` computes everything with
+NumPy in one pass over blocks of users:
+
+* streaks: the current and the longest run of days on which every supplement
+  of the user's stack was taken;
+* supplement-biomarker correlations: each lab result is paired with the share
+  of the preceding ``window`` days on which the supplement was taken, and the
+  Pearson correlation over a user's results gets a confidence score of
+  ``1 - p`` from the two-sided t-test of the correlation, Bonferroni-adjusted
+  for the number of pairs tested for that user;
+* the vitality score: adherence, the current streak and the share of markers
+  whose latest result is in range, weighted 50/20/30. Users without lab
+  results are scored on the first two alone.
+
+No model is called for any of it. :func:`top_insights` and
+:func:`vitality_score` turn one user's row into the response models with
+templated wording, and :func:`phrase_insights_async` optionally has the model
+reword only those few top findings; numbers, supplements and confidence scores
+always stay the engine's.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+from ..models.insights import Insight, InsightType, VitalityScore
+from .biomarkers import _SEVERITIES, _numpy, classify_ranges
+from .client import AsyncLLMClient
+from .prompts import build_insight_prompt
+from .repair import completion_content, repair_content
+from .schema import INSIGHT_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+# Days of adherence before a lab result that count as exposure to a supplement.
+DEFAULT_WINDOW = 14
+# Fewer lab results than this never yield a correlation.
+MIN_OBSERVATIONS = 4
+# A current streak of this many days earns the full streak component of the vitality score.
+STREAK_TARGET = 30
+# Shorter streaks are not worth an insight or a vitality factor.
+MIN_STREAK = 7
+# Users analysed together; bounds the temporaries to a few tens of MB.
+BLOCK_USERS = 4096
+
+_WEIGHTS = (0.5, 0.2, 0.3)
+_LEVELS = ((75, "Advanced"), (40, "Intermediate"), (0, "Beginner"))
+
+
+@dataclass(frozen=True)
+class CohortSeries:
+    """Adherence and lab history of ``U`` users over the same ``D`` days, oldest first.
+
+    ``S`` supplements and ``M`` biomarkers are shared by all users, with up to
+    ``K`` lab results per user and biomarker.
+    """
+
+    supplements: Tuple[str, ...]
+    biomarkers: Tuple[str, ...]
+    # (U, S) bool: the supplement is part of the user's stack.
+    on_stack: Any
+    # (U, S, D) bool: the supplement was taken that day.
+    adherence: Any
+    # (U, M, K) float: lab results, NaN where there are fewer than K.
+    lab_values: Any
+    # (U, M, K) int: day index of each lab result.
+    lab_days: Any
+    # (M,) or (U, M) float: reference range bounds, NaN for an open side.
+    reference_min: Any
+    reference_max: Any
+
+
+@dataclass(frozen=True)
+class CohortAnalytics:
+    """Everything :func:`analyse_cohort` computed, one row per user."""
+
+    series: CohortSeries
+    window: int
+    # (U, S) share of days the supplement was taken; 0 when it is not on the stack.
+    adherence_rate: Any
+    # (U,) days, counted back from the last day, on which the whole stack was taken.
+    current_streak: Any
+    # (U,) the longest such run in the window.
+    longest_streak: Any
+    # (U, S, M) Pearson r and its confidence score; both 0 where there are too few results.
+    correlation: Any
+    confidence: Any
+    # (U, M) lab results per biomarker.
+    observations: Any
+    # (U, M) the latest result per biomarker as classify_ranges returns it; direction 0 where there is none.
+    lab_direction: Any
+    lab_severity: Any
+    # (U,) 0-100.
+    vitality: Any
+
+
+def _pearson_confidence(np: Any, r: Any, count: Any) -> Any:
+    """``1 - p`` of the two-sided t-test of Pearson's ``r`` over ``count`` pairs.
+
+    Uses the closed forms of the Student t distribution for integer degrees of
+    freedom (Abramowitz and Stegun 26.7.3 and 26.7.4), which are exact and
+    need no special functions. With ``t = r * sqrt(df / (1 - r^2))`` the
+    angle in those formulas is simply ``arcsin(|r|)``.
+    """
+
+    df = np.broadcast_to(count - 2, r.shape)
+    sine = np.abs(r)
+    cosine_squared = 1.0 - r * r
+    # Even df: sin(theta) * (1 + 1/2 cos^2 + 1*3/(2*4) cos^4 + ... up to cos^(df-2)).
+    term = np.ones_like(r)
+    even = np.ones_like(r)
+    # Odd df: 2/pi * (theta + sin(theta) * (cos + 2/3 cos^3 + ... up to cos^(df-2))).
+    odd_term = np.sqrt(cosine_squared)
+    odd = np.where(df >= 3, odd_term, 0.0)
+    for step in range(1, (int(df.max(initial=0)) - 1) // 2 + 1):
+        term = term * (2 * step - 1) / (2 * step) * cosine_squared
+        even += np.where(2 * step <= df - 2, term, 0.0)
+        odd_term = odd_term * (2 * step) / (2 * step + 1) * cosine_squared
+        odd += np.where(2 * step + 1 <= df - 2, odd_term, 0.0)
+    return np.where(df % 2 == 0, sine * even, 2 / np.pi * (np.arcsin(sine) + sine * odd))
+
+
+def _rows(bounds: Any, rows: slice) -> Any:
+    return bounds[rows] if bounds.ndim == 2 else bounds
+
+
+def _streaks(np: Any, full: Any) -> Tuple[Any, Any]:
+    """Current and longest runs of True along the last axis of ``full``."""
+
+    days = full.shape[-1]
+    missed = ~full[:, ::-1]
+    current = np.where(missed.any(1), missed.argmax(1), days)
+    taken = full.cumsum(1, dtype=np.int32)
+    # Days taken since the last miss: the running count minus its value at that miss.
+    runs = taken - np.maximum.accumulate(np.where(full, 0, taken), axis=1)
+    return current, runs.max(1)
+
+
+def _correlations(
+    np: Any, adherence: Any, lab_values: Any, lab_days: Any, window: int, min_observations: int
+) -> Tuple[Any, Any, Any]:
+    """Pearson r between windowed adherence and lab results, with confidence scores and result counts."""
+
+    users, supplements, days = adherence.shape
+    markers, results = lab_values.shape[1:]
+    taken = np.zeros((users, supplements, days + 1), dtype=np.int32)
+    taken[..., 1:] = adherence.cumsum(-1, dtype=np.int32)
+    end = np.clip(lab_days, 0, days - 1).reshape(users, 1, markers * results) + 1
+    begin = np.maximum(end - window, 0)
+    exposure = np.take_along_axis(taken, end, 2) - np.take_along_axis(taken, begin, 2)
+    x = (exposure / (end - begin)).reshape(users, supplements, markers, results)
+
+    valid = ~np.isnan(lab_values)
+    count = valid.sum(-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.nansum(lab_values, -1) / count
+        # Centred results, 0 where missing, so missing results drop out of every sum below.
+        y = np.where(valid, lab_values - mean[..., None], 0.0)[:, None]
+        weights = valid[:, None]
+        sum_x = (x * weights).sum(-1)
+        variance_x = (x * x * weights).sum(-1) - sum_x * sum_x / count[:, None]
+        r = (x * y).sum(-1) / np.sqrt(variance_x * (y * y).sum(-1))
+    usable = (count[:, None] >= min_observations) & np.isfinite(r) & (variance_x > 1e-12)
+    r = np.where(usable, np.clip(r, -1.0, 1.0), 0.0)
+    # Bonferroni over the pairs tested for each user, so long stacks and lab panels do not collect chance findings.
+    tests = usable.sum((1, 2))[:, None, None]
+    p_values = 1.0 - _pearson_confidence(np, r, np.maximum(count, 2)[:, None])
+    confidence = np.where(usable, np.clip(1.0 - p_values * tests, 0.0, 1.0), 0.0)
+    return r, confidence, count
+
+
+def _latest_results(np: Any, lab_values: Any, lab_days: Any) -> Any:
+    """The most recent lab result per biomarker, NaN where there is none."""
+
+    latest = np.where(np.isnan(lab_values), -1, lab_days).argmax(-1)
+    return np.take_along_axis(lab_values, latest[..., None], -1)[..., 0]
+
+
+def _vitality(np: Any, rate: Any, on_stack: Any, streak: Any, direction: Any, measured: Any, target: int) -> Any:
+    stack_size = on_stack.sum(1)
+    adherence = np.divide(rate.sum(1), stack_size, out=np.zeros(len(rate)), where=stack_size > 0)
+    streak_part = np.minimum(streak / target, 1.0)
+    measured_count = measured.sum(1)
+    in_range = np.divide(
+        (measured & (direction == 0)).sum(1), measured_count, out=np.zeros(len(rate)), where=measured_count > 0
+    )
+    has_labs = measured_count > 0
+    adherence_weight, streak_weight, labs_weight = _WEIGHTS
+    score = (adherence_weight * adherence + streak_weight * streak_part + labs_weight * in_range) / (
+        adherence_weight + streak_weight + labs_weight * has_labs
+    )
+    return np.rint(score * 100).astype(np.int16)
+
+
+def analyse_cohort(
+    series: CohortSeries,
+    *,
+    window: int = DEFAULT_WINDOW,
+    min_observations: int = MIN_OBSERVATIONS,
+    streak_target: int = STREAK_TARGET,
+    block: int = BLOCK_USERS,
+) -> CohortAnalytics:
+    """Compute streaks, correlations and vitality scores for every user of ``series``."""
+
+    np = _numpy()
+    users, supplements, _ = series.adherence.shape
+    markers = len(series.biomarkers)
+    out: Dict[str, Any] = {
+        "adherence_rate": np.empty((users, supplements)),
+        "current_streak": np.empty(users, dtype=np.int32),
+        "longest_streak": np.empty(users, dtype=np.int32),
+        "correlation": np.empty((users, supplements, markers)),
+        "confidence": np.empty((users, supplements, markers)),
+        "observations": np.empty((users, markers), dtype=np.int32),
+        "lab_direction": np.empty((users, markers), dtype=np.int8),
+        "lab_severity": np.empty((users, markers), dtype=np.intp),
+        "vitality": np.empty(users, dtype=np.int16),
+    }
+    for start in range(0, users, block):
+        rows = slice(start, min(start + block, users))
+        on_stack = np.asarray(series.on_stack[rows], dtype=bool)
+        adherence = np.asarray(series.adherence[rows], dtype=bool) & on_stack[..., None]
+        lab_values = np.asarray(series.lab_values[rows], dtype=np.float64)
+        lab_days = np.asarray(series.lab_days[rows])
+
+        rate = adherence.mean(-1)
+        # A day counts towards the streak when every supplement on the stack was taken.
+        full = (adherence | ~on_stack[..., None]).all(1) & on_stack.any(1)[:, None]
+        current, longest = _streaks(np, full)
+        r, confidence, count = _correlations(np, adherence, lab_values, lab_days, window, min_observations)
+        direction, severity = classify_ranges(
+            _latest_results(np, lab_values, lab_days),
+            _rows(np.asarray(series.reference_min, dtype=np.float64), rows),
+            _rows(np.asarray(series.reference_max, dtype=np.float64), rows),
+        )
+
+        out["adherence_rate"][rows] = rate
+        out["current_streak"][rows] = current
+        out["longest_streak"][rows] = longest
+        out["correlation"][rows] = r
+        out["confidence"][rows] = confidence
+        out["observations"][rows] = count
+        out["lab_direction"][rows] = direction
+        out["lab_severity"][rows] = severity
+        out["vitality"][rows] = _vitality(np, rate, on_stack, current, direction, count > 0, streak_target)
+    return CohortAnalytics(series=series, window=window, **out)
+
+
+def top_insights(
+    analytics: CohortAnalytics, user: int, *, limit: int = 3, min_confidence: float = 0.9
+) -> List[Insight]:
+    """The strongest findings for ``user``, most relevant first, worded from templates.
+
+    Correlations at or above ``min_confidence`` come first, strongest first,
+    followed by the current streak once it reaches :data:`MIN_STREAK` days.
+    """
+
+    np = _numpy()
+    series = analytics.series
+    markers = len(series.biomarkers)
+    insights: List[Insight] = []
+    confidence = analytics.confidence[user]
+    strength = (confidence * np.abs(analytics.correlation[user])).ravel()
+    for flat in np.argsort(-strength, kind="stable")[:limit]:
+        supplement_index, marker_index = divmod(int(flat), markers)
+        score = float(confidence[supplement_index, marker_index])
+        if score < min_confidence:
+            break
+        r = float(analytics.correlation[user, supplement_index, marker_index])
+        supplement, marker = series.supplements[supplement_index], series.biomarkers[marker_index]
+        results = int(analytics.observations[user, marker_index])
+        insights.append(
+            Insight(
+                type=InsightType.CORRELATION,
+                title=f"{supplement} and your {marker}",
+                content=(
+                    f"Your {marker} results were {'higher' if r > 0 else 'lower'} when you had taken {supplement} "
+                    f"more consistently in the {analytics.window} days before (correlation {r:+.2f} over "
+                    f"{results} results)."
+                ),
+                related_supplements=[supplement],
+                confidence_score=round(score, 3),
+            )
+        )
+
+    streak = int(analytics.current_streak[user])
+    if streak >= MIN_STREAK:
+        best = " - your longest run yet" if streak >= int(analytics.longest_streak[user]) else ""
+        insights.append(
+            Insight(
+                type=InsightType.STREAK,
+                title=f"{streak}-day streak",
+                content=f"You have taken your full stack {streak} days in a row{best}.",
+                related_supplements=[
+                    name for name, active in zip(series.supplements, series.on_stack[user]) if active
+                ],
+                confidence_score=1.0,
+            )
+        )
+    return insights[:limit]
+
+
+def vitality_score(analytics: CohortAnalytics, user: int) -> VitalityScore:
+    """``user``'s vitality score, with the adherence, streak and lab factors behind it."""
+
+    series = analytics.series
+    score = int(analytics.vitality[user])
+    positive: List[str] = []
+    negative: List[str] = []
+    streak = int(analytics.current_streak[user])
+    if streak >= MIN_STREAK:
+        positive.append(f"Took your full stack {streak} days in a row")
+    for name, active, rate in zip(series.supplements, series.on_stack[user], analytics.adherence_rate[user]):
+        if not active:
+            continue
+        if rate >= 0.9:
+            positive.append(f"Took {name} on {rate:.0%} of days")
+        elif rate < 0.7:
+            negative.append(f"Missed {name} on {1 - rate:.0%} of days")
+    for marker, count, direction, severity in zip(
+        series.biomarkers,
+        analytics.observations[user],
+        analytics.lab_direction[user],
+        analytics.lab_severity[user],
+    ):
+        if not count:
+            continue
+        if direction == 0:
+            positive.append(f"{marker} within its reference range")
+        else:
+            negative.append(f"{marker} {_SEVERITIES[severity]} {'low' if direction < 0 else 'high'}")
+    return VitalityScore(
+        score=score,
+        level=next(level for bound, level in _LEVELS if score >= bound),
+        positive_factors=positive,
+        negative_factors=negative,
+    )
+
+
+async def phrase_insights_async(insights: List[Insight], client: AsyncLLMClient) -> List[Insight]:
+    """Have the model reword the titles and contents of ``insights`` in one small call.
+
+    Everything else is kept from the engine. If the call fails or its output
+    does not hold one entry per insight, the templated wording is returned.
+    """
+
+    if not insights:
+        return insights
+    prompt = build_insight_prompt([(insight.title, insight.content) for insight in insights])
+    try:
+        raw_response = await client.create_chat_completion(
+            prompt=prompt, response_format=INSIGHT_SCHEMA.response_format
+        )
+    except Exception as exc:  # noqa: BLE001 - phrasing is best effort
+        logger.warning("Insight phrasing failed, keeping templated wording: %r", exc)
+        return insights
+    settings = client.settings
+    repair = repair_content(
+        INSIGHT_SCHEMA,
+        completion_content(raw_response),
+        enabled=settings.repair_enabled,
+        provider=settings.provider.value,
+    )
+    if repair.value is None or len(repair.value.insights) != len(insights):
+        logger.warning("Insight phrasing returned unusable output, keeping templated wording")
+        return insights
+    return [
+        insight.model_copy(update={"title": phrased.title, "content": phrased.content})
+        for insight, phrased in zip(insights, repair.value.insights)
+    ]
@@ -0,0 +1,129 @@
+"""Local evaluation of biomarker observations against their reference ranges.
+
+Only out-of-range markers matter for the interaction report, so observations
+are screened before prompting: normal and unrangeable values are dropped, and
+each abnormal one is reduced to a direction (low or high) and a severity bucket
+by how far it lies past the violated bound, relative to that bound:
+
+* ``slightly``: less than 10 % past the bound;
+* ``moderately``: 10 % to 50 % past it;
+* ``markedly``: 50 % or more past it.
+
+The prompt and the report cache key see only these buckets, never raw values,
+so a user whose labs are all normal shares cache entries with users who sent
+no labs, and small changes in a value do not create a new key.
+
+:func:`flag_biomarkers` evaluates the observation objects of one request in
+plain Python; with a handful of markers per request, reading the objects costs
+more than the comparisons, so vectorizing them does not pay. Columnar readings
+for many users at once (lab exports, time series) go through
+:func:`classify_ranges`, which applies the same rules with NumPy, imported on
+first use.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, List, Optional, Sequence, Tuple
+
+from ..models import BiomarkerObservation
+
+# Relative distance past the violated bound at which each severity bucket starts.
+_SEVERITY_EDGES = (0.1, 0.5)
+_SEVERITIES = ("slightly", "moderately", "markedly")
+
+
+class BiomarkerStatus(str, Enum):
+    """Direction of an out-of-range biomarker."""
+
+    LOW = "low"
+    HIGH = "high"
+
+
+@dataclass(frozen=True)
+class BiomarkerFlag:
+    """An observation outside its reference range, bucketed by how far outside it is."""
+
+    observation: BiomarkerObservation
+    status: BiomarkerStatus
+    severity: str
+
+    @property
+    def label(self) -> str:
+        """Prompt line, e.g. ``"Vitamin D: markedly low (below the reference range)"``."""
+
+        side = "below" if self.status == BiomarkerStatus.LOW else "above"
+        return f"{self.observation.name}: {self.severity} {self.status.value} ({side} the reference range)"
+
+    @property
+    def state(self) -> Tuple[str, str, str]:
+        """What the cache key sees: the folded marker name, direction and severity bucket."""
+
+        return _fold(self.observation.name), self.status.value, self.severity
+
+
+def _fold(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+def _scale(bound: float) -> float:
+    return abs(bound) or 1.0
+
+
+def _classify(observation: BiomarkerObservation) -> Optional[BiomarkerFlag]:
+    low, high, value = observation.reference_min, observation.reference_max, observation.value
+    if low is not None and value < low:
+        status, distance = BiomarkerStatus.LOW, (low - value) / _scale(low)
+    elif high is not None and value > high:
+        status, distance = BiomarkerStatus.HIGH, (value - high) / _scale(high)
+    else:
+        return None
+    return BiomarkerFlag(observation, status, _SEVERITIES[bisect_right(_SEVERITY_EDGES, distance)])
+
+
+def _ordered(flags: List[BiomarkerFlag]) -> List[BiomarkerFlag]:
+    return sorted(flags, key=lambda flag: flag.state)
+
+
+def flag_biomarkers(observations: Sequence[BiomarkerObservation]) -> List[BiomarkerFlag]:
+    """Return the out-of-range observations of one user, ordered by marker name."""
+
+    return _ordered([flag for flag in map(_classify, observations) if flag is not None])
+
+
+def _numpy() -> Any:
+    try:
+        import numpy  # type: ignore import-not-found
+    except ImportError as exc:  # pragma: no cover - defensive guard
+        raise RuntimeError(
+            "numpy is required for columnar biomarker and insight analytics. Install it with `pip install numpy`."
+        ) from exc
+    return numpy
+
+
+def classify_ranges(values: Any, lows: Any, highs: Any) -> Tuple[Any, Any]:
+    """Vectorized :func:`flag_biomarkers` rules over arrays of readings and their bounds (NaN for an open side).
+
+    Returns ``(directions, buckets)``: -1 below the range, 1 above it, 0 inside
+    it or unrangeable; and the index into the severity buckets, meaningful only
+    where the direction is not 0.
+    """
+
+    np = _numpy()
+    # Comparisons with a missing (NaN) bound are False, so an open side never flags.
+    below = values < lows
+    above = ~below & (values > highs)
+    scales = np.abs(np.where(below, lows, highs))
+    scales[(scales == 0) | np.isnan(scales)] = 1.0
+    with np.errstate(invalid="ignore"):
+        distances = np.where(below, lows - values, values - highs) / scales
+    buckets = np.searchsorted(np.array(_SEVERITY_EDGES), distances, side="right")
+    return above.astype(np.int8) - below.astype(np.int8), buckets
+
+
+def biomarker_state(flags: Sequence[BiomarkerFlag]) -> List[List[str]]:
+    """Bucketed state of ``flags`` for cache keys: one ``[name, status, severity]`` per distinct flag."""
+
+    return [list(state) for state in sorted({flag.state for flag in flags})]
@@ -0,0 +1,318 @@
+"""Content-addressed caching of interaction reports.
+
+Reports are keyed on the canonical labels of the stack (ingredient, form and
+normalized dose, as the prompt names them) together with every input that
+changes the model's answer (provider, resolved model, prompt version and system
+prompt), so identical stacks submitted in a different order, casing or spelling
+share one entry and a model or prompt change never serves stale reports.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..models import SupplementInteractionRequest
+from .biomarkers import biomarker_state, flag_biomarkers
+from .canonicalization import get_canonicalizer, merge_ingredients
+from .config import AnalysisMode, CacheBackend, LLMSettings, OutputFormat, load_settings
+from .prompts import PROMPT_VERSION
+
+
+def _fold(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+def ingredient_key(name: str) -> str:
+    """Identify one supplement by its canonical ingredient, ignoring form and dose.
+
+    Without a canonicalizer (``CANONICALIZATION_ENABLED=false``) case and whitespace are folded.
+    """
+
+    canonicalizer = get_canonicalizer()
+    if canonicalizer is None or not name.strip():
+        return _fold(name)
+    return canonicalizer.canonicalize(name).ingredient
+
+
+def canonicalize_supplements(supplements: Iterable[str]) -> List[str]:
+    """Identify a stack by the sorted labels its prompt names, so equivalent stacks compare equal.
+
+    Entries of one ingredient are merged first, as for the prompt (see
+    :func:`src.ai.canonicalization.merge_ingredients`). Without a canonicalizer
+    case and whitespace are folded.
+    """
+
+    names = [name for name in supplements if name.strip()]
+    canonicalizer = get_canonicalizer()
+    if canonicalizer is None:
+        return sorted({_fold(name) for name in names})
+    return sorted({name.key for name in merge_ingredients(canonicalizer.canonicalize_stack(names))})
+
+
+def _settings_fingerprint(settings: LLMSettings) -> Dict[str, Any]:
+    """Settings that change the model's answer and therefore must be part of every key."""
+
+    return {
+        "provider": settings.provider.value,
+        "model": settings.resolved_model(),
+        "prompt_version": PROMPT_VERSION,
+        "system_prompt": settings.system_prompt,
+    }
+
+
+def _output_changed(settings: LLMSettings) -> bool:
+    return (
+        settings.output_format != OutputFormat.FULL
+        or bool(settings.output_section_caps)
+        or settings.output_max_tokens is not None
+    )
+
+
+def _hash_key(material: Dict[str, Any]) -> str:
+    encoded = json.dumps(material, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def build_cache_key(request: SupplementInteractionRequest, settings: LLMSettings) -> str:
+    """Return a stable SHA-256 key for ``request`` under the given settings.
+
+    Out-of-range biomarkers enter the key as bucketed state (see :mod:`src.ai.biomarkers`),
+    and only in the modes whose prompt includes them. Requests whose labs are all normal
+    share the key of the same stack without labs. In cascade mode the escalation backend's
+    settings are part of the key as well. So are ``LLM_OUTPUT_*`` settings that differ from the defaults.
+    """
+
+    material: Dict[str, Any] = {
+        "supplements": canonicalize_supplements(request.supplements),
+        "analysis_mode": settings.analysis_mode.value,
+        **_settings_fingerprint(settings),
+    }
+    if settings.analysis_mode == AnalysisMode.CASCADE:
+        material["cascade"] = {**settings.cascade_escalation, "max_stack": settings.cascade_max_stack}
+    if settings.analysis_mode != AnalysisMode.PAIRWISE and _output_changed(settings):
+        material["output"] = {
+            "format": settings.output_format.value,
+            "section_caps": settings.output_section_caps,
+            "max_tokens": settings.output_max_tokens,
+        }
+    if request.biomarkers and settings.analysis_mode != AnalysisMode.PAIRWISE:
+        state = biomarker_state(flag_biomarkers(request.biomarkers))
+        if state:
+            material["biomarkers"] = state
+    return _hash_key(material)
+
+
+def build_update_key(request: SupplementInteractionRequest, settings: LLMSettings) -> str:
+    """Return the key a merged incremental-update report is cached under.
+
+    Update results live in their own namespace so they are only found through ``previous_key``
+    and are never served as the full analysis of ``request``.
+    """
+
+    return _hash_key({"update": build_cache_key(request, settings)})
+
+
+def build_unit_key(kind: str, supplements: Iterable[str], settings: LLMSettings) -> str:
+    """Return the memoization key for one pairwise or single-supplement analysis unit."""
+
+    return _hash_key(
+        {
+            "unit": kind,
+            "supplements": canonicalize_supplements(supplements),
+            **_settings_fingerprint(settings),
+        }
+    )
+
+
+class ReportCache(ABC):
+    """Key/value store for serialized reports with hit and miss accounting."""
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self._ttl_seconds = ttl_seconds
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached report JSON for ``key`` or ``None`` on a miss."""
+
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """Store the report JSON for ``key``."""
+
+        self._set(key, value)
+
+    def stats(self) -> Dict[str, int]:
+        """Return cumulative hit and miss counters."""
+
+        with self._stats_lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self._ttl_seconds > 0 and now - stored_at > self._ttl_seconds
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def _set(self, key: str, value: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop every cached entry."""
+
+    def close(self) -> None:
+        """Release any resources held by the backend."""
+
+
+class MemoryReportCache(ReportCache):
+    """Process-local LRU cache with a per-entry TTL."""
+
+    def __init__(self, *, max_entries: int, ttl_seconds: float) -> None:
+        super().__init__(ttl_seconds)
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self._expired(stored_at, now):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SqliteReportCache(ReportCache):
+    """On-disk cache that evicts least recently used entries past a byte budget."""
+
+    def __init__(self, *, path: str, max_bytes: int, ttl_seconds: float) -> None:
+        super().__init__(ttl_seconds)
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS reports_accessed_at ON reports (accessed_at)")
+
+    def _get(self, key: str) -> Optional[str]:
+        # Wall-clock time so entries survive restarts with a meaningful age.
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, stored_at FROM reports WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, stored_at = row
+            if self._expired(stored_at, now):
+                self._conn.execute("DELETE FROM reports WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE reports SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def _set(self, key: str, value: str) -> None:
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reports (key, value, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM reports").fetchone()
+        if total <= self._max_bytes:
+            return
+        excess = total - self._max_bytes
+        freed = 0
+        victims: List[str] = []
+        for key, size in self._conn.execute("SELECT key, size FROM reports ORDER BY accessed_at ASC"):
+            victims.append(key)
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM reports WHERE key = ?", [(key,) for key in victims])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM reports")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_report_cache(settings: LLMSettings) -> Optional[ReportCache]:
+    """Build the cache backend selected by ``REPORT_CACHE_BACKEND``."""
+
+    if settings.report_cache_backend == CacheBackend.MEMORY:
+        return MemoryReportCache(
+            max_entries=settings.report_cache_max_entries,
+            ttl_seconds=settings.report_cache_ttl_seconds,
+        )
+    if settings.report_cache_backend == CacheBackend.SQLITE:
+        return SqliteReportCache(
+            path=settings.report_cache_path,
+            max_bytes=settings.report_cache_max_bytes,
+            ttl_seconds=settings.report_cache_ttl_seconds,
+        )
+    return None
+
+
+@lru_cache(maxsize=1)
+def get_report_cache() -> Optional[ReportCache]:
+    """Return the process-wide report cache, or ``None`` when caching is disabled."""
+
+    return create_report_cache(load_settings())
+
+
+def cache_meta(cache: Optional[ReportCache], key: str, *, hit: bool) -> Dict[str, Any]:
+    """Describe a cache lookup for ``SupplementInteractionResponse.meta``."""
+
+    meta: Dict[str, Any] = {"key": key, "hit": hit, "enabled": cache is not None}
+    if cache is not None:
+        meta.update(cache.stats())
+    return meta
@@ -0,0 +1,402 @@
+"""Map free-text supplement names to canonical ingredients, forms and doses.
+
+``"Vit D3"``, ``"cholecalciferol"`` and ``"Vitamin D3 5,000IU"`` describe the same
+thing but would otherwise be different prompts and different cache keys. The
+bundled ``supplement_synonyms.json`` lists every ingredient with its synonyms and
+forms. It is indexed once into an exact alias table and a trigram index over the
+same aliases for typos. A name is resolved by:
+
+1. pulling out the dose (``5000 IU``, ``1 g`` becomes ``1000 mg``) and dropping
+   filler words such as ``capsules``;
+2. an exact synonym hit;
+3. otherwise the closest synonym within a few edits, if it is unambiguous;
+4. otherwise the longest run of words that is a synonym, as long as none of
+   the words left over belongs to another ingredient (``"NOW Zinc Picolinate"``
+   resolves, ``"Vitamin D3 + K2"`` does not).
+
+Names that do not resolve keep their own spelling with the dose normalized.
+Results are memoized per raw string, so repeated names cost one dictionary hit.
+
+Prompts get each supplement's label, the canonical name with its form and dose.
+:func:`canonical_labels` merges entries of one ingredient and adds up their
+doses, so ``["Vit D3", "Vitamin D 5000IU"]`` is a single supplement. Cache and stack keys use
+:attr:`CanonicalSupplement.key`, the label with case folded, so ``"Vit D3"`` and
+``"cholecalciferol"`` share a key while ``"Zinc"`` and ``"Zinc 100 mg"`` do not.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, replace
+from enum import Enum
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .config import load_settings
+
+DEFAULT_SYNONYMS_PATH = Path(__file__).with_name("supplement_synonyms.json")
+
+# Resolved names kept per index before the memo starts over.
+_MEMO_SIZE = 8192
+
+_DOSE = re.compile(
+    r"(?<![\w.])(\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?)\s*(billion\s*cfu|mcg|µg|μg|ug|mg|g|iu|ui|ml|cfu)(?!\w)",
+    re.IGNORECASE,
+)
+# Unit spelling -> (canonical unit, factor into that unit).
+_UNITS: Dict[str, Tuple[str, float]] = {
+    "mcg": ("mcg", 1.0),
+    "µg": ("mcg", 1.0),
+    "μg": ("mcg", 1.0),
+    "ug": ("mcg", 1.0),
+    "mg": ("mg", 1.0),
+    "g": ("mg", 1000.0),
+    "iu": ("IU", 1.0),
+    "ui": ("IU", 1.0),
+    "ml": ("mL", 1.0),
+    "cfu": ("CFU", 1.0),
+    "billion cfu": ("billion CFU", 1.0),
+}
+_NON_WORD = re.compile(r"[\W_]+")
+_EMPTY_BRACKETS = re.compile(r"\(\s*\)|\[\s*\]")
+
+
+class MatchKind(str, Enum):
+    """How a raw name was resolved."""
+
+    EXACT = "exact"
+    FUZZY = "fuzzy"
+    PARTIAL = "partial"
+    UNKNOWN = "unknown"
+
+
+@dataclass(frozen=True)
+class Dose:
+    """An amount in one of the canonical units (``mcg``, ``mg``, ``IU``, ``mL``, ``CFU``)."""
+
+    amount: float
+    unit: str
+
+    def __str__(self) -> str:
+        amount = str(int(self.amount)) if self.amount.is_integer() else f"{self.amount:.4f}".rstrip("0")
+        return f"{amount} {self.unit}"
+
+
+@dataclass(frozen=True)
+class CanonicalSupplement:
+    """One raw supplement name and what it resolved to."""
+
+    raw: str
+    name: str
+    ingredient_id: Optional[str]
+    form: Optional[str]
+    dose: Optional[Dose]
+    match: MatchKind
+    distance: int = 0
+
+    @property
+    def label(self) -> str:
+        """The name used in prompts: canonical name plus normalized dose."""
+
+        return f"{self.name} {self.dose}" if self.dose else self.name
+
+    @property
+    def key(self) -> str:
+        """The identity used in cache and stack keys: the label, folded, so form and dose count."""
+
+        return " ".join(self.label.split()).casefold()
+
+    @property
+    def ingredient(self) -> str:
+        """The ingredient, without form or dose; unresolved names are identified by their folded spelling."""
+
+        if self.ingredient_id is None:
+            return " ".join(self.name.split()).casefold()
+        return self.ingredient_id
+
+    def meta(self) -> Dict[str, Any]:
+        """Describe the mapping for ``SupplementInteractionResponse.meta``."""
+
+        meta: Dict[str, Any] = {"input": self.raw, "canonical": self.label, "match": self.match.value}
+        if self.ingredient_id is not None:
+            meta["id"] = self.ingredient_id
+        if self.form is not None:
+            meta["form"] = self.form
+        if self.distance:
+            meta["distance"] = self.distance
+        return meta
+
+
+def split_dose(text: str) -> Tuple[str, Optional[Dose]]:
+    """Remove every dose from ``text`` and return the rest with the first dose found."""
+
+    match = _DOSE.search(text)
+    if match is None:
+        return text, None
+    unit, factor = _UNITS[" ".join(match.group(2).casefold().split())]
+    dose = Dose(float(match.group(1).replace(",", "")) * factor, unit)
+    return _DOSE.sub(" ", text), dose
+
+
+def _tokens(text: str) -> List[str]:
+    return _NON_WORD.sub(" ", text.casefold().replace("'", "").replace("’", "")).split()
+
+
+def _edit_distance(first: str, second: str, limit: int) -> int:
+    """Levenshtein distance, or ``limit + 1`` as soon as it must exceed ``limit``.
+
+    Only the diagonal band of width ``2 * limit + 1`` can stay within the limit, so
+    cells outside it are never computed.
+    """
+
+    if first == second:
+        return 0
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    beyond = limit + 1
+    previous = [column if column <= limit else beyond for column in range(len(second) + 1)]
+    for row in range(1, len(first) + 1):
+        left = first[row - 1]
+        low, high = max(1, row - limit), min(len(second), row + limit)
+        current = [beyond] * (len(second) + 1)
+        current[0] = row if row <= limit else beyond
+        best = current[0]
+        for column in range(low, high + 1):
+            cost = previous[column - 1] + (left != second[column - 1])
+            cost = min(cost, previous[column] + 1, current[column - 1] + 1, beyond)
+            current[column] = cost
+            if cost < best:
+                best = cost
+        if best > limit:
+            return beyond
+        previous = current
+    return previous[-1]
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"^^{key}$$"
+    return {padded[index : index + 3] for index in range(len(padded) - 2)}
+
+
+class _TrigramIndex:
+    """Inverted trigram index over synonym keys for typo-tolerant lookup.
+
+    One edit changes at most three trigrams, so a key ``d`` edits away from the
+    query shares all but ``3 * d`` of the query's trigrams. Candidates are checked
+    with Levenshtein in order of shared trigrams, and the search stops once that
+    bound rules out anything closer than the best key found so far.
+    """
+
+    def __init__(self, keys: Iterable[str]) -> None:
+        self._keys = list(keys)
+        self._postings: Dict[str, List[str]] = {}
+        for key in self._keys:
+            for gram in _trigrams(key):
+                self._postings.setdefault(gram, []).append(key)
+
+    def closest(self, word: str, limit: int) -> Tuple[int, List[str]]:
+        """Return the smallest distance within ``limit`` edits of ``word`` and every key at it."""
+
+        grams = _trigrams(word)
+        if len(grams) <= 3 * limit:
+            # Too short for the trigram bound to rule anything out.
+            ranked = [(len(grams), key) for key in self._keys]
+        else:
+            shared: Dict[str, int] = {}
+            for gram in grams:
+                for key in self._postings.get(gram, ()):
+                    shared[key] = shared.get(key, 0) + 1
+            ranked = sorted(((count, key) for key, count in shared.items()), reverse=True)
+
+        best, keys = limit + 1, []
+        for count, key in ranked:
+            if len(grams) - count > 3 * min(best, limit):
+                break
+            distance = _edit_distance(word, key, min(best, limit))
+            if distance < best:
+                best, keys = distance, [key]
+            elif distance == best and distance <= limit:
+                keys.append(key)
+        return best, keys
+
+
+class Canonicalizer:
+    """In-memory synonym, form and typo index over the supplement synonym table."""
+
+    def __init__(
+        self,
+        *,
+        version: str,
+        aliases: Dict[str, Tuple[str, Optional[str], str]],
+        abbreviations: Dict[str, str],
+        stopwords: Set[str],
+        max_edits: int,
+    ) -> None:
+        self.version = version
+        self._aliases = aliases
+        self._abbreviations = abbreviations
+        self._stopwords = stopwords
+        self._max_edits = max_edits
+        # Which ingredients each synonym word belongs to, for the partial-match guard.
+        self._vocabulary: Dict[str, Set[str]] = {}
+        for key, (ingredient_id, _, _) in aliases.items():
+            for token in key.split():
+                self._vocabulary.setdefault(token, set()).add(ingredient_id)
+        self._fuzzy = _TrigramIndex(aliases)
+        self._memo: Dict[str, CanonicalSupplement] = {}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], *, max_edits: int = 2) -> "Canonicalizer":
+        """Validate a synonym table and build the alias index; a synonym may name only one target."""
+
+        aliases: Dict[str, Tuple[str, Optional[str], str]] = {}
+
+        def add(alias: str, target: Tuple[str, Optional[str], str]) -> None:
+            key = " ".join(_tokens(alias))
+            if aliases.setdefault(key, target) != target:
+                raise ValueError(f"Synonym {alias!r} maps to both {aliases[key][:2]} and {target[:2]}")
+
+        for ingredient_id, entry in dict(data.get("ingredients", {})).items():
+            target = (ingredient_id, None, entry["name"])
+            for alias in [entry["name"], *entry.get("aliases", [])]:
+                add(alias, target)
+            for form, form_entry in dict(entry.get("forms", {})).items():
+                form_target = (ingredient_id, form, form_entry["name"])
+                for alias in [form_entry["name"], *form_entry.get("aliases", [])]:
+                    add(alias, form_target)
+
+        return cls(
+            version=str(data.get("version", "0")),
+            aliases=aliases,
+            abbreviations={
+                key.casefold(): value.casefold() for key, value in dict(data.get("abbreviations", {})).items()
+            },
+            stopwords={word.casefold() for word in data.get("stopwords", [])},
+            max_edits=max_edits,
+        )
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_SYNONYMS_PATH, *, max_edits: int = 2) -> "Canonicalizer":
+        """Load and index a synonym table JSON file."""
+
+        with open(path, encoding="utf-8") as handle:
+            return cls.from_dict(json.load(handle), max_edits=max_edits)
+
+    def canonicalize(self, raw: str) -> CanonicalSupplement:
+        """Resolve one raw supplement name."""
+
+        result = self._memo.get(raw)
+        if result is None:
+            if len(self._memo) >= _MEMO_SIZE:
+                self._memo.clear()
+            result = self._memo[raw] = self._resolve(raw)
+        return result
+
+    def canonicalize_stack(self, supplements: Iterable[str]) -> List[CanonicalSupplement]:
+        """Resolve every name of a stack, in order; see :func:`canonical_labels` for the deduplicated names."""
+
+        return [self.canonicalize(raw) for raw in supplements]
+
+    def __len__(self) -> int:
+        return len(self._aliases)
+
+    def _resolve(self, raw: str) -> CanonicalSupplement:
+        text, dose = split_dose(raw)
+        tokens = [token for token in _tokens(text) if token not in self._stopwords]
+        if tokens and tokens[0] in self._abbreviations:
+            tokens[0:1] = self._abbreviations[tokens[0]].split()
+        found = self._match(tokens)
+        if found is None:
+            name = _EMPTY_BRACKETS.sub(" ", text)
+            name = " ".join(name.split()).strip(" ,;:-+/") or " ".join(raw.split())
+            return CanonicalSupplement(raw, name, None, None, dose, MatchKind.UNKNOWN)
+        (ingredient_id, form, name), match, distance = found
+        return CanonicalSupplement(raw, name, ingredient_id, form, dose, match, distance)
+
+    def _match(self, tokens: List[str]) -> Optional[Tuple[Tuple[str, Optional[str], str], MatchKind, int]]:
+        if not tokens:
+            return None
+        key = " ".join(tokens)
+        target = self._aliases.get(key)
+        if target is not None:
+            return target, MatchKind.EXACT, 0
+
+        limit = min(self._max_edits, 0 if len(key) <= 3 else 1 if len(key) <= 7 else 2)
+        if limit:
+            distance, candidates = self._fuzzy.closest(key, limit)
+            targets = {self._aliases[alias] for alias in candidates}
+            if len(targets) == 1:
+                return targets.pop(), MatchKind.FUZZY, distance
+
+        # Longest run of words that is a synonym, e.g. a brand name around the ingredient.
+        for size in range(len(tokens) - 1, 0, -1):
+            for start in range(len(tokens) - size + 1):
+                target = self._aliases.get(" ".join(tokens[start : start + size]))
+                if target is None:
+                    continue
+                rest = tokens[:start] + tokens[start + size :]
+                if any(target[0] not in self._vocabulary.get(token, {target[0]}) for token in rest):
+                    # Leftover words of another ingredient mean a combination product; keep it whole.
+                    return None
+                return target, MatchKind.PARTIAL, 0
+        return None
+
+
+def _merge(current: CanonicalSupplement, name: CanonicalSupplement) -> CanonicalSupplement:
+    if current.form is None and name.form is not None:
+        current = replace(current, name=name.name, form=name.form)
+    if current.dose is None:
+        return replace(current, dose=name.dose)
+    if name.dose is not None:
+        return replace(current, dose=Dose(current.dose.amount + name.dose.amount, current.dose.unit))
+    return current
+
+
+def merge_ingredients(names: Iterable[CanonicalSupplement]) -> List[CanonicalSupplement]:
+    """One entry per ingredient, in the order first seen.
+
+    Entries that name the same ingredient become one, with the first form named
+    and their doses added up (``"Vitamin D 5000IU"`` and ``"Vitamin D3 2000 IU"``
+    become ``"Vitamin D3 7000 IU"``). A repeated label counts once. A dose in a
+    unit that cannot be added to the merged one (``IU`` and ``mcg``) stays a
+    separate entry, so it still reaches the prompt. Unresolved names merge only
+    with the same spelling.
+    """
+
+    merged: List[CanonicalSupplement] = []
+    seen: Set[str] = set()
+    for name in names:
+        if name.key in seen:
+            continue
+        seen.add(name.key)
+        for index, current in enumerate(merged):
+            if current.ingredient != name.ingredient:
+                continue
+            if current.dose is not None and name.dose is not None and current.dose.unit != name.dose.unit:
+                continue
+            merged[index] = _merge(current, name)
+            break
+        else:
+            merged.append(name)
+    return merged
+
+
+def canonical_labels(names: Iterable[CanonicalSupplement]) -> List[str]:
+    """Labels of ``names`` in order, one per ingredient (see :func:`merge_ingredients`)."""
+
+    return [name.label for name in merge_ingredients(names)]
+
+
+@lru_cache(maxsize=1)
+def get_canonicalizer() -> Optional[Canonicalizer]:
+    """Return the process-wide canonicalizer, or ``None`` when canonicalization is disabled."""
+
+    settings = load_settings()
+    if not settings.canonicalization_enabled:
+        return None
+    return Canonicalizer.load(
+        Path(settings.canonicalization_path or DEFAULT_SYNONYMS_PATH),
+        max_edits=settings.canonicalization_max_edits,
+    )
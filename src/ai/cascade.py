@@ -0,0 +1,101 @@
+"""Model cascade: a small, fast model first, a larger one only for risky or uncertain stacks.
+
+With ``ANALYSIS_MODE=cascade`` the monolithic report prompt goes to the
+configured client (typically a local model) first, and its answer is accepted
+unless one of these escalates the request to the ``LLM_CASCADE_ESCALATION``
+backend (e.g. Bedrock):
+
+``stack_size``             the stack has more than ``LLM_CASCADE_MAX_STACK``
+                           supplements, so the small model is skipped
+``validation``             the small model's output failed validation even after
+                           local repair, or repair had to drop findings
+``severity``               it reports a ``high`` or ``critical`` conflict
+``inconclusive_evidence``  a conflict or synergy has ``inconclusive`` evidence
+``streaming``              the report is streamed; sections already sent cannot
+                           be taken back, so the large model answers directly
+
+The small model gets no fix-up call; escalating takes its place. The large
+model's answer is final. ``meta["cascade"]`` records the tier that answered,
+why the request was escalated, and each tier's latency.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from ..models import SupplementInteractionRequest, SupplementInteractionResponse
+from .config import LLMSettings
+from .metrics import record_cascade
+from .repair import Repair
+
+SMALL_TIER = "small"
+LARGE_TIER = "large"
+
+STACK_SIZE = "stack_size"
+VALIDATION = "validation"
+SEVERITY = "severity"
+INCONCLUSIVE_EVIDENCE = "inconclusive_evidence"
+STREAMING = "streaming"
+
+ESCALATION_SEVERITIES = frozenset({"high", "critical"})
+
+
+def exceeds_stack_size(request: SupplementInteractionRequest, settings: LLMSettings) -> bool:
+    """Whether ``request`` goes straight to the large model because of its size."""
+
+    return len(request.supplements) > settings.cascade_max_stack
+
+
+def escalation_reasons(repair: Repair[SupplementInteractionResponse]) -> List[str]:
+    """Why the small model's parsed answer should not be accepted; empty if it can be."""
+
+    if repair.value is None or repair.lossy:
+        return [VALIDATION]
+    interactions = repair.value.interactions
+    reasons = []
+    if any(conflict.severity in ESCALATION_SEVERITIES for conflict in interactions.conflicts):
+        reasons.append(SEVERITY)
+    if any(item.evidence_level == "inconclusive" for item in [*interactions.conflicts, *interactions.synergies]):
+        reasons.append(INCONCLUSIVE_EVIDENCE)
+    return reasons
+
+
+class CascadeTrace:
+    """The tiers one report went through, for ``meta["cascade"]``."""
+
+    def __init__(self) -> None:
+        self.tiers: List[Dict[str, Any]] = []
+        self.reasons: List[str] = []
+
+    @contextmanager
+    def tier(self, name: str, settings: LLMSettings) -> Iterator[None]:
+        """Time one tier's model call and repair."""
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tiers.append(
+                {
+                    "tier": name,
+                    "provider": settings.provider.value,
+                    "model": settings.resolved_model(),
+                    "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+                }
+            )
+
+    def attach(self, report: SupplementInteractionResponse) -> SupplementInteractionResponse:
+        """Record the cascade in ``report.meta`` and in the metrics."""
+
+        answered = self.tiers[-1]["tier"] if self.tiers else ""
+        record_cascade(answered, self.reasons)
+        report.meta["cascade"] = {
+            "tier": answered,
+            "escalated": bool(self.reasons),
+            "reasons": self.reasons,
+            "tiers": self.tiers,
+            "latency_ms": round(sum(tier["latency_ms"] for tier in self.tiers), 2),
+        }
+        return report
@@ -2,82 +2,161 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import asyncio
+import json
+import logging
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, asynccontextmanager, contextmanager
+from functools import lru_cache
+from typing import Any, AsyncContextManager, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
 import httpx
 
+from .admission import AdmissionController, Ticket, estimate_call_tokens, usage_tokens
 from .config import LLMProvider, LLMSettings
+from .deadline import bounded, bounded_async, check_deadline, http_timeout
+from .metrics import HttpTrace, metrics_enabled, observe_stage, record_completion, stage
+from .prompts import split_prompt
+from .schema import bedrock_response_format, encode_chat_payload
 
+logger = logging.getLogger(__name__)
 
-class LLMClient:
-    """Thin wrapper that supports OpenAI-compatible, Bedrock, and local providers."""
+
+def _http2_enabled(settings: LLMSettings) -> bool:
+    """Return whether HTTP/2 was requested and the optional ``h2`` package is importable."""
+
+    if not settings.http2:
+        return False
+    try:
+        import h2  # type: ignore import-not-found  # noqa: F401
+    except ImportError:
+        logger.warning("LLM_HTTP2 is enabled but the 'h2' package is missing; falling back to HTTP/1.1.")
+        return False
+    return True
+
+
+def _http_limits(settings: LLMSettings) -> httpx.Limits:
+    """Translate the pool settings into ``httpx`` connection limits."""
+
+    return httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+
+
+@lru_cache(maxsize=1)
+def _ssl_context() -> ssl.SSLContext:
+    """One verifying SSL context for every provider client.
+
+    Loading the CA bundle takes far longer than the rest of client construction,
+    and httpx would otherwise load it again for every sync, async and routed client.
+    """
+
+    return httpx.create_ssl_context()
+
+
+def _create_bedrock_client(settings: LLMSettings) -> Any:
+    """Build a ``bedrock-runtime`` client; boto3 clients are thread-safe once constructed."""
+
+    try:
+        import boto3  # type: ignore import-not-found
+        from botocore.config import Config  # type: ignore import-not-found
+    except ImportError as exc:  # pragma: no cover - defensive guard
+        raise RuntimeError(
+            "boto3 is required for the Bedrock provider. Install it with `pip install boto3`."
+        ) from exc
+
+    session_kwargs: Dict[str, str] = {}
+    if settings.bedrock_profile:
+        session_kwargs["profile_name"] = settings.bedrock_profile
+    session = boto3.Session(**session_kwargs)
+    return session.client(
+        "bedrock-runtime",
+        region_name=settings.bedrock_region,
+        endpoint_url=settings.bedrock_endpoint_url,
+        config=Config(
+            max_pool_connections=settings.bedrock_max_pool_connections,
+            read_timeout=settings.timeout_seconds,
+        ),
+    )
+
+
+@asynccontextmanager
+async def _unlimited(tokens: int) -> AsyncIterator[Ticket]:
+    yield Ticket(estimated_tokens=tokens)
+
+
+def _http_pool_stats(client: Any) -> Dict[str, int]:
+    """Count open and idle connections held by an ``httpx`` client's connection pool."""
+
+    # httpx does not expose pool state publicly; the httpcore pool behind the
+    # default transport does, so read it defensively.
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    return {
+        "open": sum(1 for conn in connections if not conn.is_closed()),
+        "idle": sum(1 for conn in connections if conn.is_idle()),
+    }
+
+
+class _BaseLLMClient:
+    """Request/response shaping shared by the synchronous and asynchronous clients."""
 
     def __init__(self, settings: LLMSettings) -> None:
         self._settings = settings
         self._provider = settings.provider
-        timeout = httpx.Timeout(settings.timeout_seconds)
+        self._in_flight = 0
 
-        self._http_client: Optional[httpx.Client] = None
-        self._bedrock_client: Any = None
+    @property
+    def settings(self) -> LLMSettings:
+        """Settings the client was built from."""
 
-        if self._provider in {LLMProvider.OPENAI, LLMProvider.LOCAL}:
-            api_base = settings.resolved_api_base()
-            if api_base:
-                self._http_client = httpx.Client(timeout=timeout, base_url=api_base)
-            else:
-                self._http_client = httpx.Client(timeout=timeout)
-        elif self._provider == LLMProvider.BEDROCK:
-            try:
-                import boto3  # type: ignore import-not-found
-            except ImportError as exc:  # pragma: no cover - defensive guard
-                raise RuntimeError(
-                    "boto3 is required for the Bedrock provider. Install it with `pip install boto3`."
-                ) from exc
-
-            session_kwargs: Dict[str, str] = {}
-            if settings.bedrock_profile:
-                session_kwargs["profile_name"] = settings.bedrock_profile
-            session = boto3.Session(**session_kwargs)
-            self._bedrock_client = session.client(
-                "bedrock-runtime",
-                region_name=settings.bedrock_region,
-                endpoint_url=settings.bedrock_endpoint_url,
-            )
-        else:  # pragma: no cover - exhaustive safety branch
-            raise ValueError(f"Unsupported LLM provider: {self._provider}")
+        return self._settings
 
-    def close(self) -> None:
-        """Release underlying HTTP resources."""
+    def _http_client_kwargs(self) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {
+            "timeout": httpx.Timeout(self._settings.timeout_seconds),
+            "limits": _http_limits(self._settings),
+            "http2": _http2_enabled(self._settings),
+            "verify": _ssl_context(),
+        }
+        api_base = self._settings.resolved_api_base()
+        if api_base:
+            kwargs["base_url"] = api_base
+        return kwargs
 
-        if self._http_client is not None:
-            self._http_client.close()
+    def _base_pool_stats(self, http_client: Any) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"provider": self._provider.value, "in_flight": self._in_flight}
+        if http_client is not None:
+            stats.update(_http_pool_stats(http_client))
+            stats["max_connections"] = self._settings.http_max_connections
+            stats["max_keepalive_connections"] = self._settings.http_max_keepalive_connections
+        else:
+            stats["max_connections"] = self._settings.bedrock_max_pool_connections
+        return stats
 
-    def create_chat_completion(
-        self,
-        *,
-        prompt: str,
-        response_format: Optional[Dict[str, Any]] = None,
-    ) -> Dict[str, Any]:
-        """Send a prompt to the configured model and return the raw JSON response."""
+    def _trace_extensions(self, *, asynchronous: bool) -> Optional[Dict[str, Any]]:
+        """httpx ``trace`` extension timing connect and time to first byte, when metrics are on."""
 
-        if self._provider == LLMProvider.BEDROCK:
-            return self._create_bedrock_completion(prompt=prompt, response_format=response_format)
-        return self._create_openai_compatible_completion(prompt=prompt, response_format=response_format)
+        if not metrics_enabled():
+            return None
+        trace = HttpTrace(self._provider.value)
+        return {"trace": trace.acall if asynchronous else trace}
 
-    def _create_openai_compatible_completion(
+    def _openai_compatible_request(
         self,
         *,
         prompt: str,
         response_format: Optional[Dict[str, Any]] = None,
-    ) -> Dict[str, Any]:
-        if self._http_client is None:  # pragma: no cover - defensive guard
-            raise RuntimeError("HTTP client is not configured for the selected provider.")
-
-        headers: Dict[str, str] = {}
-        api_key = self._settings.resolved_api_key()
-        if api_key:
-            headers["Authorization"] = f"Bearer {api_key.get_secret_value()}"
+        max_tokens: Optional[int] = None,
+    ) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+        """Return the ``(url, payload, headers)`` triple for a chat completion call."""
 
+        url, headers = self._chat_completions_endpoint()
         payload: Dict[str, Any] = {
             "model": self._settings.resolved_model(),
             "messages": [
@@ -85,8 +164,19 @@ class LLMClient:
                 {"role": "user", "content": prompt},
             ],
         }
-        if response_format:
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        if response_format and self._settings.structured_output:
             payload["response_format"] = response_format
+        return url, payload, headers
+
+    def _chat_completions_endpoint(self) -> Tuple[str, Dict[str, str]]:
+        """Return the chat completions URL and auth headers for the configured provider."""
+
+        headers: Dict[str, str] = {"Content-Type": "application/json"}
+        api_key = self._settings.resolved_api_key()
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key.get_secret_value()}"
 
         # If a custom API base is set, the client has a base_url.
         # We assume the base_url includes the version (e.g., /v1), so we just append the endpoint.
@@ -95,26 +185,40 @@ class LLMClient:
             url = "chat/completions"
         else:
             url = "https://api.openai.com/v1/chat/completions"
+        return url, headers
 
-        response = self._http_client.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        return response.json()
+    def chat_completion_payload(
+        self,
+        *,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Return the OpenAI-compatible request body this client would send for ``prompt``."""
 
-    def _create_bedrock_completion(
+        return self._openai_compatible_request(prompt=prompt, response_format=response_format, max_tokens=max_tokens)[1]
+
+    def _bedrock_request(
         self,
         *,
         prompt: str,
         response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
     ) -> Dict[str, Any]:
-        if self._bedrock_client is None:  # pragma: no cover - defensive guard
-            raise RuntimeError("Bedrock client is not configured.")
+        """Return the keyword arguments for a Bedrock ``converse`` call."""
 
+        content: List[Dict[str, Any]] = [{"text": prompt}]
+        if self._settings.bedrock_prompt_caching:
+            prefix, suffix = split_prompt(prompt)
+            if prefix and suffix:
+                # Everything before the cachePoint (system prompt included) is cached by Bedrock.
+                content = [{"text": prefix}, {"cachePoint": {"type": "default"}}, {"text": suffix}]
         request: Dict[str, Any] = {
             "modelId": self._settings.resolved_model(),
             "messages": [
                 {
                     "role": "user",
-                    "content": [{"text": prompt}],
+                    "content": content,
                 }
             ],
         }
@@ -124,26 +228,466 @@ class LLMClient:
         inference_config: Dict[str, Any] = {}
         if self._settings.bedrock_temperature is not None:
             inference_config["temperature"] = self._settings.bedrock_temperature
-        if self._settings.bedrock_max_tokens is not None:
-            inference_config["maxTokens"] = self._settings.bedrock_max_tokens
+        if max_tokens is None:
+            max_tokens = self._settings.bedrock_max_tokens
+        if max_tokens is not None:
+            inference_config["maxTokens"] = max_tokens
         if inference_config:
             request["inferenceConfig"] = inference_config
 
-        if response_format:
-            schema = response_format.get("json_schema", {}).get("schema")
-            if schema:
-                request["responseFormat"] = {"json": {"schema": schema}}
+        if response_format and self._settings.structured_output:
+            bedrock_format = bedrock_response_format(response_format)
+            if bedrock_format:
+                request["responseFormat"] = bedrock_format
+        return request
+
+    @staticmethod
+    def _bedrock_to_chat_completion(response: Dict[str, Any]) -> Dict[str, Any]:
+        """Reshape a Bedrock ``converse`` response into the OpenAI chat completion layout."""
 
-        response = self._bedrock_client.converse(**request)
         output = response.get("output", {})
         message = output.get("message", {})
         content_parts = message.get("content", [])
         content = "".join(part.get("text", "") for part in content_parts)
 
-        return {"choices": [{"message": {"content": content}}]}
+        completion: Dict[str, Any] = {"choices": [{"message": {"content": content}}]}
+        usage = response.get("usage")
+        if usage:
+            # Bedrock counts cache reads and writes separately from inputTokens; OpenAI includes them.
+            cached = usage.get("cacheReadInputTokens", 0)
+            completion["usage"] = {
+                "prompt_tokens": usage.get("inputTokens", 0) + cached + usage.get("cacheWriteInputTokens", 0),
+                "completion_tokens": usage.get("outputTokens", 0),
+                "prompt_tokens_details": {"cached_tokens": cached},
+            }
+        return completion
+
+
+class LLMClient(_BaseLLMClient):
+    """Thin wrapper that supports OpenAI-compatible, Bedrock, and local providers.
+
+    Instances are meant to be long-lived and shared across threads (see
+    :mod:`src.ai.registry`) so the underlying keep-alive pools are reused.
+    """
+
+    def __init__(self, settings: LLMSettings, *, bedrock_client: Any = None) -> None:
+        super().__init__(settings)
+        self._http_client: Optional[httpx.Client] = None
+        self._bedrock_client: Any = None
+        self._in_flight_lock = threading.Lock()
+
+        if self._provider in {LLMProvider.OPENAI, LLMProvider.LOCAL}:
+            self._http_client = httpx.Client(**self._http_client_kwargs())
+        elif self._provider == LLMProvider.BEDROCK:
+            self._bedrock_client = bedrock_client or _create_bedrock_client(settings)
+        else:  # pragma: no cover - exhaustive safety branch
+            raise ValueError(f"Unsupported LLM provider: {self._provider}")
+
+    def close(self) -> None:
+        """Release underlying HTTP resources."""
+
+        if self._http_client is not None:
+            self._http_client.close()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Report connection pool usage so pool limits can be sized from real traffic."""
+
+        return self._base_pool_stats(self._http_client)
+
+    @contextmanager
+    def _track_in_flight(self) -> Iterator[None]:
+        with self._in_flight_lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+
+    def create_chat_completion(
+        self,
+        *,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Send a prompt to the configured model and return the raw JSON response.
+
+        ``max_tokens`` caps this completion; Bedrock falls back to ``BEDROCK_MAX_TOKENS`` without it.
+        """
+
+        provider = self._provider.value
+        with bounded("provider_call"), self._track_in_flight(), stage("provider_call", provider):
+            try:
+                if self._provider == LLMProvider.BEDROCK:
+                    response = self._create_bedrock_completion(
+                        prompt=prompt, response_format=response_format, max_tokens=max_tokens
+                    )
+                else:
+                    response = self._create_openai_compatible_completion(
+                        prompt=prompt, response_format=response_format, max_tokens=max_tokens
+                    )
+            except Exception:
+                record_completion(provider, None, error=True)
+                raise
+        record_completion(provider, response)
+        return response
+
+    def _create_openai_compatible_completion(
+        self,
+        *,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        if self._http_client is None:  # pragma: no cover - defensive guard
+            raise RuntimeError("HTTP client is not configured for the selected provider.")
+
+        url, payload, headers = self._openai_compatible_request(
+            prompt=prompt, response_format=response_format, max_tokens=max_tokens
+        )
+        response = self._http_client.post(
+            url,
+            content=encode_chat_payload(payload),
+            headers=headers,
+            timeout=http_timeout(self._settings.timeout_seconds),
+            extensions=self._trace_extensions(asynchronous=False),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def _create_bedrock_completion(
+        self,
+        *,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        if self._bedrock_client is None:  # pragma: no cover - defensive guard
+            raise RuntimeError("Bedrock client is not configured.")
+
+        request = self._bedrock_request(prompt=prompt, response_format=response_format, max_tokens=max_tokens)
+        response = self._bedrock_client.converse(**request)
+        return self._bedrock_to_chat_completion(response)
 
     def __enter__(self) -> "LLMClient":
         return self
 
     def __exit__(self, *_: object) -> None:
         self.close()
+
+
+class AsyncLLMClient(_BaseLLMClient):
+    """Asyncio counterpart of :class:`LLMClient` for use from async route handlers.
+
+    OpenAI-compatible and local providers go through ``httpx.AsyncClient``. boto3
+    has no asyncio API, so Bedrock calls run on a dedicated thread pool whose
+    admission is bounded by a semaphore; excess callers wait on the event loop
+    instead of piling up in the executor queue.
+    """
+
+    def __init__(self, settings: LLMSettings, *, bedrock_client: Any = None) -> None:
+        super().__init__(settings)
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._bedrock_client: Any = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_slots: Optional[asyncio.Semaphore] = None
+        self._admission = AdmissionController(settings) if settings.admission_enabled else None
+
+        if self._provider in {LLMProvider.OPENAI, LLMProvider.LOCAL}:
+            self._http_client = httpx.AsyncClient(**self._http_client_kwargs())
+        elif self._provider == LLMProvider.BEDROCK:
+            self._bedrock_client = bedrock_client or _create_bedrock_client(settings)
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.bedrock_executor_workers, thread_name_prefix="bedrock"
+            )
+            self._executor_slots = asyncio.Semaphore(settings.bedrock_executor_workers)
+        else:  # pragma: no cover - exhaustive safety branch
+            raise ValueError(f"Unsupported LLM provider: {self._provider}")
+
+    async def aclose(self) -> None:
+        """Release underlying HTTP resources and the Bedrock executor."""
+
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Report connection pool usage so pool limits can be sized from real traffic."""
+
+        stats = self._base_pool_stats(self._http_client)
+        if self._executor is not None:
+            stats["executor_workers"] = self._settings.bedrock_executor_workers
+        if self._admission is not None:
+            stats["admission"] = self._admission.stats()
+        return stats
+
+    async def create_chat_completion(
+        self,
+        *,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Send a prompt to the configured model and return the raw JSON response.
+
+        ``max_tokens`` caps this completion; Bedrock falls back to ``BEDROCK_MAX_TOKENS`` without it.
+        """
+
+        async with bounded_async("provider_call"), self._admitted(prompt, response_format, max_tokens) as ticket:
+            # Single event loop, so a plain counter is safe here.
+            self._in_flight += 1
+            provider = self._provider.value
+            try:
+                with stage("provider_call", provider):
+                    if self._provider == LLMProvider.BEDROCK:
+                        response = await self._create_bedrock_completion(
+                            prompt=prompt, response_format=response_format, max_tokens=max_tokens
+                        )
+                    else:
+                        response = await self._create_openai_compatible_completion(
+                            prompt=prompt, response_format=response_format, max_tokens=max_tokens
+                        )
+            except Exception:
+                record_completion(provider, None, error=True)
+                raise
+            finally:
+                self._in_flight -= 1
+            record_completion(provider, response)
+            ticket.actual_tokens = usage_tokens(response)
+        return response
+
+    async def post_chat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST a prebuilt chat completion body (e.g. a replayed batch line) and return the JSON response."""
+
+        if self._http_client is None:
+            raise RuntimeError("Prebuilt chat completion bodies require an OpenAI-compatible provider.")
+
+        url, headers = self._chat_completions_endpoint()
+        prompt = "".join(str(message.get("content", "")) for message in payload.get("messages", []))
+        async with bounded_async("provider_call"), self._admitted(prompt, payload.get("response_format")) as ticket:
+            self._in_flight += 1
+            provider = self._provider.value
+            try:
+                with stage("provider_call", provider):
+                    response = await self._http_client.post(
+                        url,
+                        content=encode_chat_payload(payload),
+                        headers=headers,
+                        timeout=http_timeout(self._settings.timeout_seconds),
+                        extensions=self._trace_extensions(asynchronous=True),
+                    )
+                    response.raise_for_status()
+                    body = response.json()
+            except Exception:
+                record_completion(provider, None, error=True)
+                raise
+            finally:
+                self._in_flight -= 1
+            record_completion(provider, body)
+            ticket.actual_tokens = usage_tokens(body)
+        return body
+
+    def _admitted(
+        self,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]],
+        max_tokens: Optional[int] = None,
+        *,
+        stream: bool = False,
+    ) -> AsyncContextManager[Ticket]:
+        """Admission slot for one call; a no-op when ``LLM_ADMISSION`` is off."""
+
+        tokens = estimate_call_tokens(self._settings, prompt, response_format, max_tokens)
+        if self._admission is None:
+            return _unlimited(tokens)
+        return self._admission.admit(tokens, observe_latency=not stream)
+
+    def admission_stats(self) -> Optional[Dict[str, Any]]:
+        """Concurrency limit, queue and shedding counters, or ``None`` when admission is off."""
+
+        return self._admission.stats() if self._admission is not None else None
+
+    async def _create_openai_compatible_completion(
+        self,
+        *,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        if self._http_client is None:  # pragma: no cover - defensive guard
+            raise RuntimeError("HTTP client is not configured for the selected provider.")
+
+        url, payload, headers = self._openai_compatible_request(
+            prompt=prompt, response_format=response_format, max_tokens=max_tokens
+        )
+        response = await self._http_client.post(
+            url,
+            content=encode_chat_payload(payload),
+            headers=headers,
+            timeout=http_timeout(self._settings.timeout_seconds),
+            extensions=self._trace_extensions(asynchronous=True),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def _create_bedrock_completion(
+        self,
+        *,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        if self._bedrock_client is None or self._executor is None or self._executor_slots is None:
+            raise RuntimeError("Bedrock client is not configured.")  # pragma: no cover - defensive guard
+
+        request = self._bedrock_request(prompt=prompt, response_format=response_format, max_tokens=max_tokens)
+        loop = asyncio.get_running_loop()
+        async with self._executor_slots:
+            response = await loop.run_in_executor(
+                self._executor, lambda: self._bedrock_client.converse(**request)
+            )
+        return self._bedrock_to_chat_completion(response)
+
+    async def stream_chat_completion(
+        self,
+        *,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        """Yield the model's message content in pieces as it is generated.
+
+        The request deadline is checked before the call and after every piece,
+        and bounds each read of the stream.
+        """
+
+        with bounded("stream"):
+            async with self._admitted(prompt, response_format, max_tokens, stream=True):
+                self._in_flight += 1
+                provider = self._provider.value
+                started = time.perf_counter()
+                first_delta = True
+                try:
+                    if self._provider == LLMProvider.BEDROCK:
+                        stream = self._stream_bedrock_completion(
+                            prompt=prompt, response_format=response_format, max_tokens=max_tokens
+                        )
+                    else:
+                        stream = self._stream_openai_compatible_completion(
+                            prompt=prompt, response_format=response_format, max_tokens=max_tokens
+                        )
+                    # Close the provider stream before this one finishes, not whenever it is collected.
+                    async with aclosing(stream):
+                        async for delta in stream:
+                            if first_delta:
+                                first_delta = False
+                                observe_stage("time_to_first_token", provider, time.perf_counter() - started)
+                            check_deadline("stream")
+                            yield delta
+                except Exception:
+                    record_completion(provider, None, error=True)
+                    raise
+                else:
+                    record_completion(provider, None)
+                finally:
+                    self._in_flight -= 1
+                    observe_stage("provider_call", provider, time.perf_counter() - started)
+
+    async def _stream_openai_compatible_completion(
+        self,
+        *,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        if self._http_client is None:  # pragma: no cover - defensive guard
+            raise RuntimeError("HTTP client is not configured for the selected provider.")
+
+        url, payload, headers = self._openai_compatible_request(
+            prompt=prompt, response_format=response_format, max_tokens=max_tokens
+        )
+        payload["stream"] = True
+        async with self._http_client.stream(
+            "POST",
+            url,
+            content=encode_chat_payload(payload),
+            headers=headers,
+            timeout=http_timeout(self._settings.timeout_seconds),
+            extensions=self._trace_extensions(asynchronous=True),
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:") :].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    async def _stream_bedrock_completion(
+        self,
+        *,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        if self._bedrock_client is None or self._executor is None or self._executor_slots is None:
+            raise RuntimeError("Bedrock client is not configured.")  # pragma: no cover - defensive guard
+
+        request = self._bedrock_request(prompt=prompt, response_format=response_format, max_tokens=max_tokens)
+        loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[Any]" = asyncio.Queue()
+        stop = threading.Event()
+        finished = object()
+        # The boto3 event stream, once open, so the event loop can close it.
+        streams: List[Any] = []
+
+        def pump() -> None:
+            # Runs on the executor: boto3's event stream is a blocking iterator.
+            try:
+                response = self._bedrock_client.converse_stream(**request)
+                streams.append(response["stream"])
+                if stop.is_set():
+                    response["stream"].close()
+                    return
+                for event in response["stream"]:
+                    if stop.is_set():
+                        break
+                    text = event.get("contentBlockDelta", {}).get("delta", {}).get("text")
+                    if text:
+                        loop.call_soon_threadsafe(queue.put_nowait, text)
+            except Exception as exc:  # noqa: BLE001 - re-raised on the event loop below
+                if not stop.is_set():  # Reading a stream closed below fails; nobody is listening.
+                    loop.call_soon_threadsafe(queue.put_nowait, exc)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+        async with self._executor_slots:
+            pumping = loop.run_in_executor(self._executor, pump)
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is finished:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                # Stop reading the provider stream if the consumer went away early. Closing it drops
+                # the connection, which cancels the generation and wakes the executor thread
+                # blocked on the next chunk.
+                stop.set()
+                if streams:
+                    streams[0].close()
+                await asyncio.shield(pumping)
+
+    async def __aenter__(self) -> "AsyncLLMClient":
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        await self.aclose()
@@ -0,0 +1,175 @@
+"""Compact wire format for the monolithic report: short keys and supplement indexes.
+
+Generation time dominates a report's latency, and in the full format the model
+writes keys such as ``management_instruction`` and spells out supplement names
+in every finding. With ``LLM_OUTPUT_FORMAT=compact`` the prompt numbers the
+stack and asks for this shape instead::
+
+    {"s": analysis_summary,
+     "c": [{"p": [0, 2], "m": mechanism, "e": evidence_level, "v": severity,
+            "g": management_strategy, "i": management_instruction, "u": source_url}],
+     "y": [{"p": [0, 1], "m": mechanism, "e": evidence_level, "k": category, "u": source_url}],
+     "d": [{"p": 0, "n": depleted_nutrient, "m": mechanism, "v": severity, "r": recommendation}],
+     "o": [{"p": 1, "f": suggested_form, "r": rationale}],
+     "w": [{"p": 2, "w": warning}]}
+
+``p`` is the 0-based position of a supplement in the request. Enum values are
+unchanged. :func:`expand_report` turns such a document back into the
+``SupplementInteractionResponse`` shape before validation, so repair, the cache
+and callers see exactly what the full format produces. A document that is
+already in the full shape passes through unchanged.
+
+``LLM_OUTPUT_SECTION_CAPS`` limits findings per section in either format. The
+prompt asks for at most that many, and :func:`cap_sections` cuts any extra
+before validation.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Literal, Mapping, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+
+from ..enums.depletion_severity import DepletionSeverity
+from ..enums.management_strategy import ManagementStrategy
+from ..enums.severity_level import SeverityLevel
+
+SUMMARY_KEY = "s"
+SUPPLEMENT_KEY = "p"
+# Short key of each section, its name in ``struct_interactions``, and the full field of each short item key.
+SECTIONS: Dict[str, Tuple[str, Dict[str, str]]] = {
+    "c": (
+        "conflicts",
+        {
+            "p": "supplements",
+            "m": "mechanism",
+            "e": "evidence_level",
+            "v": "severity",
+            "g": "management_strategy",
+            "i": "management_instruction",
+            "u": "source_url",
+        },
+    ),
+    "y": (
+        "synergies",
+        {"p": "supplements", "m": "mechanism", "e": "evidence_level", "k": "category", "u": "source_url"},
+    ),
+    "d": (
+        "depletions",
+        {
+            "p": "offending_supplement",
+            "n": "depleted_nutrient",
+            "m": "mechanism",
+            "v": "severity",
+            "r": "recommendation",
+        },
+    ),
+    "o": ("optimizations", {"p": "supplement", "f": "suggested_form", "r": "rationale"}),
+    "w": ("dosage_warnings", {"p": "supplement", "w": "warning"}),
+}
+
+Evidence = Literal["low", "moderate", "high", "inconclusive"]
+
+
+class CompactConflict(BaseModel):
+    p: List[int] = Field(..., min_length=2)
+    m: str
+    e: Evidence
+    v: SeverityLevel
+    g: ManagementStrategy
+    i: str
+    u: Optional[str] = None
+
+
+class CompactSynergy(BaseModel):
+    p: List[int] = Field(..., min_length=2)
+    m: str
+    e: Evidence
+    k: Optional[str] = None
+    u: Optional[str] = None
+
+
+class CompactDepletion(BaseModel):
+    p: int
+    n: str
+    m: str
+    v: DepletionSeverity
+    r: str
+
+
+class CompactOptimization(BaseModel):
+    p: int
+    f: str
+    r: str
+
+
+class CompactDosageWarning(BaseModel):
+    p: int
+    w: str
+
+
+class CompactReport(BaseModel):
+    """The wire model sent as the response schema; parsed reports are expanded, never validated into it."""
+
+    s: str
+    c: List[CompactConflict] = Field(default_factory=list)
+    y: List[CompactSynergy] = Field(default_factory=list)
+    d: List[CompactDepletion] = Field(default_factory=list)
+    o: List[CompactOptimization] = Field(default_factory=list)
+    w: List[CompactDosageWarning] = Field(default_factory=list)
+
+
+def _supplement(value: Any, supplements: Sequence[str]) -> Any:
+    if isinstance(value, int) and not isinstance(value, bool) and 0 <= value < len(supplements):
+        return supplements[value]
+    # Names, or indexes outside the stack, are left for validation to reject.
+    return value
+
+
+def _expand_item(item: Any, fields: Dict[str, str], supplements: Sequence[str]) -> Any:
+    if not isinstance(item, dict):
+        return item
+    expanded: Dict[str, Any] = {}
+    for key, value in item.items():
+        if key == SUPPLEMENT_KEY:
+            if isinstance(value, list):
+                value = [_supplement(index, supplements) for index in value]
+            else:
+                value = _supplement(value, supplements)
+        expanded[fields.get(key, key)] = value
+    return expanded
+
+
+def cap_sections(document: Any, caps: Mapping[str, int]) -> Any:
+    """Keep at most ``caps[section]`` findings in each capped section of a full-shape report document."""
+
+    interactions = document.get("interactions") if isinstance(document, dict) else None
+    if not isinstance(interactions, dict):
+        return document
+    capped = dict(interactions)
+    for section, cap in caps.items():
+        if isinstance(capped.get(section), list):
+            capped[section] = capped[section][:cap]
+    return {**document, "interactions": capped}
+
+
+def expand_report(
+    document: Any, *, supplements: Sequence[str], caps: Optional[Mapping[str, int]] = None
+) -> Any:
+    """Rewrite a compact report document into the full ``SupplementInteractionResponse`` shape."""
+
+    if not isinstance(document, dict) or "interactions" in document or "analysis_summary" in document:
+        full = document
+    else:
+        interactions: Dict[str, Any] = {}
+        for key, (section, fields) in SECTIONS.items():
+            items = document.get(key)
+            if isinstance(items, list):
+                interactions[section] = [_expand_item(item, fields, supplements) for item in items]
+            elif items is not None:
+                interactions[section] = items
+        full = {"interactions": interactions}
+        if SUMMARY_KEY in document:
+            full["analysis_summary"] = document[SUMMARY_KEY]
+    return cap_sections(full, caps) if caps else full
+
@@ -4,9 +4,9 @@ from __future__ import annotations
 
 from enum import Enum
 from functools import lru_cache
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional
 
-from pydantic import Field, SecretStr, model_validator
+from pydantic import Field, NonNegativeInt, SecretStr, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -18,13 +18,56 @@ class LLMProvider(str, Enum):
     LOCAL = "local"
 
 
+class CacheBackend(str, Enum):
+    """Supported report cache backends."""
+
+    NONE = "none"
+    MEMORY = "memory"
+    SQLITE = "sqlite"
+
+
+class AnalysisMode(str, Enum):
+    """How a supplement stack is turned into model calls."""
+
+    MONOLITHIC = "monolithic"
+    PAIRWISE = "pairwise"
+    CASCADE = "cascade"
+
+
+class OutputFormat(str, Enum):
+    """How the model writes a monolithic report."""
+
+    FULL = "full"
+    COMPACT = "compact"
+
+
+# Sections of a report that LLM_OUTPUT_SECTION_CAPS can limit.
+ReportSection = Literal["conflicts", "synergies", "depletions", "optimizations", "dosage_warnings"]
+
+
 class LLMSettings(BaseSettings):
     provider: LLMProvider = Field(default=LLMProvider.LOCAL, alias="LLM_PROVIDER")
     timeout_seconds: float = Field(15.0, alias="LLM_TIMEOUT", ge=1.0)
+    # Overall bound on one report generation, shared by every coalesced caller.
+    report_timeout_seconds: Optional[float] = Field(None, alias="REPORT_TIMEOUT", gt=0.0)
+    # Caller deadline: API routes read the caller's remaining budget in milliseconds from this header.
+    # Requests without it get REQUEST_DEADLINE_DEFAULT seconds, or no deadline when that is unset.
+    deadline_header: str = Field("X-Request-Timeout-Ms", alias="REQUEST_DEADLINE_HEADER")
+    deadline_default_seconds: Optional[float] = Field(None, alias="REQUEST_DEADLINE_DEFAULT", gt=0.0)
     system_prompt: str = Field(
         default="You are VitalStackAssist's clinical assistant. <placeholder system prompt>",
         alias="LLM_SYSTEM_PROMPT",
     )
+    # Send the report schema as response_format/responseFormat in addition to the copy in the prompt.
+    structured_output: bool = Field(True, alias="LLM_STRUCTURED_OUTPUT")
+    # Report output: "compact" has the model write short keys and supplement numbers (see src.ai.compact),
+    # which takes fewer generated tokens. SECTION_CAPS limits findings per section, e.g. {"synergies": 3},
+    # and MAX_TOKENS bounds the report completion (max_tokens / Bedrock maxTokens).
+    output_format: OutputFormat = Field(default=OutputFormat.FULL, alias="LLM_OUTPUT_FORMAT")
+    output_section_caps: Dict[ReportSection, NonNegativeInt] = Field(
+        default_factory=dict, alias="LLM_OUTPUT_SECTION_CAPS"
+    )
+    output_max_tokens: Optional[int] = Field(None, alias="LLM_OUTPUT_MAX_TOKENS", ge=1)
 
     # OpenAI-compatible provider settings.
     openai_api_key: Optional[SecretStr] = Field(None, alias="OPENAI_API_KEY")
@@ -38,6 +81,8 @@ class LLMSettings(BaseSettings):
     bedrock_endpoint_url: Optional[str] = Field(None, alias="BEDROCK_ENDPOINT_URL")
     bedrock_max_tokens: Optional[int] = Field(None, alias="BEDROCK_MAX_TOKENS", ge=1)
     bedrock_temperature: Optional[float] = Field(None, alias="BEDROCK_TEMPERATURE", ge=0.0, le=2.0)
+    # Marks the static prompt prefix with a cachePoint; only enable for models that support prompt caching.
+    bedrock_prompt_caching: bool = Field(False, alias="BEDROCK_PROMPT_CACHING")
 
     local_model: str = Field(
         #TODO Placeholder LLM
@@ -47,6 +92,95 @@ class LLMSettings(BaseSettings):
     local_api_base: str = Field(default="http://127.0.0.1:8000/v1", alias="LOCAL_API_BASE")
     local_api_key: Optional[SecretStr] = Field(None, alias="LOCAL_API_KEY")
 
+    # Connection pooling for the process-wide provider clients.
+    http2: bool = Field(True, alias="LLM_HTTP2")
+    http_max_connections: int = Field(100, alias="LLM_HTTP_MAX_CONNECTIONS", ge=1)
+    http_max_keepalive_connections: int = Field(20, alias="LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", ge=0)
+    http_keepalive_expiry: float = Field(30.0, alias="LLM_HTTP_KEEPALIVE_EXPIRY", ge=0.0)
+    bedrock_max_pool_connections: int = Field(50, alias="BEDROCK_MAX_POOL_CONNECTIONS", ge=1)
+    bedrock_executor_workers: int = Field(32, alias="BEDROCK_EXECUTOR_WORKERS", ge=1)
+
+    # Client-side admission control in front of every asyncio provider client.
+    admission_enabled: bool = Field(True, alias="LLM_ADMISSION")
+    admission_initial_concurrency: int = Field(16, alias="LLM_ADMISSION_INITIAL_CONCURRENCY", ge=1)
+    admission_min_concurrency: int = Field(2, alias="LLM_ADMISSION_MIN_CONCURRENCY", ge=1)
+    admission_max_concurrency: int = Field(64, alias="LLM_ADMISSION_MAX_CONCURRENCY", ge=1)
+    admission_latency_tolerance: float = Field(2.0, alias="LLM_ADMISSION_LATENCY_TOLERANCE", gt=1.0)
+    admission_max_queue: int = Field(256, alias="LLM_ADMISSION_MAX_QUEUE", ge=0)
+    admission_queue_timeout_seconds: float = Field(5.0, alias="LLM_ADMISSION_QUEUE_TIMEOUT", gt=0.0)
+    # Tokens per minute across prompt and completion; 0 disables the token bucket.
+    rate_limit_tpm: int = Field(0, alias="LLM_RATE_LIMIT_TPM", ge=0)
+    estimated_completion_tokens: int = Field(1024, alias="LLM_ESTIMATED_COMPLETION_TOKENS", ge=0)
+
+    # Multi-backend routing: a JSON list of setting overrides, one object per backend, e.g.
+    # [{"name": "vllm-a", "LOCAL_API_BASE": "http://a:8000/v1"}, {"name": "bedrock", "LLM_PROVIDER": "bedrock"}].
+    # Empty means the single provider configured above.
+    router_backends: List[Dict[str, Any]] = Field(default_factory=list, alias="LLM_ROUTER_BACKENDS")
+    router_ewma_alpha: float = Field(0.2, alias="LLM_ROUTER_EWMA_ALPHA", gt=0.0, le=1.0)
+    router_hedging: bool = Field(True, alias="LLM_ROUTER_HEDGING")
+    router_hedge_percentile: float = Field(0.95, alias="LLM_ROUTER_HEDGE_PERCENTILE", gt=0.0, lt=1.0)
+    router_hedge_min_samples: int = Field(20, alias="LLM_ROUTER_HEDGE_MIN_SAMPLES", ge=1)
+    router_breaker_failures: int = Field(5, alias="LLM_ROUTER_BREAKER_FAILURES", ge=1)
+    router_breaker_cooldown_seconds: float = Field(30.0, alias="LLM_ROUTER_BREAKER_COOLDOWN", gt=0.0)
+
+    # "pairwise" analyses each pair and each supplement separately and memoizes every unit.
+    analysis_mode: AnalysisMode = Field(default=AnalysisMode.MONOLITHIC, alias="ANALYSIS_MODE")
+    pairwise_max_concurrency: int = Field(8, alias="PAIRWISE_MAX_CONCURRENCY", ge=1)
+    # "cascade" sends the monolithic prompt to the provider above first and escalates risky or uncertain
+    # answers, and stacks over MAX_STACK supplements, to the backend described by a JSON object of setting
+    # overrides, e.g. {"name": "bedrock", "LLM_PROVIDER": "bedrock", "BEDROCK_MODEL_ID": "..."}.
+    cascade_escalation: Dict[str, Any] = Field(default_factory=dict, alias="LLM_CASCADE_ESCALATION")
+    cascade_max_stack: int = Field(8, alias="LLM_CASCADE_MAX_STACK", ge=1)
+
+    # Stacks analysed concurrently by the batch endpoint and CLI.
+    batch_max_concurrency: int = Field(8, alias="BATCH_MAX_CONCURRENCY", ge=1)
+
+    # Repair slightly malformed model JSON locally, then with one small fix-up call, before failing.
+    repair_enabled: bool = Field(True, alias="LLM_REPAIR")
+    repair_fix_call: bool = Field(True, alias="LLM_REPAIR_FIX_CALL")
+
+    # Local insight analytics: findings kept per user, the confidence a correlation needs,
+    # and whether the model rewords the kept findings (numbers and scores are never its own).
+    insights_top_findings: int = Field(3, alias="INSIGHTS_TOP_FINDINGS", ge=1)
+    insights_min_confidence: float = Field(0.9, alias="INSIGHTS_MIN_CONFIDENCE", ge=0.0, le=1.0)
+    insights_phrasing: bool = Field(True, alias="INSIGHTS_PHRASING")
+
+    # Startup: optionally send every backend a tiny completion before /readyz reports ready.
+    warmup_completion: bool = Field(False, alias="WARMUP_COMPLETION")
+    warmup_timeout_seconds: float = Field(10.0, alias="WARMUP_TIMEOUT", gt=0.0)
+
+    # Per-stage latency, token and cache metrics served at /metrics; optionally mirrored as OpenTelemetry spans.
+    metrics_enabled: bool = Field(True, alias="METRICS_ENABLED")
+    metrics_otel_spans: bool = Field(False, alias="METRICS_OTEL_SPANS")
+
+    # Curated interactions answered locally; unset path uses the bundled knowledge_base.json.
+    knowledge_base_enabled: bool = Field(True, alias="KNOWLEDGE_BASE_ENABLED")
+    knowledge_base_path: Optional[str] = Field(None, alias="KNOWLEDGE_BASE_PATH")
+
+    # Map free-text supplement names to canonical ingredients, forms and doses before prompting.
+    # Unset path uses the bundled supplement_synonyms.json; MAX_EDITS bounds typo correction.
+    canonicalization_enabled: bool = Field(True, alias="CANONICALIZATION_ENABLED")
+    canonicalization_path: Optional[str] = Field(None, alias="CANONICALIZATION_PATH")
+    canonicalization_max_edits: int = Field(2, ge=0, le=3, alias="CANONICALIZATION_MAX_EDITS")
+
+    # Report cache in front of the LLM call. A TTL of 0 keeps entries until evicted.
+    report_cache_backend: CacheBackend = Field(default=CacheBackend.MEMORY, alias="REPORT_CACHE_BACKEND")
+    report_cache_ttl_seconds: float = Field(86400.0, alias="REPORT_CACHE_TTL", ge=0.0)
+    report_cache_max_entries: int = Field(1024, alias="REPORT_CACHE_MAX_ENTRIES", ge=1)
+    report_cache_path: str = Field(".cache/report_cache.sqlite3", alias="REPORT_CACHE_PATH")
+    report_cache_max_bytes: int = Field(64 * 1024 * 1024, alias="REPORT_CACHE_MAX_BYTES", ge=1)
+
+    # Background precomputation of popular stacks and pairs (see src.ai.precompute). SAMPLE_RATE of live
+    # requests feed a count-min sketch; every INTERVAL seconds, while at most IDLE_IN_FLIGHT live provider
+    # calls are running, reports for the TOP_K stacks and TOP_K pairs are computed into a SQLite store at PATH.
+    precompute_enabled: bool = Field(False, alias="PRECOMPUTE_ENABLED")
+    precompute_sample_rate: float = Field(0.1, alias="PRECOMPUTE_SAMPLE_RATE", gt=0.0, le=1.0)
+    precompute_top_k: int = Field(50, alias="PRECOMPUTE_TOP_K", ge=1)
+    precompute_half_life_seconds: float = Field(3600.0, alias="PRECOMPUTE_HALF_LIFE", gt=0.0)
+    precompute_interval_seconds: float = Field(30.0, alias="PRECOMPUTE_INTERVAL", gt=0.0)
+    precompute_idle_in_flight: int = Field(0, alias="PRECOMPUTE_IDLE_IN_FLIGHT", ge=0)
+    precompute_path: str = Field(".cache/precomputed.sqlite3", alias="PRECOMPUTE_PATH")
+
     model_config = SettingsConfigDict(env_file=(".env.local", ".env"), env_file_encoding="utf-8")
 
     @model_validator(mode="after")
@@ -72,6 +206,8 @@ class LLMSettings(BaseSettings):
                 raise ValueError(f"Missing required Bedrock settings: {joined}")
         if self.provider == LLMProvider.LOCAL and not self.local_api_base:
             raise ValueError("LOCAL_API_BASE must be provided when LLM_PROVIDER=local")
+        if self.analysis_mode == AnalysisMode.CASCADE and not self.cascade_escalation:
+            raise ValueError("LLM_CASCADE_ESCALATION must be provided when ANALYSIS_MODE=cascade")
         return self
 
     def resolved_model(self) -> str:
@@ -0,0 +1,130 @@
+"""Caller deadlines for provider calls.
+
+A route that knows how long its caller is willing to wait opens a
+:func:`deadline_scope`. Inside it:
+
+* every provider call first checks the remaining budget and fails with
+  :class:`DeadlineExceeded` instead of starting work nobody will read;
+* asyncio calls run under ``asyncio.timeout(remaining)``, so the admission wait
+  and the HTTP request are cancelled when the budget runs out. Cancelling the
+  httpx request closes its connection, which is how vLLM and other
+  OpenAI-compatible servers learn to abort the generation and free the slot;
+* HTTP timeouts are cut down from ``LLM_TIMEOUT`` to the remaining budget, which
+  also bounds synchronous calls and every read of a stream.
+
+Deadlines only shorten: a nested scope never extends its parent's. A call
+coalesced for several asyncio callers runs in a :func:`detached_context`, with
+no caller's deadline, and each caller stops waiting for it once its own deadline
+passes. Synchronous coalesced callers share the leader's call and its deadline.
+
+The API maps :class:`DeadlineExceeded` to ``504 Gateway Timeout``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Iterator, Optional
+
+import httpx
+
+from .metrics import record_request_abort
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(RuntimeError):
+    """Raised when the caller's deadline passes before or during a provider call."""
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(f"Request deadline exceeded ({stage}).")
+        self.stage = stage
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """Give provider calls made in this context at most ``seconds`` from now; ``None`` keeps the current deadline."""
+
+    current = _deadline.get()
+    deadline = current if seconds is None else time.monotonic() + seconds
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def detached_context() -> contextvars.Context:
+    """A copy of the current context without a deadline, for work shared by callers with different deadlines."""
+
+    context = contextvars.copy_context()
+    context.run(_deadline.set, None)
+    return context
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline (negative once it has passed), or ``None`` without one."""
+
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _passed() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def _expired(stage: str) -> DeadlineExceeded:
+    record_request_abort("expired")
+    return DeadlineExceeded(stage)
+
+
+def check_deadline(stage: str) -> None:
+    """Fail before ``stage`` starts if the current deadline has already passed."""
+
+    if _passed():
+        raise _expired(stage)
+
+
+def http_timeout(timeout_seconds: float) -> Any:
+    """Per-request httpx timeout: ``timeout_seconds`` or the remaining budget, whichever is shorter."""
+
+    left = remaining()
+    if left is None or left >= timeout_seconds:
+        return httpx.USE_CLIENT_DEFAULT
+    return httpx.Timeout(max(left, 0.001))
+
+
+@contextmanager
+def bounded(stage: str) -> Iterator[None]:
+    """Check the deadline before a synchronous call and report its timeout as :class:`DeadlineExceeded`."""
+
+    check_deadline(stage)
+    try:
+        yield
+    except httpx.TimeoutException as exc:
+        if _passed():
+            raise _expired(stage) from exc
+        raise
+
+
+@asynccontextmanager
+async def bounded_async(stage: str) -> AsyncIterator[None]:
+    """Cancel the enclosed awaits, and the provider request they hold, once the deadline passes."""
+
+    check_deadline(stage)
+    left = remaining()
+    if left is None:
+        yield
+        return
+    scope = asyncio.timeout(left)
+    try:
+        async with scope:
+            yield
+    except (TimeoutError, httpx.TimeoutException) as exc:
+        if scope.expired() or _passed():
+            raise _expired(stage) from exc
+        raise
@@ -0,0 +1,30 @@
+"""Partial findings produced for one slice of a supplement stack.
+
+A full report is the merge of one :class:`SupplementFindings` per supplement and
+one :class:`PairFindings` per unordered pair. Both the pairwise analysis mode and
+the local knowledge base produce these.
+"""
+
+from __future__ import annotations
+
+from typing import List
+
+from pydantic import BaseModel, Field
+
+from ..models import ConflictDetail, DepletionDetail, SynergyDetail
+from ..models.interaction import DosageWarning, OptimizationSuggestion
+
+
+class PairFindings(BaseModel):
+    """Conflicts and synergies between exactly two supplements."""
+
+    conflicts: List[ConflictDetail] = Field(default_factory=list)
+    synergies: List[SynergyDetail] = Field(default_factory=list)
+
+
+class SupplementFindings(BaseModel):
+    """Findings that depend on a single supplement on its own."""
+
+    depletions: List[DepletionDetail] = Field(default_factory=list)
+    optimizations: List[OptimizationSuggestion] = Field(default_factory=list)
+    dosage_warnings: List[DosageWarning] = Field(default_factory=list)
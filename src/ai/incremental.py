@@ -0,0 +1,181 @@
+"""Incremental re-analysis after supplements are added to or removed from a stack.
+
+Users mostly edit their stack one supplement at a time. Instead of analysing
+the new stack from scratch, the previous report is reused:
+
+* findings that involve a removed supplement are dropped locally;
+* only the units that involve an added supplement (its single-supplement unit
+  and its pairs with every other supplement) are answered, from the knowledge
+  base, the unit memo cache or the model, as in pairwise mode;
+* the summary is rebuilt from the merged findings without another model call.
+
+Supplement names in model output rarely match the stack spelling exactly
+(``"Zinc"`` for ``"Zinc Picolinate 30 mg"``), so names are compared by
+canonical ingredient and form.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from ..models import SupplementInteractionResponse
+from ..models.interaction import struct_interactions
+from .canonicalization import Canonicalizer, get_canonicalizer, split_dose
+from .pairwise import (
+    SOURCE_KNOWLEDGE_BASE,
+    SOURCE_MEMOIZED,
+    SOURCE_MODEL,
+    AnalysisUnit,
+    merge_findings,
+    plan_units,
+    summarize_interactions,
+)
+from .repair import Repair, combine_repairs
+
+# Canonical ingredient and form (``None`` when the name does not say).
+Identity = Tuple[str, Optional[str]]
+
+_ENTRY_LISTS = ("conflicts", "synergies", "depletions", "optimizations", "dosage_warnings")
+
+
+def _fold(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+def _identity(name: str, canonicalizer: Optional[Canonicalizer]) -> Identity:
+    if canonicalizer is not None:
+        resolved = canonicalizer.canonicalize(name)
+        if resolved.ingredient_id is not None:
+            return resolved.ingredient_id, resolved.form
+    return _fold(split_dose(name)[0]), None
+
+
+def _same(first: Identity, second: Identity) -> bool:
+    """Same ingredient, and the same form unless one side does not name a form."""
+
+    return first[0] == second[0] and (first[1] is None or second[1] is None or first[1] == second[1])
+
+
+@dataclass(frozen=True)
+class StackEdit:
+    """The edited stack: supplements kept from the previous stack and the ones added or removed."""
+
+    kept: Tuple[str, ...]
+    added: Tuple[str, ...]
+    removed: Tuple[str, ...]
+
+    @property
+    def supplements(self) -> List[str]:
+        return [*self.kept, *self.added]
+
+
+def plan_edit(previous: Sequence[str], added: Iterable[str], removed: Iterable[str]) -> StackEdit:
+    """Apply ``removed`` then ``added`` to the previous stack.
+
+    Removing ``"Magnesium"`` removes ``"Magnesium Glycinate 400 mg"``; adding a
+    supplement whose ingredient is already in the stack changes nothing.
+    """
+
+    canonicalizer = get_canonicalizer()
+    removing = [_identity(name, canonicalizer) for name in removed]
+    kept: List[str] = []
+    dropped: List[str] = []
+    for name in previous:
+        identity = _identity(name, canonicalizer)
+        (dropped if any(_same(identity, other) for other in removing) else kept).append(name)
+
+    present = {_identity(name, canonicalizer)[0] for name in kept}
+    new: List[str] = []
+    for name in added:
+        ingredient = _identity(name, canonicalizer)[0]
+        if ingredient not in present:
+            present.add(ingredient)
+            new.append(name)
+    return StackEdit(tuple(kept), tuple(new), tuple(dropped))
+
+
+def plan_update_units(edit: StackEdit) -> List[AnalysisUnit]:
+    """Units of the edited stack that involve an added supplement; all others are already answered."""
+
+    added = {_fold(name) for name in edit.added}
+    return [
+        unit for unit in plan_units(edit.supplements) if any(_fold(name) in added for name in unit.supplements)
+    ]
+
+
+def _entry_supplements(entry: BaseModel) -> List[str]:
+    members = getattr(entry, "supplements", None)
+    if members is not None:
+        return list(members)
+    return [getattr(entry, "offending_supplement", None) or getattr(entry, "supplement")]
+
+
+def drop_removed(interactions: struct_interactions, edit: StackEdit) -> Tuple[struct_interactions, int]:
+    """Return the previous findings without those that involve a removed supplement, and how many were dropped.
+
+    A finding naming a supplement that matches both a removed and a kept entry
+    (``"magnesium"`` after swapping glycinate for citrate) still applies and is kept.
+    """
+
+    canonicalizer = get_canonicalizer()
+    removed = [_identity(name, canonicalizer) for name in edit.removed]
+    kept = [_identity(name, canonicalizer) for name in edit.kept]
+    if not removed:
+        return interactions.model_copy(deep=True), 0
+
+    def stale(names: List[str]) -> bool:
+        for name in names:
+            identity = _identity(name, canonicalizer)
+            if any(_same(identity, other) for other in removed) and not any(_same(identity, other) for other in kept):
+                return True
+        return False
+
+    result = struct_interactions()
+    dropped = 0
+    for field in _ENTRY_LISTS:
+        entries = getattr(interactions, field)
+        remaining = [entry.model_copy(deep=True) for entry in entries if not stale(_entry_supplements(entry))]
+        dropped += len(entries) - len(remaining)
+        setattr(result, field, remaining)
+    return result, dropped
+
+
+def apply_edit(
+    previous: SupplementInteractionResponse,
+    edit: StackEdit,
+    units: Sequence[AnalysisUnit],
+    findings: Dict[AnalysisUnit, BaseModel],
+    sources: Dict[AnalysisUnit, str],
+    repairs: Optional[Dict[str, Repair[Any]]] = None,
+) -> SupplementInteractionResponse:
+    """Merge the surviving previous findings with the findings for the new units into one report."""
+
+    remaining, dropped = drop_removed(previous.interactions, edit)
+    fresh = merge_findings(edit.supplements, findings).interactions
+    merged = struct_interactions()
+    for field in _ENTRY_LISTS:
+        setattr(merged, field, [*getattr(remaining, field), *getattr(fresh, field)])
+
+    report = SupplementInteractionResponse(
+        analysis_summary=summarize_interactions(edit.supplements, merged),
+        interactions=merged,
+    )
+    counts = Counter(sources.values())
+    report.meta["incremental"] = {
+        "added": list(edit.added),
+        "removed": list(edit.removed),
+        "kept": sum(len(getattr(remaining, field)) for field in _ENTRY_LISTS),
+        "dropped": dropped,
+        "units": len(units),
+        SOURCE_KNOWLEDGE_BASE: counts[SOURCE_KNOWLEDGE_BASE],
+        SOURCE_MEMOIZED: counts[SOURCE_MEMOIZED],
+        SOURCE_MODEL: counts[SOURCE_MODEL],
+    }
+    report.meta["sources"] = {unit.label: sources[unit] for unit in units}
+    if repairs:
+        report.meta["repair"] = combine_repairs(repairs)
+    return report
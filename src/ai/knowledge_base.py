@@ -0,0 +1,157 @@
+"""Local, deterministic store of well-established supplement interactions.
+
+Findings such as zinc depleting copper or calcium competing with iron do not
+need a model call. The bundled ``knowledge_base.json`` is validated into the
+same DTOs the model produces and indexed by canonical ingredient ID (see
+:mod:`src.ai.canonicalization`) and by unordered pair, so names resolve here the
+same way as in cache keys and incremental updates and lookups are plain
+dictionary hits. The file's own aliases are used only when canonicalization is
+disabled. A supplement or pair that is listed is *covered*: its findings
+(possibly none) are authoritative and the model is not asked about it.
+"""
+
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, Optional
+
+from .canonicalization import Canonicalizer, get_canonicalizer, split_dose
+from .config import load_settings
+from .findings import PairFindings, SupplementFindings
+
+DEFAULT_KNOWLEDGE_BASE_PATH = Path(__file__).with_name("knowledge_base.json")
+
+
+def _fold(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+class KnowledgeBase:
+    """In-memory index of curated per-supplement and per-pair findings."""
+
+    def __init__(
+        self,
+        *,
+        version: str,
+        aliases: Dict[str, str],
+        supplements: Dict[str, SupplementFindings],
+        pairs: Dict[FrozenSet[str], PairFindings],
+        canonicalizer: Optional[Canonicalizer] = None,
+    ) -> None:
+        self.version = version
+        self._aliases = aliases
+        self._supplements = supplements
+        self._pairs = pairs
+        self._canonicalizer = canonicalizer
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object], *, canonicalizer: Optional[Canonicalizer] = None) -> "KnowledgeBase":
+        """Validate raw knowledge base data and build the lookup indexes.
+
+        With a ``canonicalizer`` every supplement is keyed by its ingredient ID and
+        must resolve to one; without it, by its folded name and aliases.
+        """
+
+        def key(name: str) -> str:
+            if canonicalizer is None:
+                return _fold(name)
+            ingredient_id = canonicalizer.canonicalize(name).ingredient_id
+            if ingredient_id is None:
+                raise ValueError(f"Knowledge base supplement {name!r} is not in the synonym table")
+            return ingredient_id
+
+        aliases: Dict[str, str] = {}
+        supplements: Dict[str, SupplementFindings] = {}
+        for name, entry in dict(data.get("supplements", {})).items():  # type: ignore[arg-type]
+            canonical = key(name)
+            if canonical in supplements:
+                raise ValueError(f"Knowledge base supplement {name!r} is listed twice")
+            aliases[_fold(name)] = canonical
+            for alias in entry.get("aliases", []):
+                aliases[_fold(alias)] = canonical
+            supplements[canonical] = SupplementFindings.model_validate(entry)
+
+        pairs: Dict[FrozenSet[str], PairFindings] = {}
+        for entry in list(data.get("pairs", [])):  # type: ignore[arg-type]
+            members = frozenset(key(name) for name in entry["supplements"])
+            unknown = members - supplements.keys()
+            if len(members) != 2 or unknown:
+                raise ValueError(f"Invalid knowledge base pair {entry['supplements']!r}")
+            pairs[members] = PairFindings.model_validate(entry)
+
+        return cls(
+            version=str(data.get("version", "0")),
+            aliases=aliases,
+            supplements=supplements,
+            pairs=pairs,
+            canonicalizer=canonicalizer,
+        )
+
+    @classmethod
+    def load(
+        cls, path: Path = DEFAULT_KNOWLEDGE_BASE_PATH, *, canonicalizer: Optional[Canonicalizer] = None
+    ) -> "KnowledgeBase":
+        """Load and index a knowledge base JSON file."""
+
+        with open(path, encoding="utf-8") as handle:
+            return cls.from_dict(json.load(handle), canonicalizer=canonicalizer)
+
+    def canonical(self, name: str) -> Optional[str]:
+        """Map a supplement name, with or without form and dose, to the key of its curated entry.
+
+        With a canonicalizer that is the ingredient ID, so ``"Zinc Oxide 50 mg"`` is zinc;
+        otherwise the name or one of the file's aliases is looked up.
+        """
+
+        if self._canonicalizer is not None:
+            ingredient_id = self._canonicalizer.canonicalize(name).ingredient_id
+            return ingredient_id if ingredient_id in self._supplements else None
+        canonical = self._aliases.get(_fold(name))
+        if canonical is None:
+            # Curated findings hold for any dose: "Zinc Picolinate 30 mg" is still zinc.
+            canonical = self._aliases.get(_fold(split_dose(name)[0]))
+        return canonical
+
+    def supplement(self, name: str) -> Optional[SupplementFindings]:
+        """Return curated single-supplement findings, or ``None`` if not covered."""
+
+        canonical = self.canonical(name)
+        return self._supplements.get(canonical) if canonical else None
+
+    def pair(self, first: str, second: str) -> Optional[PairFindings]:
+        """Return curated findings for an unordered pair, or ``None`` if not covered."""
+
+        members = {self.canonical(first), self.canonical(second)}
+        if None in members or len(members) != 2:
+            return None
+        return self._pairs.get(frozenset(members))  # type: ignore[arg-type]
+
+    def covers(self, supplements: Iterable[str]) -> bool:
+        """Return whether every supplement and every pair in the stack is covered."""
+
+        canonical = [self.canonical(name) for name in supplements]
+        if None in canonical:
+            return False
+        names = list(dict.fromkeys(canonical))
+        return all(
+            self.pair(first, second) is not None
+            for index, first in enumerate(names)
+            for second in names[index + 1 :]
+        )
+
+    def __len__(self) -> int:
+        return len(self._supplements) + len(self._pairs)
+
+
+@lru_cache(maxsize=1)
+def get_knowledge_base() -> Optional[KnowledgeBase]:
+    """Return the process-wide knowledge base, or ``None`` when it is disabled."""
+
+    settings = load_settings()
+    if not settings.knowledge_base_enabled:
+        return None
+    return KnowledgeBase.load(
+        Path(settings.knowledge_base_path or DEFAULT_KNOWLEDGE_BASE_PATH), canonicalizer=get_canonicalizer()
+    )
@@ -0,0 +1,370 @@
+"""Lightweight per-stage latency, token, cache and validation metrics.
+
+Metrics are kept in process and rendered in the Prometheus text exposition
+format by ``GET /metrics``; no client library is needed. Request stages are
+timed with :func:`stage`:
+
+``report``            one whole report generation (after knowledge base and cache checks)
+``prompt_build``      building the prompt
+``admission_wait``    waiting for an admission slot or rate-limit tokens
+``connect``           TCP connection setup to an OpenAI-compatible provider
+``tls_handshake``     TLS handshake on a new connection
+``time_to_first_byte`` request sent until response headers arrived
+``time_to_first_token`` streaming: request start until the first content delta
+``provider_call``     one complete provider call, including network
+``validation``        Pydantic validation of model output
+
+With ``METRICS_OTEL_SPANS=true`` every stage is also an OpenTelemetry span
+(``opentelemetry-api`` must be installed and a tracer provider configured).
+With ``METRICS_ENABLED=false`` :func:`stage` returns a shared no-op context
+manager and the record helpers return immediately.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .config import load_settings
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+_NOOP: ContextManager[None] = nullcontext()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter keyed by label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], float]]:
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in self.samples()]
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._bounds = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self._bounds) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = [(labels, list(series[0]), series[1], series[2]) for labels, series in self._series.items()]
+        lines: List[str] = []
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket in zip(self._bounds + (float("inf"),), counts):
+                cumulative += bucket
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """Gauge computed from a callback when metrics are rendered."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], List[Tuple[Tuple[str, ...], float]]],
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in self._collect()]
+
+
+class MetricsRegistry:
+    """Ordered collection of metrics rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: List[Any] = []
+
+    def register(self, metric: Any) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format (version 0.0.4)."""
+
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS: Histogram = REGISTRY.register(
+    Histogram("vitalstack_stage_duration_seconds", "Time spent per request stage.", ("stage", "provider"))
+)
+LLM_REQUESTS: Counter = REGISTRY.register(
+    Counter("vitalstack_llm_requests_total", "Provider calls by outcome.", ("provider", "outcome"))
+)
+LLM_TOKENS: Counter = REGISTRY.register(
+    Counter(
+        "vitalstack_llm_tokens_total",
+        "Tokens reported by provider responses (kind: prompt, completion, cached).",
+        ("provider", "kind"),
+    )
+)
+CACHE_LOOKUPS: Counter = REGISTRY.register(
+    Counter(
+        "vitalstack_cache_lookups_total",
+        "Knowledge base, report cache and pairwise unit cache lookups.",
+        ("cache", "result"),
+    )
+)
+
+
+def _hit_ratios() -> List[Tuple[Tuple[str, ...], float]]:
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), value in CACHE_LOOKUPS.samples():
+        hits_total = totals.setdefault(cache, [0.0, 0.0])
+        hits_total[1] += value
+        if result == "hit":
+            hits_total[0] += value
+    return [((cache,), hits / total) for cache, (hits, total) in totals.items() if total]
+
+
+REGISTRY.register(Gauge("vitalstack_cache_hit_ratio", "Lifetime hit ratio per cache.", ("cache",), _hit_ratios))
+VALIDATION_FAILURES: Counter = REGISTRY.register(
+    Counter("vitalstack_validation_failures_total", "Model outputs that failed validation.", ("model",))
+)
+REPAIRS: Counter = REGISTRY.register(
+    Counter(
+        "vitalstack_repairs_total",
+        "Invalid model outputs by repair path (syntax, salvage, fix_call, failed).",
+        ("model", "path"),
+    )
+)
+ADMISSION_REJECTIONS: Counter = REGISTRY.register(
+    Counter("vitalstack_admission_rejections_total", "Provider calls shed by admission control.", ("reason",))
+)
+REQUEST_ABORTS: Counter = REGISTRY.register(
+    Counter(
+        "vitalstack_request_aborts_total",
+        "Requests abandoned before their report was ready (cancelled, expired).",
+        ("reason",),
+    )
+)
+
+CASCADE_REPORTS: Counter = REGISTRY.register(
+    Counter("vitalstack_cascade_reports_total", "Cascade reports by the tier that answered.", ("tier",))
+)
+CASCADE_ESCALATIONS: Counter = REGISTRY.register(
+    Counter("vitalstack_cascade_escalations_total", "Cascade escalations to the large model by reason.", ("reason",))
+)
+
+
+@lru_cache(maxsize=1)
+def metrics_enabled() -> bool:
+    """Whether metrics are recorded in this process (``METRICS_ENABLED``)."""
+
+    return load_settings().metrics_enabled
+
+
+@lru_cache(maxsize=1)
+def _tracer() -> Any:
+    settings = load_settings()
+    if not (settings.metrics_enabled and settings.metrics_otel_spans):
+        return None
+    try:
+        from opentelemetry import trace  # type: ignore import-not-found
+    except ImportError as exc:  # pragma: no cover - defensive guard
+        raise RuntimeError(
+            "opentelemetry-api is required for METRICS_OTEL_SPANS. Install it with `pip install opentelemetry-api`."
+        ) from exc
+    return trace.get_tracer("vitalstack")
+
+
+@contextmanager
+def _timed_stage(name: str, provider: str) -> Iterator[None]:
+    tracer = _tracer()
+    started = time.perf_counter()
+    try:
+        if tracer is None:
+            yield
+        else:
+            with tracer.start_as_current_span(f"vitalstack.{name}", attributes={"vitalstack.provider": provider}):
+                yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, name, provider)
+
+
+def stage(name: str, provider: str = "") -> ContextManager[None]:
+    """Time a block as request stage ``name`` (and an OpenTelemetry span when enabled)."""
+
+    if not metrics_enabled():
+        return _NOOP
+    return _timed_stage(name, provider)
+
+
+def observe_stage(name: str, provider: str, seconds: float) -> None:
+    """Record a stage duration measured elsewhere (e.g. from transport trace events)."""
+
+    if metrics_enabled():
+        STAGE_SECONDS.observe(seconds, name, provider)
+
+
+def record_completion(provider: str, raw_response: Optional[Dict[str, Any]], *, error: bool = False) -> None:
+    """Count one provider call and the token usage it reported."""
+
+    if not metrics_enabled():
+        return
+    LLM_REQUESTS.inc(provider, "error" if error else "ok")
+    usage = (raw_response or {}).get("usage") or {}
+    if not usage:
+        return
+    LLM_TOKENS.inc(provider, "prompt", amount=usage.get("prompt_tokens", 0))
+    LLM_TOKENS.inc(provider, "completion", amount=usage.get("completion_tokens", 0))
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+    if cached:
+        LLM_TOKENS.inc(provider, "cached", amount=cached)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    if metrics_enabled():
+        CACHE_LOOKUPS.inc(cache, "hit" if hit else "miss")
+
+
+def record_validation_failure(model: str) -> None:
+    if metrics_enabled():
+        VALIDATION_FAILURES.inc(model)
+
+
+def record_repair(model: str, path: str) -> None:
+    if metrics_enabled():
+        REPAIRS.inc(model, path)
+
+
+def record_admission_rejection(reason: str) -> None:
+    if metrics_enabled():
+        ADMISSION_REJECTIONS.inc(reason)
+
+
+def record_request_abort(reason: str) -> None:
+    if metrics_enabled():
+        REQUEST_ABORTS.inc(reason)
+
+
+def record_cascade(tier: str, reasons: Sequence[str]) -> None:
+    if not metrics_enabled():
+        return
+    CASCADE_REPORTS.inc(tier)
+    for reason in reasons:
+        CASCADE_ESCALATIONS.inc(reason)
+
+
+class HttpTrace:
+    """httpx ``trace`` extension that records connection setup and time to first byte.
+
+    Pooled connections emit no connect events, so ``connect`` and ``tls_handshake``
+    are only observed for requests that opened a new connection.
+    """
+
+    __slots__ = ("_provider", "_connect_started", "_tls_started", "_request_sent")
+
+    def __init__(self, provider: str) -> None:
+        self._provider = provider
+        self._connect_started: Optional[float] = None
+        self._tls_started: Optional[float] = None
+        self._request_sent: Optional[float] = None
+
+    def __call__(self, event: str, info: Dict[str, Any]) -> None:
+        now = time.perf_counter()
+        if event == "connection.connect_tcp.started":
+            self._connect_started = now
+        elif event == "connection.connect_tcp.complete" and self._connect_started is not None:
+            observe_stage("connect", self._provider, now - self._connect_started)
+        elif event == "connection.start_tls.started":
+            self._tls_started = now
+        elif event == "connection.start_tls.complete" and self._tls_started is not None:
+            observe_stage("tls_handshake", self._provider, now - self._tls_started)
+        elif event.endswith(".send_request_body.complete"):
+            self._request_sent = now
+        elif event.endswith(".receive_response_headers.complete") and self._request_sent is not None:
+            observe_stage("time_to_first_byte", self._provider, now - self._request_sent)
+
+    async def acall(self, event: str, info: Dict[str, Any]) -> None:
+        self(event, info)
+
+
+def render_metrics() -> str:
+    """Prometheus text for ``GET /metrics``."""
+
+    return REGISTRY.render()
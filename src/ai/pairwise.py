@@ -0,0 +1,299 @@
+"""Pairwise decomposition of a supplement stack into independently memoized units.
+
+Instead of one monolithic prompt per stack, every unordered pair is analysed for
+conflicts and synergies and every supplement on its own for depletions,
+optimizations and dosage warnings. Units covered by the local knowledge base are
+answered from it, and every other unit is memoized under its own key, so adding
+one supplement to a stack of N only sends the N new pairs and one new
+single-supplement unit to the model.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from ..models import SupplementInteractionRequest, SupplementInteractionResponse
+from ..models.interaction import struct_interactions
+from .cache import ReportCache, build_unit_key, get_report_cache, ingredient_key
+from .client import AsyncLLMClient, LLMClient
+from .config import LLMSettings
+from .findings import PairFindings, SupplementFindings
+from .knowledge_base import KnowledgeBase, get_knowledge_base
+from .metrics import record_cache_lookup
+from .prompts import build_pair_prompt, build_supplement_prompt
+from .repair import Repair, combine_repairs, completion_content, repair_completion, repair_completion_async
+from .schema import PAIR_SCHEMA, SUPPLEMENT_SCHEMA, CompiledSchema
+
+PAIR_UNIT = "pair"
+SUPPLEMENT_UNIT = "supplement"
+
+# Where a unit's findings came from, as reported in ``meta["sources"]``.
+SOURCE_KNOWLEDGE_BASE = "knowledge_base"
+SOURCE_MEMOIZED = "memoized"
+SOURCE_MODEL = "model"
+
+_SEVERITY_RANK = {"low": 0, "moderate": 1, "high": 2, "critical": 3}
+
+
+@dataclass(frozen=True)
+class AnalysisUnit:
+    """One independently answerable slice of a stack analysis."""
+
+    kind: str
+    supplements: Tuple[str, ...]
+
+    @property
+    def compiled_schema(self) -> CompiledSchema[Any]:
+        return PAIR_SCHEMA if self.kind == PAIR_UNIT else SUPPLEMENT_SCHEMA
+
+    def prompt(self) -> str:
+        if self.kind == PAIR_UNIT:
+            return build_pair_prompt(*self.supplements)
+        return build_supplement_prompt(self.supplements[0])
+
+    def key(self, settings: LLMSettings) -> str:
+        return build_unit_key(self.kind, self.supplements, settings)
+
+    @property
+    def label(self) -> str:
+        return " + ".join(self.supplements)
+
+
+def plan_units(supplements: Iterable[str]) -> List[AnalysisUnit]:
+    """Split a stack into single-supplement units followed by every unordered pair.
+
+    Names of the same ingredient (see :func:`src.ai.cache.ingredient_key`) are
+    collapsed, keeping the first spelling for the prompt, so a stack never pairs
+    an ingredient with itself.
+    """
+
+    names: Dict[str, str] = {}
+    for raw in supplements:
+        name = " ".join(raw.split())
+        if name:
+            names.setdefault(ingredient_key(name), name)
+    ordered = [names[key] for key in sorted(names)]
+
+    units = [AnalysisUnit(SUPPLEMENT_UNIT, (name,)) for name in ordered]
+    units.extend(AnalysisUnit(PAIR_UNIT, pair) for pair in combinations(ordered, 2))
+    return units
+
+
+def _accept_unit(
+    unit: AnalysisUnit,
+    repair: Repair[Any],
+    settings: LLMSettings,
+    cache: Optional[ReportCache],
+    repairs: Dict[str, Repair[Any]],
+) -> BaseModel:
+    """Unwrap a unit's parsed findings, memoizing them unless findings had to be dropped."""
+
+    try:
+        findings = repair.unwrap(unit.compiled_schema)
+    except ValueError as exc:
+        raise ValueError(f"Unable to parse LLM response for {unit.kind} unit {unit.supplements}") from exc
+    repairs[unit.label] = repair
+    if not repair.lossy:
+        _memoize(unit, findings, settings, cache)
+    return findings
+
+
+def _knowledge_base_findings(unit: AnalysisUnit, kb: Optional[KnowledgeBase]) -> Optional[BaseModel]:
+    if kb is None:
+        return None
+    if unit.kind == PAIR_UNIT:
+        return kb.pair(*unit.supplements)
+    return kb.supplement(unit.supplements[0])
+
+
+def _resolve_locally(
+    units: Sequence[AnalysisUnit],
+    settings: LLMSettings,
+    cache: Optional[ReportCache],
+    kb: Optional[KnowledgeBase],
+) -> Tuple[Dict[AnalysisUnit, BaseModel], Dict[AnalysisUnit, str], List[AnalysisUnit]]:
+    """Answer units from the knowledge base or the memo cache.
+
+    Returns the findings found, where each came from, and the units that still
+    need the model.
+    """
+
+    found: Dict[AnalysisUnit, BaseModel] = {}
+    sources: Dict[AnalysisUnit, str] = {}
+    missing: List[AnalysisUnit] = []
+    for unit in units:
+        curated = _knowledge_base_findings(unit, kb)
+        if curated is not None:
+            found[unit], sources[unit] = curated, SOURCE_KNOWLEDGE_BASE
+            continue
+        if cache is None:
+            missing.append(unit)
+            continue
+        cached = cache.get(unit.key(settings))
+        record_cache_lookup("unit", cached is not None)
+        if cached is None:
+            missing.append(unit)
+        else:
+            found[unit] = unit.compiled_schema.parse(cached)
+            sources[unit] = SOURCE_MEMOIZED
+    return found, sources, missing
+
+
+def _memoize(unit: AnalysisUnit, findings: BaseModel, settings: LLMSettings, cache: Optional[ReportCache]) -> None:
+    if cache is not None:
+        cache.set(unit.key(settings), findings.model_dump_json())
+
+
+def summarize_interactions(supplements: Sequence[str], interactions: struct_interactions) -> str:
+    """Build a short deterministic summary of merged findings without another model call."""
+
+    sentences = [f"Analysed {len(supplements)} supplements for pairwise interactions."]
+    if interactions.conflicts:
+        worst = max(interactions.conflicts, key=lambda conflict: _SEVERITY_RANK.get(conflict.severity, 0))
+        sentences.append(
+            f"Found {len(interactions.conflicts)} conflict(s); the most severe ({worst.severity}) "
+            f"involves {' and '.join(worst.supplements)}."
+        )
+    else:
+        sentences.append("No clinically relevant conflicts were identified.")
+    if interactions.synergies:
+        sentences.append(f"{len(interactions.synergies)} synergy(ies) support the current combination.")
+    if interactions.depletions:
+        nutrients = sorted({depletion.depleted_nutrient for depletion in interactions.depletions})
+        sentences.append(f"Watch for depletion of {', '.join(nutrients)}.")
+    return " ".join(sentences)
+
+
+def merge_findings(
+    supplements: Sequence[str], findings: Dict[AnalysisUnit, BaseModel]
+) -> SupplementInteractionResponse:
+    """Combine per-unit findings into a full report in stable unit order."""
+
+    interactions = struct_interactions()
+    for unit in sorted(findings, key=lambda item: (item.kind, item.supplements)):
+        result = findings[unit]
+        if isinstance(result, PairFindings):
+            interactions.conflicts.extend(result.conflicts)
+            interactions.synergies.extend(result.synergies)
+        elif isinstance(result, SupplementFindings):
+            interactions.depletions.extend(result.depletions)
+            interactions.optimizations.extend(result.optimizations)
+            interactions.dosage_warnings.extend(result.dosage_warnings)
+    return SupplementInteractionResponse(
+        analysis_summary=summarize_interactions(supplements, interactions),
+        interactions=interactions,
+    )
+
+
+def _finalize(
+    units: Sequence[AnalysisUnit],
+    findings: Dict[AnalysisUnit, BaseModel],
+    sources: Dict[AnalysisUnit, str],
+    repairs: Optional[Dict[str, Repair[Any]]] = None,
+) -> SupplementInteractionResponse:
+    names = [unit.supplements[0] for unit in units if unit.kind == SUPPLEMENT_UNIT]
+    report = merge_findings(names, findings)
+    counts = Counter(sources.values())
+    report.meta["pairwise"] = {
+        "units": len(units),
+        SOURCE_KNOWLEDGE_BASE: counts[SOURCE_KNOWLEDGE_BASE],
+        SOURCE_MEMOIZED: counts[SOURCE_MEMOIZED],
+        SOURCE_MODEL: counts[SOURCE_MODEL],
+    }
+    report.meta["sources"] = {unit.label: sources[unit] for unit in units}
+    if repairs:
+        report.meta["repair"] = combine_repairs(repairs)
+    return report
+
+
+def knowledge_base_report(
+    request: SupplementInteractionRequest, kb: Optional[KnowledgeBase]
+) -> Optional[SupplementInteractionResponse]:
+    """Answer the whole stack from the knowledge base, or return ``None`` if any unit is uncovered."""
+
+    if kb is None or not kb.covers(request.supplements):
+        return None
+    units = plan_units(request.supplements)
+    findings: Dict[AnalysisUnit, BaseModel] = {}
+    for unit in units:
+        curated = _knowledge_base_findings(unit, kb)
+        if curated is None:
+            return None
+        findings[unit] = curated
+    return _finalize(units, findings, dict.fromkeys(units, SOURCE_KNOWLEDGE_BASE))
+
+
+UnitResults = Tuple[Dict[AnalysisUnit, BaseModel], Dict[AnalysisUnit, str], Dict[str, Repair[Any]]]
+
+
+def generate_pairwise_report(
+    request: SupplementInteractionRequest, client: LLMClient
+) -> SupplementInteractionResponse:
+    """Analyse a stack unit by unit, sending only non-memoized units to the model in parallel."""
+
+    units = plan_units(request.supplements)
+    return _finalize(units, *analyse_units(units, client))
+
+
+async def generate_pairwise_report_async(
+    request: SupplementInteractionRequest, client: AsyncLLMClient
+) -> SupplementInteractionResponse:
+    """Asyncio variant of :func:`generate_pairwise_report`."""
+
+    units = plan_units(request.supplements)
+    return _finalize(units, *await analyse_units_async(units, client))
+
+
+def analyse_units(units: Sequence[AnalysisUnit], client: LLMClient) -> UnitResults:
+    """Answer ``units`` from the knowledge base, the memo cache, or the model in parallel.
+
+    Returns the findings per unit, where each came from, and the repairs made to model output.
+    """
+
+    settings = client.settings
+    cache = get_report_cache()
+    findings, sources, missing = _resolve_locally(units, settings, cache, get_knowledge_base())
+    repairs: Dict[str, Repair[Any]] = {}
+
+    def run(unit: AnalysisUnit) -> BaseModel:
+        schema = unit.compiled_schema
+        raw_response = client.create_chat_completion(prompt=unit.prompt(), response_format=schema.response_format)
+        repair = repair_completion(schema, completion_content(raw_response), client)
+        return _accept_unit(unit, repair, settings, cache, repairs)
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(settings.pairwise_max_concurrency, len(missing))) as pool:
+            findings.update(zip(missing, pool.map(run, missing)))
+    sources.update(dict.fromkeys(missing, SOURCE_MODEL))
+    return findings, sources, repairs
+
+
+async def analyse_units_async(units: Sequence[AnalysisUnit], client: AsyncLLMClient) -> UnitResults:
+    """Asyncio variant of :func:`analyse_units`."""
+
+    settings = client.settings
+    cache = get_report_cache()
+    findings, sources, missing = _resolve_locally(units, settings, cache, get_knowledge_base())
+    slots = asyncio.Semaphore(settings.pairwise_max_concurrency)
+    repairs: Dict[str, Repair[Any]] = {}
+
+    async def run(unit: AnalysisUnit) -> BaseModel:
+        schema = unit.compiled_schema
+        async with slots:
+            raw_response = await client.create_chat_completion(
+                prompt=unit.prompt(), response_format=schema.response_format
+            )
+            repair = await repair_completion_async(schema, completion_content(raw_response), client)
+        return _accept_unit(unit, repair, settings, cache, repairs)
+
+    if missing:
+        findings.update(zip(missing, await asyncio.gather(*(run(unit) for unit in missing))))
+    sources.update(dict.fromkeys(missing, SOURCE_MODEL))
+    return findings, sources, repairs
@@ -0,0 +1,306 @@
+"""Popularity tracking and the store of precomputed reports for popular stacks.
+
+Traffic is heavy-tailed: a few common stacks, and the supplement pairs inside
+them, account for much of the load. With ``PRECOMPUTE_ENABLED=true`` the
+request path samples ``PRECOMPUTE_SAMPLE_RATE`` of the requests without
+out-of-range biomarkers. For each sampled request it counts the stack and every
+pair in it in a count-min sketch:
+
+* a :class:`CountMinSketch` estimates any item's count in fixed memory, never
+  below its true count, using conservative updates to keep overestimates small;
+* a :class:`HeavyHitters` list keeps the items with the largest estimates, a
+  few times ``PRECOMPUTE_TOP_K`` of them, to rank;
+* every ``PRECOMPUTE_HALF_LIFE`` seconds all counts are halved, so the ranking
+  follows shifts in traffic.
+
+:class:`src.services.precompute.Precomputer` computes reports for the top
+stacks and pairs while the provider is idle. It writes them to a
+:class:`PrecomputedStore`, a SQLite file at ``PRECOMPUTE_PATH`` that survives
+restarts. Rows are looked up by report cache key. That key includes the model,
+prompt version and output settings, so a version change turns every row into a
+miss until the precomputer refreshes it. The request path reads the store after
+the report cache and before calling the model.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from itertools import combinations
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..models import SupplementInteractionRequest
+from .cache import canonicalize_supplements
+from .config import LLMSettings, load_settings
+
+SKETCH_WIDTH = 4096
+SKETCH_DEPTH = 4
+# Candidates ranked per item kind, as a multiple of PRECOMPUTE_TOP_K.
+CANDIDATE_FACTOR = 4
+
+Stack = Tuple[str, ...]
+
+
+def stack_id(names: Sequence[str]) -> str:
+    """Identify a stack (or pair) by its canonical labels, independently of order and spelling."""
+
+    return "|".join(canonicalize_supplements(names))
+
+
+class CountMinSketch:
+    """Approximate counts of string items in ``depth`` rows of ``width`` counters."""
+
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH) -> None:
+        self.width = width
+        self.depth = depth
+        self._rows: List[List[float]] = [[0.0] * width for _ in range(depth)]
+
+    def _cells(self, item: str) -> List[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=8 * self.depth).digest()
+        return [int.from_bytes(digest[8 * row : 8 * row + 8], "little") % self.width for row in range(self.depth)]
+
+    def estimate(self, item: str) -> float:
+        """Estimated count of ``item``; never below the true count."""
+
+        return min(row[cell] for row, cell in zip(self._rows, self._cells(item)))
+
+    def add(self, item: str, count: float = 1.0) -> float:
+        """Count ``item`` and return its new estimate.
+
+        Conservative update: only counters that would otherwise fall below the
+        new estimate are raised.
+        """
+
+        cells = self._cells(item)
+        estimate = min(row[cell] for row, cell in zip(self._rows, cells)) + count
+        for row, cell in zip(self._rows, cells):
+            if row[cell] < estimate:
+                row[cell] = estimate
+        return estimate
+
+    def decay(self, factor: float = 0.5) -> None:
+        """Scale every counter by ``factor``."""
+
+        self._rows = [[value * factor for value in row] for row in self._rows]
+
+
+class HeavyHitters:
+    """The ``capacity`` items with the largest sketch estimates seen so far."""
+
+    def __init__(self, capacity: int, sketch: Optional[CountMinSketch] = None) -> None:
+        self.capacity = capacity
+        self.sketch = sketch or CountMinSketch()
+        # stack id -> (display names, estimate)
+        self._candidates: Dict[str, Tuple[Stack, float]] = {}
+
+    def add(self, item: str, names: Stack) -> None:
+        estimate = self.sketch.add(item)
+        if item in self._candidates or len(self._candidates) < self.capacity:
+            self._candidates[item] = (names, estimate)
+            return
+        weakest = min(self._candidates, key=lambda key: self._candidates[key][1])
+        if estimate > self._candidates[weakest][1]:
+            del self._candidates[weakest]
+            self._candidates[item] = (names, estimate)
+
+    def top(self, k: int) -> List[Tuple[Stack, float]]:
+        """The ``k`` items with the largest estimates, largest first."""
+
+        return sorted(self._candidates.values(), key=lambda entry: entry[1], reverse=True)[:k]
+
+    def decay(self, factor: float = 0.5) -> None:
+        self.sketch.decay(factor)
+        self._candidates = {key: (names, count * factor) for key, (names, count) in self._candidates.items()}
+
+
+class PopularityTracker:
+    """Sampled, decaying counts of the stacks and supplement pairs requested."""
+
+    def __init__(
+        self,
+        *,
+        top_k: int,
+        sample_rate: float = 1.0,
+        half_life_seconds: float = 3600.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.top_k = top_k
+        self.sample_rate = sample_rate
+        self.half_life_seconds = half_life_seconds
+        self.stacks = HeavyHitters(top_k * CANDIDATE_FACTOR)
+        self.pairs = HeavyHitters(top_k * CANDIDATE_FACTOR)
+        self.sampled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._decayed_at = time.monotonic()
+
+    def observe(self, request: SupplementInteractionRequest) -> bool:
+        """Sample ``request`` (canonicalized, biomarkers screened); return whether it was counted.
+
+        Requests with out-of-range biomarkers get personalised reports, so they are not counted.
+        """
+
+        if request.biomarkers or self._random.random() >= self.sample_rate:
+            return False
+        names: Dict[str, str] = {}
+        for name in request.supplements:
+            names.setdefault(stack_id([name]), name)
+        if not names:
+            return False
+        ordered = tuple(names[key] for key in sorted(names))
+        with self._lock:
+            self._decay_due()
+            self.sampled += 1
+            self.stacks.add(stack_id(ordered), ordered)
+            for pair in combinations(ordered, 2):
+                self.pairs.add(stack_id(pair), pair)
+        return True
+
+    def _decay_due(self) -> None:
+        now = time.monotonic()
+        while now - self._decayed_at >= self.half_life_seconds:
+            self.stacks.decay()
+            self.pairs.decay()
+            self._decayed_at += self.half_life_seconds
+
+    def top(self) -> List[Tuple[Stack, float]]:
+        """The top-K stacks and the top-K pairs (pairs already among the stacks once), most requested first."""
+
+        with self._lock:
+            entries = self.stacks.top(self.top_k) + self.pairs.top(self.top_k)
+        ranked: Dict[str, Tuple[Stack, float]] = {}
+        for names, count in sorted(entries, key=lambda entry: entry[1], reverse=True):
+            ranked.setdefault(stack_id(names), (names, count))
+        return list(ranked.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sampled": self.sampled,
+            "top": [{"supplements": list(names), "estimate": round(count, 2)} for names, count in self.top()],
+        }
+
+
+class PrecomputedStore:
+    """SQLite store of precomputed report JSON, one row per stack, looked up by report cache key."""
+
+    def __init__(self, *, path: str, capacity: int) -> None:
+        self._capacity = capacity
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS precomputed ("
+            " stack TEXT PRIMARY KEY,"
+            " supplements TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " estimate REAL NOT NULL,"
+            " stored_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS precomputed_key ON precomputed (key)")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the report JSON precomputed under ``key`` or ``None``."""
+
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM precomputed WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM precomputed WHERE key = ?", (key,)).fetchone() is not None
+
+    def put(self, names: Stack, key: str, value: str, estimate: float) -> None:
+        """Store the report for ``names``, replacing one computed under an older key, then evict past capacity.
+
+        The rows with the lowest popularity estimates are evicted first.
+        """
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO precomputed (stack, supplements, key, value, estimate, stored_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (stack_id(names), json.dumps(list(names)), key, value, estimate, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM precomputed WHERE stack NOT IN"
+                " (SELECT stack FROM precomputed ORDER BY estimate DESC, stored_at DESC LIMIT ?)",
+                (self._capacity,),
+            )
+
+    def stacks(self) -> List[Tuple[Stack, str, float]]:
+        """Every stored stack with the key it was computed under and its estimate, most popular first."""
+
+        with self._lock:
+            rows = self._conn.execute("SELECT supplements, key, estimate FROM precomputed ORDER BY estimate DESC")
+            return [(tuple(json.loads(names)), key, estimate) for names, key, estimate in rows]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM precomputed").fetchone()
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM precomputed")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_popularity_tracker(settings: LLMSettings) -> Optional[PopularityTracker]:
+    """Build the tracker configured by ``PRECOMPUTE_*``, or ``None`` when precomputation is off."""
+
+    if not settings.precompute_enabled:
+        return None
+    return PopularityTracker(
+        top_k=settings.precompute_top_k,
+        sample_rate=settings.precompute_sample_rate,
+        half_life_seconds=settings.precompute_half_life_seconds,
+    )
+
+
+def create_precomputed_store(settings: LLMSettings) -> Optional[PrecomputedStore]:
+    """Open the store at ``PRECOMPUTE_PATH``, or ``None`` when precomputation is off."""
+
+    if not settings.precompute_enabled:
+        return None
+    # Room for the top-K stacks and the top-K pairs.
+    return PrecomputedStore(path=settings.precompute_path, capacity=2 * settings.precompute_top_k)
+
+
+@lru_cache(maxsize=1)
+def get_popularity_tracker() -> Optional[PopularityTracker]:
+    """Return the process-wide popularity tracker, or ``None`` when precomputation is off."""
+
+    return create_popularity_tracker(load_settings())
+
+
+@lru_cache(maxsize=1)
+def get_precomputed_store() -> Optional[PrecomputedStore]:
+    """Return the process-wide precomputed report store, or ``None`` when precomputation is off."""
+
+    return create_precomputed_store(load_settings())
+
+
+def observe_request(request: SupplementInteractionRequest) -> None:
+    """Count a canonicalized live request towards stack popularity; a no-op when precomputation is off."""
+
+    tracker = get_popularity_tracker()
+    if tracker is not None:
+        tracker.observe(request)
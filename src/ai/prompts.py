@@ -1,95 +1,417 @@
-"""Prompt construction helpers for supplement interaction analysis."""
+"""Prompt construction helpers for supplement interaction analysis.
+
+Every prompt is laid out as a byte-stable static prefix (role, rules and one
+copy of the output schema) followed by the request-specific part (the stack and
+any biomarkers) at the very end. Identical prefixes are what vLLM prefix
+caching, OpenAI cached input and Bedrock ``cachePoint`` blocks key on, so
+nothing request-specific may appear before the split point.
+"""
 
 from __future__ import annotations
 
-from typing import Iterable, Optional
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
 from ..models import SupplementInteractionRequest
+from .biomarkers import flag_biomarkers
+
+# Bump whenever the prompt text or schema changes so cached reports are not reused.
+PROMPT_VERSION = "2"
+
+ROLE = "Role: You are an expert clinical pharmacologist and nutritionist specializing in supplement interactions."
+
 INTERACTION_ANALYSIS_SCHEMA = """
 {
-   "analysis_summary": "A 2-3 sentence executive summary of the interaction. Do NOT just say 'interactions'.",{
-        "interactions": {
-            "conflicts": [
-                {
-                    "supplements": ["string", "string"],
-                    "mechanism": "string",
-                    "evidence_level": "low|moderate|high|inconclusive",
-                    "source_url": "string (optional)",
-                }
-            ],
-            "synergies": [
-                {
-                    "supplements": ["string", "string"],
-                    "mechanism": "string",
-                    "evidence_level": "low|moderate|high|inconclusive",
-                    "category": "string (optional)",
-                    "source_url": "string (optional)",
-                }
-            ],
-            "depletions": [
-                {
-                    "offending_supplement": "string",
-                    "depleted_nutrient": "string",
-                    "mechanism": "string",
-                    "severity": "low|moderate|high",
-                    "recommendation": "string",
-                }
-            ],
-            "optimizations": [
-                {
-                    "supplement": "string",
-                    "suggested_form": "string",
-                    "rationale": "string",
-                } ],
-            "dosage_warnings": [ {
+    "analysis_summary": "A 2-3 sentence executive summary of the stack. Do NOT just say 'interactions'.",
+    "interactions": {
+        "conflicts": [
+            {
+                "supplements": ["string", "string"],
+                "mechanism": "string",
+                "evidence_level": "low|moderate|high|inconclusive",
+                "severity": "low|moderate|high|critical",
+                "management_strategy": "none|temporal_separation|dose_reduction|discontinuation|monitor",
+                "management_instruction": "string",
+                "source_url": "string (optional)"
+            }
+        ],
+        "synergies": [
+            {
+                "supplements": ["string", "string"],
+                "mechanism": "string",
+                "evidence_level": "low|moderate|high|inconclusive",
+                "category": "string (optional)",
+                "source_url": "string (optional)"
+            }
+        ],
+        "depletions": [
+            {
+                "offending_supplement": "string",
+                "depleted_nutrient": "string",
+                "mechanism": "string",
+                "severity": "low|moderate|high",
+                "recommendation": "string"
+            }
+        ],
+        "optimizations": [
+            {
                 "supplement": "string",
-                "warning": "string",
+                "suggested_form": "string",
+                "rationale": "string"
             }
-            ]
-        },
-        "meta": {}
-    } 
+        ],
+        "dosage_warnings": [
+            {
+                "supplement": "string",
+                "warning": "string"
+            }
+        ]
+    }
 }
 """
 
-def build_interaction_prompt(
-        request: SupplementInteractionRequest, *, biomarkers: Optional[Iterable[str]] = None
-    ) -> str:
+def _interaction_instructions(summary_key: str, evidence_key: str, *notes: str) -> str:
+    return "\n".join(
+        [
+            ROLE,
+            "Task: Identify the CLINICALLY RELEVANT interactions in the supplement stack given at the end "
+            "that require intervention.",
+            "",
+            "### Rules:",
+            "1. IGNORE THEORETICAL CONFLICTS: Do not report conflicts based solely on in-vitro (test tube) chemistry "
+            "if the combination is standard in clinical practice.",
+            "2. FORMS MATTER: When suggesting optimizations, specify chemical forms (e.g., 'magnesium citrate' vs "
+            "'magnesium'), not brand names.",
+            f"3. SUMMARY IS MANDATORY: '{summary_key}' must be a helpful paragraph, not a single word.",
+            "4. DEPLETIONS: Check if any supplement depletes nutrients (e.g., Diuretics -> Potassium, Zinc -> Copper).",
+            f"5. EVIDENCE: Use '{evidence_key}' to indicate confidence. Do not hallucinate mechanisms or evidence.",
+            "6. BIOMARKERS: If known biomarker issues are listed, treat findings that affect them as high priority.",
+            *notes,
+            "",
+            "### Required JSON Schema:",
+            "Respond with valid JSON only, strictly adhering to this schema:",
+        ]
+    )
+
+
+_INTERACTION_INSTRUCTIONS = _interaction_instructions("analysis_summary", "evidence_level")
+
+# Short keys and supplement numbers instead of field and supplement names (see src.ai.compact).
+COMPACT_ANALYSIS_SCHEMA = """
+{
+    "s": "analysis summary: a 2-3 sentence executive summary of the stack. Do NOT just say 'interactions'.",
+    "c": [
+        {
+            "p": [0, 1],
+            "m": "mechanism",
+            "e": "low|moderate|high|inconclusive",
+            "v": "low|moderate|high|critical",
+            "g": "none|temporal_separation|dose_reduction|discontinuation|monitor",
+            "i": "management instruction",
+            "u": "source url (optional)"
+        }
+    ],
+    "y": [
+        {
+            "p": [0, 1],
+            "m": "mechanism",
+            "e": "low|moderate|high|inconclusive",
+            "k": "category (optional)",
+            "u": "source url (optional)"
+        }
+    ],
+    "d": [
+        {
+            "p": 0,
+            "n": "depleted nutrient",
+            "m": "mechanism",
+            "v": "low|moderate|high",
+            "r": "recommendation"
+        }
+    ],
+    "o": [
+        {
+            "p": 0,
+            "f": "suggested form",
+            "r": "rationale"
+        }
+    ],
+    "w": [
+        {
+            "p": 0,
+            "w": "warning"
+        }
+    ]
+}
+"""
+
+_COMPACT_INSTRUCTIONS = _interaction_instructions(
+    "s",
+    "e",
+    "7. COMPACT KEYS: 'c' conflicts, 'y' synergies, 'd' depletions, 'o' optimizations, 'w' dosage warnings; "
+    "'e' evidence level, 'v' severity, 'g' management strategy.",
+    "8. SUPPLEMENT NUMBERS: 'p' holds the number of each supplement in the stack list, never its name. "
+    "In 'd', 'p' is the supplement causing the depletion.",
+)
+
+
+@dataclass(frozen=True)
+class PromptParts:
+    """A prompt split into its cacheable static prefix and its request-specific suffix.
+
+    ``sections`` maps a section name to its text for token accounting; the
+    sections concatenate to exactly ``prefix + suffix``.
     """
-    Compose the promnpt
+
+    prefix: str
+    suffix: str
+    sections: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def text(self) -> str:
+        return self.prefix + self.suffix
+
+
+def _static_prefix(*parts: str) -> str:
+    return "\n".join(parts).rstrip("\n") + "\n\n"
+
+
+def _compact_schema(schema: str) -> str:
+    """Re-serialize a schema template on one line; indentation costs tokens, not meaning."""
+
+    return json.dumps(json.loads(schema), separators=(", ", ": "))
+
+
+INTERACTION_PROMPT_PREFIX = _static_prefix(_INTERACTION_INSTRUCTIONS, _compact_schema(INTERACTION_ANALYSIS_SCHEMA))
+COMPACT_PROMPT_PREFIX = _static_prefix(_COMPACT_INSTRUCTIONS, _compact_schema(COMPACT_ANALYSIS_SCHEMA))
+
+
+def build_interaction_prompt_parts(
+    request: SupplementInteractionRequest,
+    *,
+    biomarkers: Optional[Iterable[str]] = None,
+    compact: bool = False,
+    caps: Optional[Mapping[str, int]] = None,
+) -> PromptParts:
+    """Compose the monolithic report prompt as static prefix plus stack-specific suffix.
+
+    ``biomarkers`` defaults to the out-of-range observations of ``request``; normal values are left out.
+    ``compact`` asks for the short-key format of :mod:`src.ai.compact` and numbers the stack for it.
+    ``caps`` limits findings per section; the limits follow the stack so the prefix stays shared.
     """
-    supplement_list = "\n".join(f"-{name}" for name in request.supplements)
-
-    lines = [
-        "Role: You are an expert clinical pharmacologist and nutritionist specializing in supplement interactions.",
-        "Task: Identify the CLINICALLY RELEVANT interactions that require intervention.", 
-        "",
-        "### User's Supplement Stack:"
-        "Supplements:\n" + supplement_list,   
-        "",
-        "### CRITICAL Rules for Anaslysis:",
-        "1. IGNORE THEORETICAL CONFLICTS: Do not report 'conflicts' based solely on in-vitro (test tube) chemistry if the combination is standard in clinial practice.",
-        "2. FORMS MATTER: When suggesting optimizations, specify chemical forms (e.g., 'magnesium citrate' vs 'magnesium')"
-        "3. SUMMARY IS MANDATORY: The 'anaylsis_summary' field must be a helpful paragraph, not a single word.",
-        "4. DEPLETIONS: Check if any supplement depletes nutrients (e.g., Diuretics -> potassium, Zinc -> Copper).",
-        "",
-        "### Output Format:",
-        "You must output valid JSON strictly adhering to this schema:",
-        INTERACTION_ANALYSIS_SCHEMA
+
+    if compact:
+        lines = [f"{index}. {name}" for index, name in enumerate(request.supplements)]
+    else:
+        lines = [f"- {name}" for name in request.supplements]
+    stack = "### User's Supplement Stack:\n" + "\n".join(lines) + "\n"
+    if biomarkers is None:
+        biomarkers = [flag.label for flag in flag_biomarkers(request.biomarkers)]
+    markers = list(biomarkers)
+    biomarker_section = ""
+    if markers:
+        biomarker_section = (
+            "\n### User's Known Biomarker Issues (Consider these high priority):\n"
+            + "\n".join(f"- {marker}" for marker in markers)
+            + "\n"
+        )
+
+    limits = ""
+    if caps:
+        limits = (
+            "\n### Limits:\nReport at most "
+            + ", ".join(f"{cap} {section.replace('_', ' ')}" for section, cap in caps.items())
+            + ", the most clinically important first.\n"
+        )
+
+    prefix = COMPACT_PROMPT_PREFIX if compact else INTERACTION_PROMPT_PREFIX
+    instructions_end = len(_COMPACT_INSTRUCTIONS if compact else _INTERACTION_INSTRUCTIONS) + 1
+    return PromptParts(
+        prefix=prefix,
+        suffix=stack + biomarker_section + limits,
+        sections={
+            "instructions": prefix[:instructions_end],
+            "schema": prefix[instructions_end:],
+            "stack": stack,
+            "biomarkers": biomarker_section,
+            "limits": limits,
+        },
+    )
+
+
+def build_interaction_prompt(
+    request: SupplementInteractionRequest, *, biomarkers: Optional[Iterable[str]] = None
+) -> str:
+    """Compose the prompt for a full interaction report of ``request.supplements``."""
+
+    return build_interaction_prompt_parts(request, biomarkers=biomarkers).text
+
+
+PAIR_ANALYSIS_SCHEMA = """
+{
+    "conflicts": [
+        {
+            "supplements": ["string", "string"],
+            "mechanism": "string",
+            "evidence_level": "low|moderate|high|inconclusive",
+            "severity": "low|moderate|high|critical",
+            "management_strategy": "none|temporal_separation|dose_reduction|discontinuation|monitor",
+            "management_instruction": "string",
+            "source_url": "string (optional)"
+        }
+    ],
+    "synergies": [
+        {
+            "supplements": ["string", "string"],
+            "mechanism": "string",
+            "evidence_level": "low|moderate|high|inconclusive",
+            "category": "string (optional)",
+            "source_url": "string (optional)"
+        }
     ]
-    
-    if biomarkers:
-        lines.append("")
-        lines.append("### User's Known Biomarker Issues (Consider these high priority):")
-        lines.append(f"-{marker}" for marker in biomarkers)
-
-    lines.append("")
-    lines.append("### Response requirements:")
-    lines.append("1. Strict JSON Format: You must respond with valid JSON matching the schema below")
-    lines.append("2. Evidennce Grading: Use 'evidence_level' to indicate the confidence level. Do not hallucinate mechanisms or evidence.")
-    lines.append("3. Forms: When suggesting optimizations, specify the chemical form rather than brand names")
-    lines.append("4. Depletions: Identify if any supplements depletes other nutrients.")
-    lines.append("")
-    lines.append("### Required JSON Schema:")
-    lines.append(INTERACTION_ANALYSIS_SCHEMA)
-
-    return "\n".join(lines)
\ No newline at end of file
+}
+"""
+
+SUPPLEMENT_ANALYSIS_SCHEMA = """
+{
+    "depletions": [
+        {
+            "offending_supplement": "string",
+            "depleted_nutrient": "string",
+            "mechanism": "string",
+            "severity": "low|moderate|high",
+            "recommendation": "string"
+        }
+    ],
+    "optimizations": [
+        {
+            "supplement": "string",
+            "suggested_form": "string",
+            "rationale": "string"
+        }
+    ],
+    "dosage_warnings": [
+        {
+            "supplement": "string",
+            "warning": "string"
+        }
+    ]
+}
+"""
+
+
+PAIR_PROMPT_PREFIX = _static_prefix(
+    ROLE,
+    "Task: Identify CLINICALLY RELEVANT conflicts and synergies between the two supplements given at the end only.",
+    "",
+    "### Rules:",
+    "1. IGNORE THEORETICAL CONFLICTS based solely on in-vitro chemistry if the combination is standard in clinical practice.",
+    "2. Only report interactions that involve both supplements; return empty lists if there are none.",
+    "3. Use 'evidence_level' to indicate confidence. Do not hallucinate mechanisms or evidence.",
+    "",
+    "### Required JSON Schema:",
+    _compact_schema(PAIR_ANALYSIS_SCHEMA),
+)
+
+SUPPLEMENT_PROMPT_PREFIX = _static_prefix(
+    ROLE,
+    "Task: Report nutrient depletions, form optimizations and dosage warnings for the supplement given at the end "
+    "on its own.",
+    "",
+    "### Rules:",
+    "1. DEPLETIONS: Check if the supplement depletes other nutrients (e.g., Zinc -> Copper).",
+    "2. FORMS MATTER: Specify chemical forms (e.g., 'magnesium citrate' vs 'magnesium'), not brand names.",
+    "3. Return empty lists when nothing clinically relevant applies.",
+    "",
+    "### Required JSON Schema:",
+    _compact_schema(SUPPLEMENT_ANALYSIS_SCHEMA),
+)
+
+INSIGHT_PHRASING_SCHEMA = """
+{
+    "insights": [
+        {
+            "title": "string",
+            "content": "string"
+        }
+    ]
+}
+"""
+
+INSIGHT_PROMPT_PREFIX = _static_prefix(
+    "Role: You are a supportive health coach writing short in-app messages about a user's supplement routine.",
+    "Task: Rewrite each finding given at the end as a friendly title and one or two sentences for the user.",
+    "",
+    "### Rules:",
+    "1. Keep every number, supplement and biomarker exactly as given; add no new facts, causes or advice.",
+    "2. A correlation is not proof of cause; never claim that a supplement changed a result.",
+    "3. Return exactly one entry per finding, in the same order.",
+    "",
+    "### Required JSON Schema:",
+    _compact_schema(INSIGHT_PHRASING_SCHEMA),
+)
+
+_STATIC_PREFIXES = (
+    INTERACTION_PROMPT_PREFIX,
+    COMPACT_PROMPT_PREFIX,
+    PAIR_PROMPT_PREFIX,
+    SUPPLEMENT_PROMPT_PREFIX,
+    INSIGHT_PROMPT_PREFIX,
+)
+
+
+def build_pair_prompt(first: str, second: str) -> str:
+    """Compose the prompt for the conflicts and synergies between exactly two supplements."""
+
+    return f"{PAIR_PROMPT_PREFIX}### Supplements:\n- {first}\n- {second}\n"
+
+
+def build_supplement_prompt(supplement: str) -> str:
+    """Compose the prompt for findings that depend on a single supplement."""
+
+    return f"{SUPPLEMENT_PROMPT_PREFIX}### Supplement:\n- {supplement}\n"
+
+
+def build_insight_prompt(findings: Sequence[Tuple[str, str]]) -> str:
+    """Compose the prompt that rewords computed ``(title, content)`` findings for the user."""
+
+    lines = "\n".join(f"{index}. {title}: {content}" for index, (title, content) in enumerate(findings, 1))
+    return f"{INSIGHT_PROMPT_PREFIX}### Findings:\n{lines}\n"
+
+
+def split_prompt(prompt: str) -> Tuple[str, str]:
+    """Split ``prompt`` into ``(static_prefix, suffix)``; the prefix is empty for unknown prompts."""
+
+    for prefix in _STATIC_PREFIXES:
+        if prompt.startswith(prefix):
+            return prefix, prompt[len(prefix) :]
+    return "", prompt
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap tokenizer-free estimate (~4 characters per token for English and JSON)."""
+
+    return (len(text) + 3) // 4
+
+
+def prompt_token_counts(
+    parts: PromptParts, *, system_prompt: str = "", response_format: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Estimate input tokens per prompt section, and how many sit in the cacheable prefix.
+
+    ``system_prompt`` and the ``response_format`` schema are sent with every
+    request as well, so they are counted alongside the user message.
+    """
+
+    sections = {"system_prompt": estimate_tokens(system_prompt)}
+    sections.update((name, estimate_tokens(text)) for name, text in parts.sections.items())
+    sections["response_format"] = (
+        estimate_tokens(json.dumps(response_format, separators=(",", ":"))) if response_format else 0
+    )
+    return {
+        "version": PROMPT_VERSION,
+        "estimated_tokens": sections,
+        "estimated_total": sum(sections.values()),
+        "static_prefix_tokens": sections["system_prompt"] + estimate_tokens(parts.prefix),
+    }
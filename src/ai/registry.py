@@ -0,0 +1,216 @@
+"""Process-wide registry of long-lived LLM clients.
+
+Provider clients own connection pools (``httpx`` keep-alive pools or a boto3
+``bedrock-runtime`` client), so they are built once per process and shared by
+every request instead of being constructed and torn down per call. The FastAPI
+lifespan in :mod:`src.api.main` opens and closes the registry; scripts that
+import :mod:`src.ai.analysis` directly get one lazily on first use.
+
+When ``LLM_ROUTER_BACKENDS`` is set the registry hands out routers over one
+client per backend instead (see :mod:`src.ai.router`); the sync and async
+router share each backend's health so both see the same open circuits. With
+``ANALYSIS_MODE=cascade`` it also holds the escalation backend's clients (see
+:mod:`src.ai.cascade`).
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .client import AsyncLLMClient, LLMClient, _create_bedrock_client
+from .config import LLMProvider, LLMSettings, load_settings
+from .router import AsyncLLMRouter, BackendHealth, LLMRouter, backend_name, backend_settings
+
+
+class ClientRegistry:
+    """Lazily builds and caches the shared clients for one set of settings."""
+
+    def __init__(self, settings: LLMSettings, *, bedrock_client: Any = None) -> None:
+        self._settings = settings
+        # Used for every Bedrock backend instead of building one from settings (e.g. a stub in benchmarks).
+        self._bedrock_client = bedrock_client
+        self._lock = threading.Lock()
+        self._client: Optional[Union[LLMClient, LLMRouter]] = None
+        self._async_client: Optional[Union[AsyncLLMClient, AsyncLLMRouter]] = None
+        self._bedrock_clients: Dict[str, Any] = {}
+        self._backends: Optional[List[Tuple[BackendHealth, LLMSettings]]] = None
+        self._escalation_client: Optional[LLMClient] = None
+        self._async_escalation_client: Optional[AsyncLLMClient] = None
+
+    @property
+    def settings(self) -> LLMSettings:
+        """Settings used to build the registered clients."""
+
+        return self._settings
+
+    def _shared_bedrock_client(self, settings: LLMSettings, name: str = "") -> Any:
+        # One boto3 client per backend serves both the sync and async wrappers. Callers hold self._lock.
+        if settings.provider != LLMProvider.BEDROCK:
+            return None
+        if name not in self._bedrock_clients:
+            self._bedrock_clients[name] = self._bedrock_client or _create_bedrock_client(settings)
+        return self._bedrock_clients[name]
+
+    def _router_backends(self) -> List[Tuple[BackendHealth, LLMSettings]]:
+        # Callers hold self._lock.
+        if self._backends is None:
+            self._backends = []
+            for overrides in self._settings.router_backends:
+                settings = backend_settings(self._settings, overrides)
+                self._backends.append((BackendHealth(backend_name(settings, overrides), self._settings), settings))
+        return self._backends
+
+    def get_client(self) -> Union[LLMClient, LLMRouter]:
+        """Return the shared synchronous client (or router), creating it on first use."""
+
+        if self._client is None:
+            with self._lock:
+                if self._client is None and self._settings.router_backends:
+                    self._client = LLMRouter(
+                        self._settings,
+                        [
+                            (
+                                health,
+                                LLMClient(settings, bedrock_client=self._shared_bedrock_client(settings, health.name)),
+                            )
+                            for health, settings in self._router_backends()
+                        ],
+                    )
+                elif self._client is None:
+                    self._client = LLMClient(self._settings, bedrock_client=self._shared_bedrock_client(self._settings))
+        return self._client
+
+    def get_async_client(self) -> Union[AsyncLLMClient, AsyncLLMRouter]:
+        """Return the shared asyncio client, creating it on first use.
+
+        ``httpx.AsyncClient`` pools are bound to the event loop that first uses
+        them, so this should be called from the application's loop.
+        """
+
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None and self._settings.router_backends:
+                    self._async_client = AsyncLLMRouter(
+                        self._settings,
+                        [
+                            (
+                                health,
+                                AsyncLLMClient(
+                                    settings, bedrock_client=self._shared_bedrock_client(settings, health.name)
+                                ),
+                            )
+                            for health, settings in self._router_backends()
+                        ],
+                    )
+                elif self._async_client is None:
+                    self._async_client = AsyncLLMClient(
+                        self._settings, bedrock_client=self._shared_bedrock_client(self._settings)
+                    )
+        return self._async_client
+
+    def _escalation_settings(self) -> LLMSettings:
+        return backend_settings(self._settings, self._settings.cascade_escalation)
+
+    def get_escalation_client(self) -> LLMClient:
+        """Return the shared synchronous client of the cascade's escalation backend."""
+
+        if self._escalation_client is None:
+            with self._lock:
+                if self._escalation_client is None:
+                    settings = self._escalation_settings()
+                    self._escalation_client = LLMClient(
+                        settings, bedrock_client=self._shared_bedrock_client(settings, "cascade")
+                    )
+        return self._escalation_client
+
+    def get_async_escalation_client(self) -> AsyncLLMClient:
+        """Return the shared asyncio client of the cascade's escalation backend."""
+
+        if self._async_escalation_client is None:
+            with self._lock:
+                if self._async_escalation_client is None:
+                    settings = self._escalation_settings()
+                    self._async_escalation_client = AsyncLLMClient(
+                        settings, bedrock_client=self._shared_bedrock_client(settings, "cascade")
+                    )
+        return self._async_escalation_client
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Return connection pool statistics for every client built so far."""
+
+        stats: Dict[str, Any] = {}
+        if self._client is not None:
+            stats["sync"] = self._client.pool_stats()
+        if self._async_client is not None:
+            stats["async"] = self._async_client.pool_stats()
+        if self._escalation_client is not None:
+            stats["escalation_sync"] = self._escalation_client.pool_stats()
+        if self._async_escalation_client is not None:
+            stats["escalation_async"] = self._async_escalation_client.pool_stats()
+        return stats
+
+    def close(self) -> None:
+        """Close the synchronous clients and release their pooled connections."""
+
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+            if self._escalation_client is not None:
+                self._escalation_client.close()
+                self._escalation_client = None
+
+    async def aclose(self) -> None:
+        """Close every registered client, including the asyncio ones."""
+
+        async_client, self._async_client = self._async_client, None
+        if async_client is not None:
+            await async_client.aclose()
+        escalation_client, self._async_escalation_client = self._async_escalation_client, None
+        if escalation_client is not None:
+            await escalation_client.aclose()
+        self.close()
+
+
+_registry: Optional[ClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_client_registry() -> ClientRegistry:
+    """Return the process-wide registry, creating it from :func:`load_settings` if needed."""
+
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ClientRegistry(load_settings())
+    return _registry
+
+
+def set_client_registry(registry: ClientRegistry) -> None:
+    """Install ``registry`` as the process-wide registry before the first client is requested."""
+
+    global _registry
+    with _registry_lock:
+        _registry = registry
+
+
+def close_client_registry() -> None:
+    """Close and forget the process-wide registry's synchronous clients."""
+
+    global _registry
+    with _registry_lock:
+        registry, _registry = _registry, None
+    if registry is not None:
+        registry.close()
+
+
+async def aclose_client_registry() -> None:
+    """Close and forget the process-wide registry (used on application shutdown)."""
+
+    global _registry
+    with _registry_lock:
+        registry, _registry = _registry, None
+    if registry is not None:
+        await registry.aclose()
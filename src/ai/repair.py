@@ -0,0 +1,418 @@
+"""Tolerant parsing of model output, so almost-valid JSON does not cost a full retry.
+
+:func:`repair_content` tries the cheapest fix first and reports which one worked:
+
+``none``      the output validated as is (the fast path; nothing else runs)
+``syntax``    a Markdown code fence or surrounding prose was stripped, trailing
+              commas were removed, single-quoted strings were requoted, raw
+              control characters inside strings were accepted, or output cut
+              off mid-document was closed
+``salvage``   list items that still failed validation (for example a conflict
+              without ``management_strategy``) were dropped and the rest kept
+``fix_call``  nothing local worked, so :func:`repair_completion` sent the broken
+              document and its validation errors back to the model in a small
+              follow-up prompt
+``failed``    the output could not be repaired
+
+Output that was cut off, or salvaged by dropping findings, is incomplete, so
+callers do not cache it (see :attr:`Repair.lossy`).
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Dict, Generic, List, Optional, Tuple, Type, TypeVar, Union, get_args, get_origin
+
+from pydantic import BaseModel, ValidationError
+
+from .client import AsyncLLMClient, LLMClient
+from .metrics import record_repair, record_validation_failure, stage
+from .schema import CompiledSchema
+
+M = TypeVar("M", bound=BaseModel)
+
+# Bound on the document echoed back in a fix prompt; longer output is truncated there.
+MAX_FIX_FRAGMENT_CHARS = 12000
+# Runs of characters, inside and outside strings, that need no attention from the scanner.
+_PLAIN_STRING_RUN = re.compile(r'[^"\\\x00-\x1f]+')
+_PLAIN_SINGLE_QUOTED_RUN = re.compile(r"[^'\"\\\x00-\x1f]+")
+_PLAIN_RUN = re.compile(r'[^"\'{}\[\]:,]+')
+
+
+class RepairPath(str, Enum):
+    NONE = "none"
+    SYNTAX = "syntax"
+    SALVAGE = "salvage"
+    FIX_CALL = "fix_call"
+    FAILED = "failed"
+
+
+@dataclass
+class Repair(Generic[M]):
+    """Outcome of parsing one model output, with what it took to get there."""
+
+    value: Optional[M]
+    path: RepairPath
+    fixes: List[str] = field(default_factory=list)
+    dropped: List[Dict[str, str]] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    document: str = ""
+
+    @property
+    def lossy(self) -> bool:
+        """Whether findings were dropped, or may be missing because the output was cut off."""
+
+        return bool(self.dropped) or "truncated" in self.fixes
+
+    def meta(self) -> Dict[str, Any]:
+        meta: Dict[str, Any] = {"path": self.path.value}
+        if self.lossy:
+            meta["lossy"] = True
+        if self.fixes:
+            meta["fixes"] = self.fixes
+        if self.dropped:
+            meta["dropped"] = self.dropped
+        if self.value is None and self.errors:
+            meta["errors"] = self.errors
+        return meta
+
+    def unwrap(self, schema: CompiledSchema[M]) -> M:
+        """Return the parsed value or raise ``ValueError`` naming what failed."""
+
+        if self.value is None:
+            raise ValueError(f"Unable to parse LLM response into {schema.model.__name__}: {'; '.join(self.errors)}")
+        return self.value
+
+
+def normalize_json(text: str) -> Tuple[str, List[str], Optional[str]]:
+    """Extract the first JSON object from ``text`` and fix common syntax slips.
+
+    Returns the cleaned text, the names of the fixes applied, and the path of a
+    list item removed because the output was cut off inside it. The result is not
+    guaranteed to parse; mismatched brackets, for example, are left alone.
+    """
+
+    fixes: List[str] = []
+    body = text.strip()
+    if body.startswith("```"):
+        fixes.append("code_fence")
+        body = body.split("\n", 1)[1] if "\n" in body else ""
+    start = body.find("{")
+    if start < 0:
+        return body, fixes, None
+    if start and "code_fence" not in fixes:
+        fixes.append("surrounding_text")
+
+    out: List[str] = []
+    # Open containers as [kind, state, start in out, current key, item index]; objects
+    # move through the states "key" -> "colon" -> "value".
+    stack: List[List[Any]] = []
+    in_string = escape = control = trailing_comma = single_quotes = False
+    quote = '"'
+    string_start = 0
+    index = start
+    while index < len(body):
+        if not escape:
+            if not in_string:
+                pattern = _PLAIN_RUN
+            else:
+                pattern = _PLAIN_STRING_RUN if quote == '"' else _PLAIN_SINGLE_QUOTED_RUN
+            run = pattern.match(body, index)
+            if run is not None:
+                out.append(run.group())
+                index = run.end()
+                if index == len(body):
+                    break
+        char = body[index]
+        index += 1
+        if in_string:
+            if escape:
+                escape = False
+                if char == "'":
+                    out[-1] = char  # \' is not a JSON escape
+                else:
+                    out.append(char)
+            elif char == "\\":
+                escape = True
+                out.append(char)
+            elif char == quote:
+                out.append('"')
+                in_string = False
+                if stack[-1][0] == "{" and stack[-1][1] == "key":
+                    stack[-1][1] = "colon"
+                    stack[-1][3] = "".join(out[string_start + 1 : -1])
+            elif char == '"':
+                out.append('\\"')  # inside a single-quoted string
+            else:
+                out.append(char)
+                if char < " ":
+                    control = True
+        elif char in "\"'":
+            single_quotes |= char == "'"
+            quote = char
+            in_string = True
+            string_start = len(out)
+            out.append('"')
+        elif char in "{[":
+            stack.append([char, "key" if char == "{" else "value", len(out), None, 0])
+            out.append(char)
+        elif char in "}]":
+            trailing_comma |= _drop_trailing_comma(out)
+            out.append(char)
+            stack.pop()
+            if not stack:
+                break
+        elif char == ":" and stack:
+            stack[-1][1] = "value"
+            out.append(char)
+        elif char == "," and stack:
+            if stack[-1][0] == "{":
+                stack[-1][1] = "key"
+            else:
+                stack[-1][4] += 1
+            out.append(char)
+        else:
+            out.append(char)
+
+    rest = body[index:].strip()
+    if rest and rest.strip("`").strip() and "surrounding_text" not in fixes:
+        fixes.append("surrounding_text")
+    cut_item: Optional[str] = None
+    if stack:
+        fixes.append("truncated")
+        # Drop the innermost list item that was still open rather than keep half a finding.
+        open_item = next(
+            (depth for depth in range(len(stack) - 2, -1, -1) if stack[depth][0] == "["), None
+        )
+        if open_item is not None:
+            cut_item = _frame_path(stack[: open_item + 1])
+            del out[stack[open_item + 1][2] :]
+            del stack[open_item + 1 :]
+        elif in_string:
+            if escape:
+                out.pop()
+            out.append('"')
+            if stack[-1][0] == "{" and stack[-1][1] == "key":
+                stack[-1][1] = "colon"
+        while stack:
+            kind, state = stack.pop()[:2]
+            _drop_trailing_comma(out)
+            while out and not out[-1].strip():
+                out.pop()
+            if out and out[-1] == ":":
+                out.append("null")
+            elif kind == "{" and state == "colon":
+                out.append(":null")
+            out.append("}" if kind == "{" else "]")
+    if trailing_comma:
+        fixes.append("trailing_comma")
+    if single_quotes:
+        fixes.append("single_quotes")
+    if control:
+        fixes.append("control_characters")
+    return "".join(out), fixes, cut_item
+
+
+def _frame_path(frames: List[List[Any]]) -> str:
+    path = ""
+    for kind, _, _, key, position in frames:
+        if kind == "[":
+            path += f"[{position}]"
+        else:
+            path += f".{key}" if path else str(key)
+    return path
+
+
+def _drop_trailing_comma(out: List[str]) -> bool:
+    position = len(out) - 1
+    while position >= 0 and not out[position].strip():
+        position -= 1
+    if position >= 0 and out[position] == ",":
+        del out[position]
+        return True
+    return False
+
+
+def _list_item_model(annotation: Any) -> Optional[Type[BaseModel]]:
+    if get_origin(annotation) is not list:
+        return None
+    (item,) = get_args(annotation) or (None,)
+    return item if isinstance(item, type) and issubclass(item, BaseModel) else None
+
+
+def _error_summary(exc: ValidationError, limit: int = 3) -> List[str]:
+    return [
+        f"{'.'.join(str(part) for part in error['loc']) or '<root>'}: {error['msg']}"
+        for error in exc.errors(include_url=False)[:limit]
+    ]
+
+
+def _salvage(model: Type[BaseModel], data: Any, path: str, dropped: List[Dict[str, str]]) -> Any:
+    """Drop list items under ``model`` that do not validate, recursing into nested models."""
+
+    if not isinstance(data, dict):
+        return data
+    result = dict(data)
+    for name, info in model.model_fields.items():
+        key = info.alias or name
+        if key not in result:
+            continue
+        value = result[key]
+        item_model = _list_item_model(info.annotation)
+        if item_model is not None:
+            if value is None and not info.is_required():
+                del result[key]
+                continue
+            if not isinstance(value, list):
+                continue
+            kept: List[Any] = []
+            for position, item in enumerate(value):
+                try:
+                    kept.append(item_model.model_validate(item))
+                except ValidationError as exc:
+                    dropped.append({"path": f"{path}{key}[{position}]", "error": "; ".join(_error_summary(exc))})
+            result[key] = kept
+        elif isinstance(info.annotation, type) and issubclass(info.annotation, BaseModel):
+            result[key] = _salvage(info.annotation, value, f"{path}{key}.", dropped)
+    return result
+
+
+def _repair_locally(schema: CompiledSchema[M], content: Union[str, bytes]) -> Repair[M]:
+    text = content.decode("utf-8", "replace") if isinstance(content, bytes) else content
+    cleaned, fixes, cut_item = normalize_json(text)
+    dropped: List[Dict[str, str]] = []
+    if cut_item is not None:
+        dropped.append({"path": cut_item, "error": "cut off before the item was complete"})
+    try:
+        document = json.loads(cleaned, strict=False)
+    except ValueError as exc:
+        return Repair(None, RepairPath.FAILED, fixes, dropped, [f"invalid JSON: {exc}"], document=cleaned or text)
+    if schema.decode is not None:
+        document = schema.decode(document)
+    try:
+        value = schema.adapter.validate_python(document)
+        path = RepairPath.SALVAGE if dropped else RepairPath.SYNTAX
+        return Repair(value, path, fixes, dropped, document=cleaned)
+    except ValidationError:
+        pass
+    salvaged = _salvage(schema.model, document, "", dropped)
+    try:
+        return Repair(schema.adapter.validate_python(salvaged), RepairPath.SALVAGE, fixes, dropped, document=cleaned)
+    except ValidationError as exc:
+        return Repair(None, RepairPath.FAILED, fixes, dropped, _error_summary(exc, limit=10), document=cleaned)
+
+
+def _parse(schema: CompiledSchema[M], content: Union[str, bytes], enabled: bool, provider: str) -> Repair[M]:
+    with stage("validation", provider):
+        try:
+            return Repair(schema.parse(content), RepairPath.NONE)
+        except ValidationError as exc:
+            strict_error = exc
+        record_validation_failure(schema.name)
+        if not enabled:
+            return Repair(None, RepairPath.FAILED, errors=_error_summary(strict_error))
+        return _repair_locally(schema, content)
+
+
+def repair_content(
+    schema: CompiledSchema[M],
+    content: Union[str, bytes],
+    *,
+    enabled: bool = True,
+    provider: str = "",
+    final: bool = True,
+) -> Repair[M]:
+    """Validate ``content`` into ``schema``, repairing it locally when it is slightly off.
+
+    With ``enabled=False`` only the strict parse runs. Never raises; check
+    :attr:`Repair.value` or call :meth:`Repair.unwrap`. Pass ``final=False``
+    when a failure will still be retried with a fix call, so it is not counted.
+    """
+
+    repair = _parse(schema, content, enabled, provider)
+    if repair.path != RepairPath.NONE and (final or repair.value is not None):
+        record_repair(schema.name, repair.path.value)
+    return repair
+
+
+_PATH_COST = {path: cost for cost, path in enumerate(RepairPath)}
+
+
+def combine_repairs(repairs: Dict[str, Repair[Any]]) -> Dict[str, Any]:
+    """Summarize per-unit repairs as one ``meta["repair"]`` entry for a merged report."""
+
+    path = max((repair.path for repair in repairs.values()), key=_PATH_COST.__getitem__, default=RepairPath.NONE)
+    meta: Dict[str, Any] = {"path": path.value}
+    if any(repair.lossy for repair in repairs.values()):
+        meta["lossy"] = True
+    repaired = {label: repair.path.value for label, repair in repairs.items() if repair.path != RepairPath.NONE}
+    if repaired:
+        meta["units"] = repaired
+    dropped = [
+        {"path": f"{label}: {item['path']}", "error": item["error"]}
+        for label, repair in repairs.items()
+        for item in repair.dropped
+    ]
+    if dropped:
+        meta["dropped"] = dropped
+    return meta
+
+
+def build_fix_prompt(schema: CompiledSchema[Any], repair: Repair[Any]) -> str:
+    """A short prompt asking the model to correct only what failed validation."""
+
+    fragment = repair.document[:MAX_FIX_FRAGMENT_CHARS]
+    errors = "\n".join(f"- {error}" for error in repair.errors) or "- the JSON does not parse"
+    return (
+        f"The JSON below should match the `{schema.name}` schema but fails validation. "
+        "Return only the corrected JSON object. Keep every finding and all wording; change only what the "
+        "errors require, and complete any field or item that was cut off.\n\n"
+        f"### Errors:\n{errors}\n\n"
+        f"### JSON:\n{fragment}\n"
+    )
+
+
+def completion_content(raw_response: Dict[str, Any]) -> str:
+    """Message content of an OpenAI-style chat completion."""
+
+    return raw_response["choices"][0]["message"].get("content") or "{}"
+
+
+def _after_fix(schema: CompiledSchema[M], first: Repair[M], raw_response: Dict[str, Any], provider: str) -> Repair[M]:
+    fixed = _parse(schema, completion_content(raw_response), True, provider)
+    path = RepairPath.FIX_CALL if fixed.value is not None else RepairPath.FAILED
+    record_repair(schema.name, path.value)
+    return Repair(fixed.value, path, fixed.fixes, fixed.dropped, fixed.errors or first.errors)
+
+
+def repair_completion(schema: CompiledSchema[M], content: str, client: LLMClient) -> Repair[M]:
+    """Parse model output, falling back to one fix-up completion when local repair fails."""
+
+    settings = client.settings
+    provider = settings.provider.value
+    fix_call = settings.repair_enabled and settings.repair_fix_call
+    repair = repair_content(schema, content, enabled=settings.repair_enabled, provider=provider, final=not fix_call)
+    if repair.value is not None or not fix_call:
+        return repair
+    raw_response = client.create_chat_completion(
+        prompt=build_fix_prompt(schema, repair), response_format=schema.response_format
+    )
+    return _after_fix(schema, repair, raw_response, provider)
+
+
+async def repair_completion_async(schema: CompiledSchema[M], content: str, client: AsyncLLMClient) -> Repair[M]:
+    """Asyncio variant of :func:`repair_completion`."""
+
+    settings = client.settings
+    provider = settings.provider.value
+    fix_call = settings.repair_enabled and settings.repair_fix_call
+    repair = repair_content(schema, content, enabled=settings.repair_enabled, provider=provider, final=not fix_call)
+    if repair.value is not None or not fix_call:
+        return repair
+    raw_response = await client.create_chat_completion(
+        prompt=build_fix_prompt(schema, repair), response_format=schema.response_format
+    )
+    return _after_fix(schema, repair, raw_response, provider)
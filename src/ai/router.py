@@ -0,0 +1,465 @@
+"""Latency-aware routing across several configured LLM backends.
+
+``LLM_ROUTER_BACKENDS`` lists backends as setting overrides on top of the base
+settings (several local vLLM endpoints, OpenAI, Bedrock, ...). For every call
+the router ranks the backends whose circuit is not open by EWMA latency,
+in-flight count and error rate, and sends the call to the best one.
+
+* A 429, 5xx, timeout or connection failure fails over to the next backend, as
+  does a call shed by the backend's admission control (without counting
+  against its health).
+* A backend that fails ``LLM_ROUTER_BREAKER_FAILURES`` times in a row is taken
+  out of rotation for ``LLM_ROUTER_BREAKER_COOLDOWN`` seconds, then admits a
+  single trial call that either closes or re-opens the circuit.
+* The asyncio router hedges: if the first attempt has not answered within the
+  backend's ``LLM_ROUTER_HEDGE_PERCENTILE`` latency, the same call is sent to the
+  next backend and the first answer wins; the loser is cancelled.
+
+Other errors (a 400, an unparseable body) are the request's fault and are
+raised immediately without touching backend health.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import httpx
+
+from .admission import AdmissionRejected
+from .client import AsyncLLMClient, LLMClient
+from .config import LLMProvider, LLMSettings
+
+T = TypeVar("T")
+
+# Bedrock error codes that mean "try another backend" rather than "bad request".
+_RETRYABLE_BEDROCK_CODES = frozenset(
+    {
+        "ThrottlingException",
+        "ServiceUnavailableException",
+        "InternalServerException",
+        "ModelNotReadyException",
+        "ModelTimeoutException",
+    }
+)
+# botocore transport failures, matched by name so botocore stays an optional import.
+_RETRYABLE_BOTOCORE_ERRORS = frozenset(
+    {"EndpointConnectionError", "ConnectTimeoutError", "ReadTimeoutError", "ConnectionClosedError"}
+)
+
+_LATENCY_WINDOW = 256
+
+
+class BackendsUnavailableError(RuntimeError):
+    """Raised when every backend's circuit is open."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Return whether ``exc`` says the backend, not the request, is at fault."""
+
+    if isinstance(exc, AdmissionRejected):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    if isinstance(exc, (httpx.TransportError, asyncio.TimeoutError, TimeoutError)):
+        return True
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):  # botocore.exceptions.ClientError
+        code = response.get("Error", {}).get("Code")
+        status = response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return code in _RETRYABLE_BEDROCK_CODES or status == 429 or status >= 500
+    return type(exc).__name__ in _RETRYABLE_BOTOCORE_ERRORS
+
+
+def _is_backend_failure(exc: BaseException) -> bool:
+    # A call shed by the backend's own admission control never reached it.
+    return is_retryable(exc) and not isinstance(exc, AdmissionRejected)
+
+
+def backend_settings(base: LLMSettings, overrides: Dict[str, Any]) -> LLMSettings:
+    """Build one backend's settings from the base settings and its override object."""
+
+    data = base.model_dump(by_alias=True)
+    data.update({key: value for key, value in overrides.items() if key != "name"})
+    data["LLM_ROUTER_BACKENDS"] = []
+    return LLMSettings.model_validate(data)
+
+
+def backend_name(settings: LLMSettings, overrides: Dict[str, Any]) -> str:
+    """Use the configured ``name``, falling back to provider and endpoint or model."""
+
+    if overrides.get("name"):
+        return str(overrides["name"])
+    return f"{settings.provider.value}:{settings.resolved_api_base() or settings.resolved_model()}"
+
+
+class BackendHealth:
+    """Latency, error and circuit state of one backend, shared by its sync and async clients."""
+
+    def __init__(self, name: str, settings: LLMSettings, *, clock: Callable[[], float] = time.monotonic) -> None:
+        self.name = name
+        self._clock = clock
+        self._alpha = settings.router_ewma_alpha
+        self._breaker_failures = settings.router_breaker_failures
+        self._cooldown = settings.router_breaker_cooldown_seconds
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self.ewma_latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.hedges = 0
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._calls = itertools.count(1)
+        # The call admitted as the half-open trial; only its outcome ends the trial.
+        self._trial: Optional[int] = None
+
+    def state(self, now: Optional[float] = None) -> str:
+        """``closed``, ``open`` or ``half_open``."""
+
+        if self._opened_at is None:
+            return "closed"
+        now = self._clock() if now is None else now
+        return "open" if now - self._opened_at < self._cooldown else "half_open"
+
+    def score(self) -> float:
+        """Expected cost of sending one more call here; lower is better, untried backends win."""
+
+        latency = self.ewma_latency or 0.0
+        return latency * (1 + self.in_flight) / max(1.0 - self.error_rate, 0.05)
+
+    def try_begin(self) -> Optional[int]:
+        """Reserve a call slot and return its token for :meth:`finish`.
+
+        Returns ``None`` while the circuit is open or its half-open trial call is running.
+        """
+
+        with self._lock:
+            state = self.state()
+            if state == "open" or (state == "half_open" and self._trial is not None):
+                return None
+            call = next(self._calls)
+            if state == "half_open":
+                self._trial = call
+            self.in_flight += 1
+            self.requests += 1
+            return call
+
+    def finish(
+        self,
+        call: int,
+        latency: Optional[float],
+        *,
+        failed: bool = False,
+        lower_bound: Optional[float] = None,
+    ) -> None:
+        """Record the outcome of the call :meth:`try_begin` returned ``call`` for.
+
+        ``latency`` is ``None`` for calls that were cancelled or failed for a
+        reason unrelated to backend health; they only release the slot. A
+        cancelled hedge loser passes how long it had run as ``lower_bound`` so a
+        slow backend's EWMA still rises.
+        """
+
+        with self._lock:
+            if lower_bound is not None and self.ewma_latency is not None and lower_bound > self.ewma_latency:
+                self.ewma_latency += self._alpha * (lower_bound - self.ewma_latency)
+            self.in_flight -= 1
+            if call == self._trial:
+                self._trial = None
+            if failed:
+                self.failures += 1
+                self.error_rate += self._alpha * (1.0 - self.error_rate)
+                self._consecutive_failures += 1
+                if self._opened_at is not None or self._consecutive_failures >= self._breaker_failures:
+                    self._opened_at = self._clock()
+            elif latency is not None:
+                self.error_rate -= self._alpha * self.error_rate
+                self._consecutive_failures = 0
+                self._opened_at = None
+                self._latencies.append(latency)
+                if self.ewma_latency is None:
+                    self.ewma_latency = latency
+                else:
+                    self.ewma_latency += self._alpha * (latency - self.ewma_latency)
+
+    def latency_percentile(self, percentile: float, *, min_samples: int) -> Optional[float]:
+        """Return the ``percentile`` latency over recent calls, or ``None`` with too few samples."""
+
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(int(percentile * len(samples)), len(samples) - 1)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state(),
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 2) if self.ewma_latency is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "hedges": self.hedges,
+        }
+
+
+class _RouterBase:
+    def __init__(self, settings: LLMSettings, backends: Sequence[Tuple[BackendHealth, Any]]) -> None:
+        if not backends:
+            raise ValueError("A router needs at least one backend.")
+        self._settings = settings
+        self._backends = list(backends)
+
+    @property
+    def settings(self) -> LLMSettings:
+        """Base settings; they decide cache keys, prompts and analysis mode for every backend."""
+
+        return self._settings
+
+    def _ranked(self, eligible: Optional[Callable[[Any], bool]] = None) -> List[Tuple[BackendHealth, Any]]:
+        candidates = [
+            (health, client)
+            for health, client in self._backends
+            if health.state() != "open" and (eligible is None or eligible(client))
+        ]
+        return sorted(candidates, key=lambda backend: backend[0].score())
+
+    def chat_completion_payload(
+        self,
+        *,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Return the request body the best-ranked OpenAI-compatible backend would send."""
+
+        ranked = self._ranked(_is_openai_compatible) or [
+            backend for backend in self._backends if _is_openai_compatible(backend[1])
+        ]
+        if not ranked:
+            raise ValueError("No OpenAI-compatible backend is configured.")
+        return ranked[0][1].chat_completion_payload(
+            prompt=prompt, response_format=response_format, max_tokens=max_tokens
+        )
+
+    def backends(self) -> List[Tuple[str, Any]]:
+        """Each backend's name and client, e.g. to warm every connection pool at startup."""
+
+        return [(health.name, client) for health, client in self._backends]
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection pool usage and routing health per backend."""
+
+        return {
+            health.name: {**client.pool_stats(), "router": health.snapshot()} for health, client in self._backends
+        }
+
+
+def _is_openai_compatible(client: Any) -> bool:
+    return client.settings.provider != LLMProvider.BEDROCK
+
+
+def _unavailable() -> BackendsUnavailableError:
+    return BackendsUnavailableError("Every LLM backend is unavailable (circuit open).")
+
+
+class LLMRouter(_RouterBase):
+    """Synchronous router: picks the best backend and fails over, without hedging."""
+
+    def _route(self, call: Callable[[LLMClient], T]) -> T:
+        last_error: Optional[BaseException] = None
+        for health, client in self._ranked():
+            token = health.try_begin()
+            if token is None:
+                continue
+            started = time.perf_counter()
+            try:
+                result = call(client)
+            except Exception as exc:
+                retryable = is_retryable(exc)
+                health.finish(token, None, failed=_is_backend_failure(exc))
+                if not retryable:
+                    raise
+                last_error = exc
+                continue
+            health.finish(token, time.perf_counter() - started)
+            return result
+        raise last_error or _unavailable()
+
+    def create_chat_completion(
+        self,
+        *,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Send a prompt to the best available backend and return the raw JSON response."""
+
+        return self._route(
+            lambda client: client.create_chat_completion(
+                prompt=prompt, response_format=response_format, max_tokens=max_tokens
+            )
+        )
+
+    def close(self) -> None:
+        """Release every backend's pooled connections."""
+
+        for _, client in self._backends:
+            client.close()
+
+
+class AsyncLLMRouter(_RouterBase):
+    """Asyncio router with failover, circuit breaking and hedged requests."""
+
+    async def _attempt(
+        self,
+        health: BackendHealth,
+        token: int,
+        client: AsyncLLMClient,
+        call: Callable[[AsyncLLMClient], Awaitable[T]],
+    ) -> T:
+        started = time.perf_counter()
+        try:
+            result = await call(client)
+        except asyncio.CancelledError:
+            health.finish(token, None, lower_bound=time.perf_counter() - started)
+            raise
+        except Exception as exc:
+            health.finish(token, None, failed=_is_backend_failure(exc))
+            raise
+        health.finish(token, time.perf_counter() - started)
+        return result
+
+    def _hedge_delay(self, health: BackendHealth) -> Optional[float]:
+        if not self._settings.router_hedging:
+            return None
+        return health.latency_percentile(
+            self._settings.router_hedge_percentile, min_samples=self._settings.router_hedge_min_samples
+        )
+
+    async def _route(
+        self,
+        call: Callable[[AsyncLLMClient], Awaitable[T]],
+        *,
+        hedge: bool = True,
+        eligible: Optional[Callable[[Any], bool]] = None,
+    ) -> T:
+        remaining = self._ranked(eligible)
+        attempts: Dict["asyncio.Future[T]", BackendHealth] = {}
+        last_error: Optional[BaseException] = None
+        hedged = not hedge
+
+        def launch() -> Optional[BackendHealth]:
+            while remaining:
+                health, client = remaining.pop(0)
+                token = health.try_begin()
+                if token is not None:
+                    attempts[asyncio.ensure_future(self._attempt(health, token, client, call))] = health
+                    return health
+            return None
+
+        primary = launch()
+        if primary is None:
+            raise _unavailable()
+        started = time.perf_counter()
+        try:
+            while attempts:
+                delay = None if hedged or not remaining else self._hedge_delay(primary)
+                if delay is not None:
+                    delay = max(0.0, delay - (time.perf_counter() - started))
+                done, _ = await asyncio.wait(attempts, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    backup = launch()
+                    if backup is not None:
+                        backup.hedges += 1
+                    continue
+                for task in done:
+                    del attempts[task]
+                    error = task.exception()
+                    if error is None:
+                        return task.result()
+                    if not is_retryable(error):
+                        raise error
+                    last_error = error
+                    # Fail over; a lone replacement's own latency decides when to hedge it.
+                    replacement = launch()
+                    if replacement is not None and len(attempts) == 1:
+                        primary, started = replacement, time.perf_counter()
+        finally:
+            for task in attempts:
+                if task.done():
+                    task.exception()  # Already finished alongside the winner; mark it retrieved.
+                else:
+                    task.cancel()
+        raise last_error or _unavailable()
+
+    async def create_chat_completion(
+        self,
+        *,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Send a prompt to the best available backend, hedging slow calls, and return the raw JSON."""
+
+        return await self._route(
+            lambda client: client.create_chat_completion(
+                prompt=prompt, response_format=response_format, max_tokens=max_tokens
+            )
+        )
+
+    async def post_chat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST a prebuilt chat completion body to the best OpenAI-compatible backend."""
+
+        return await self._route(lambda client: client.post_chat_completion(payload), eligible=_is_openai_compatible)
+
+    async def stream_chat_completion(
+        self,
+        *,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        """Stream from the best backend; fail over only until the first piece of output arrives."""
+
+        last_error: Optional[BaseException] = None
+        for health, client in self._ranked():
+            token = health.try_begin()
+            if token is None:
+                continue
+            started = time.perf_counter()
+            streamed = False
+            try:
+                async for delta in client.stream_chat_completion(
+                    prompt=prompt, response_format=response_format, max_tokens=max_tokens
+                ):
+                    streamed = True
+                    yield delta
+            except Exception as exc:
+                retryable = is_retryable(exc)
+                health.finish(token, None, failed=_is_backend_failure(exc))
+                if streamed or not retryable:
+                    raise
+                last_error = exc
+                continue
+            except BaseException:
+                health.finish(token, None)
+                raise
+            health.finish(token, time.perf_counter() - started)
+            return
+        raise last_error or _unavailable()
+
+    async def aclose(self) -> None:
+        """Release every backend's pooled connections and executors."""
+
+        for _, client in self._backends:
+            await client.aclose()
@@ -0,0 +1,119 @@
+"""Response schemas compiled once per process.
+
+``model_json_schema()`` walks the whole nested model graph and json-encoding
+the result costs as much again, so neither should happen per request. Each
+:class:`CompiledSchema` holds the JSON schema, the OpenAI ``response_format``
+and Bedrock ``responseFormat`` payloads, the ``response_format`` pre-encoded as
+JSON bytes for splicing into request bodies, and a ``TypeAdapter`` for parsing.
+
+The schema sent to the provider may describe a different wire model than the
+one parsed (see :mod:`src.ai.compact`); ``decode`` then rewrites the parsed JSON
+document into the model's shape before validation.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Generic, Optional, Type, TypeVar, Union
+
+from pydantic import BaseModel, TypeAdapter
+
+from ..models import SupplementInteractionResponse
+from ..models.insights import InsightPhrasing
+from .compact import CompactReport
+from .findings import PairFindings, SupplementFindings
+
+M = TypeVar("M", bound=BaseModel)
+
+_JSON: TypeAdapter[Any] = TypeAdapter(Any)
+
+
+def encode_json(value: Any) -> bytes:
+    """Serialize ``value`` the way request bodies are sent: compact UTF-8 JSON."""
+
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class ResponseFormat(Dict[str, Any]):
+    """An OpenAI ``response_format`` dict that also carries its encoded and Bedrock forms.
+
+    It is still a plain ``dict`` to callers that serialize it themselves (batch
+    files, tests); the clients use ``encoded`` and ``bedrock`` directly.
+    """
+
+    encoded: bytes
+    bedrock: Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class CompiledSchema(Generic[M]):
+    """Everything derived from one response model, computed once."""
+
+    name: str
+    model: Type[M]
+    schema: Dict[str, Any]
+    response_format: ResponseFormat
+    adapter: TypeAdapter[M]
+    decode: Optional[Callable[[Any], Any]] = None
+
+    @classmethod
+    def compile(
+        cls, model: Type[M], name: str, *, wire_model: Optional[Type[BaseModel]] = None
+    ) -> "CompiledSchema[M]":
+        """Compile ``model``, or ``wire_model`` when the provider is asked for a different shape."""
+
+        schema = (wire_model or model).model_json_schema()
+        response_format = ResponseFormat(type="json_schema", json_schema={"name": name, "schema": schema})
+        response_format.encoded = encode_json(response_format)
+        response_format.bedrock = {"json": {"schema": schema}}
+        return cls(name=name, model=model, schema=schema, response_format=response_format, adapter=TypeAdapter(model))
+
+    def with_decoder(self, decode: Callable[[Any], Any]) -> "CompiledSchema[M]":
+        """The same compiled schema, parsing through ``decode``; nothing is recompiled."""
+
+        return replace(self, decode=decode)
+
+    def parse(self, content: Union[str, bytes]) -> M:
+        """Validate raw JSON text into the model."""
+
+        if self.decode is None:
+            return self.adapter.validate_json(content)
+        # Invalid JSON raises ValidationError here too, as it does on the direct path.
+        return self.adapter.validate_python(self.decode(_JSON.validate_json(content)))
+
+
+REPORT_SCHEMA = CompiledSchema.compile(SupplementInteractionResponse, "interaction_report")
+PAIR_SCHEMA = CompiledSchema.compile(PairFindings, "pair_findings")
+SUPPLEMENT_SCHEMA = CompiledSchema.compile(SupplementFindings, "supplement_findings")
+INSIGHT_SCHEMA = CompiledSchema.compile(InsightPhrasing, "insight_phrasing")
+# Requested with LLM_OUTPUT_FORMAT=compact; bind the request's stack with ``with_decoder`` before parsing.
+COMPACT_REPORT_SCHEMA = CompiledSchema.compile(
+    SupplementInteractionResponse, "interaction_report_compact", wire_model=CompactReport
+)
+
+
+def bedrock_response_format(response_format: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the Bedrock ``responseFormat`` for an OpenAI-style ``response_format``."""
+
+    precomputed = getattr(response_format, "bedrock", None)
+    if precomputed is not None:
+        return precomputed
+    schema = response_format.get("json_schema", {}).get("schema")
+    return {"json": {"schema": schema}} if schema else {}
+
+
+def encode_chat_payload(payload: Dict[str, Any]) -> bytes:
+    """Encode a chat completion body, splicing in a pre-encoded ``response_format``.
+
+    Only the small, request-specific part of the body is serialized per call.
+    """
+
+    response_format = payload.get("response_format")
+    encoded = getattr(response_format, "encoded", None)
+    if encoded is None:
+        return encode_json(payload)
+    rest = {key: value for key, value in payload.items() if key != "response_format"}
+    if not rest:
+        return b'{"response_format":' + encoded + b"}"
+    return encode_json(rest)[:-1] + b',"response_format":' + encoded + b"}"
@@ -0,0 +1,124 @@
+"""Coalescing of identical in-flight calls ("single-flight").
+
+When many callers ask for the same key at once, only the first (the leader)
+runs the underlying call; the others wait for it and receive the same result
+or the same exception. This keeps a burst of identical supplement stacks from
+turning into a burst of identical provider completions.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+from .deadline import bounded_async, detached_context
+
+T = TypeVar("T")
+
+
+class _Call(Generic[T]):
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[T] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight(Generic[T]):
+    """Thread-safe single-flight group for synchronous callers."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call[T]] = {}
+
+    def do(self, key: str, fn: Callable[[], T], *, timeout: Optional[float] = None) -> Tuple[T, bool]:
+        """Run ``fn`` once per concurrent ``key`` and return ``(result, shared)``.
+
+        ``shared`` is ``True`` for callers that received a result computed by
+        another thread. Followers give up with :class:`TimeoutError` after
+        ``timeout`` seconds; the leader itself is bounded by its own transport
+        timeouts.
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as exc:
+                call.error = exc
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+        elif not call.done.wait(timeout):
+            raise TimeoutError(f"Timed out waiting for in-flight call {key!r}")
+
+        if call.error is not None:
+            raise call.error
+        return call.result, not leader  # type: ignore[return-value]
+
+    def in_flight(self) -> int:
+        """Number of distinct keys currently being computed."""
+
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight(Generic[T]):
+    """Single-flight group for coroutines running on one event loop.
+
+    The shared call runs as its own task, so a follower (or the leader) being
+    cancelled, e.g. because its HTTP client disconnected, does not cancel the
+    work for everyone else. The task is cancelled only once every waiter has
+    gone, and an optional ``timeout`` bounds the shared call for all waiters.
+
+    The task runs without the leader's request deadline (see
+    :func:`src.ai.deadline.detached_context`); each waiter instead stops waiting
+    with :class:`src.ai.deadline.DeadlineExceeded` once its own deadline passes.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: Dict[str, "asyncio.Task[T]"] = {}
+        self._waiters: Dict["asyncio.Task[T]", int] = {}
+
+    async def do(
+        self, key: str, fn: Callable[[], Awaitable[T]], *, timeout: Optional[float] = None
+    ) -> Tuple[T, bool]:
+        """Await ``fn`` once per concurrent ``key`` and return ``(result, shared)``."""
+
+        task = self._tasks.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.get_running_loop().create_task(
+                asyncio.wait_for(fn(), timeout), context=detached_context()
+            )
+            self._tasks[key] = task
+            task.add_done_callback(lambda finished: self._forget(key, finished))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            async with bounded_async("coalesced"):
+                return await asyncio.shield(task), shared
+        finally:
+            remaining = self._waiters[task] - 1
+            if remaining > 0:
+                self._waiters[task] = remaining
+            else:
+                del self._waiters[task]
+                if not task.done():
+                    task.cancel()
+
+    def _forget(self, key: str, task: "asyncio.Task[T]") -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    def in_flight(self) -> int:
+        """Number of distinct keys currently being computed."""
+
+        return len(self._tasks)
@@ -0,0 +1,178 @@
+"""Incremental parsing of a streamed interaction report.
+
+The model writes the report as one JSON document. Rather than waiting for the
+closing brace, :class:`IncrementalReportParser` scans the text as it arrives and
+emits each ``interactions.<section>`` list item and the ``analysis_summary`` as
+soon as that value is complete, so clients can render the first finding while
+the rest is still being generated.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from ..models import ConflictDetail, DepletionDetail, SupplementInteractionResponse, SynergyDetail
+from ..models.interaction import DosageWarning, OptimizationSuggestion
+
+logger = logging.getLogger(__name__)
+
+# Section name in ``struct_interactions`` -> (event name, item model).
+SECTION_EVENTS: Dict[str, Tuple[str, Type[BaseModel]]] = {
+    "conflicts": ("conflict", ConflictDetail),
+    "synergies": ("synergy", SynergyDetail),
+    "depletions": ("depletion", DepletionDetail),
+    "optimizations": ("optimization", OptimizationSuggestion),
+    "dosage_warnings": ("dosage_warning", DosageWarning),
+}
+
+
+@dataclass
+class StreamEvent:
+    """One server-sent event produced while a report is generated."""
+
+    event: str
+    data: Dict[str, Any]
+
+    def encode(self) -> bytes:
+        """Serialize as a ``text/event-stream`` frame."""
+
+        return f"event: {self.event}\ndata: {json.dumps(self.data)}\n\n".encode("utf-8")
+
+
+@dataclass
+class _Frame:
+    kind: str  # "{" or "["
+    path: Tuple[Any, ...]
+    start: int
+    expect_key: bool = True
+    key: Optional[str] = None
+    items: int = 0
+
+
+class IncrementalReportParser:
+    """Push-based JSON scanner that surfaces completed report items as they close.
+
+    Leading prose or a Markdown code fence before the first ``{`` is ignored.
+    Items that fail validation are logged and skipped; the caller validates the
+    complete document at the end anyway.
+    """
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._string_start: Optional[int] = None
+        self._escape = False
+        self._done = False
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+
+        return self._text
+
+    @property
+    def document(self) -> str:
+        """The top-level JSON object, without any surrounding prose or code fence."""
+
+        start = self._text.find("{")
+        if start < 0:
+            return self._text
+        return self._text[start : self._pos] if self._done else self._text[start:]
+
+    @property
+    def complete(self) -> bool:
+        """Whether the top-level JSON object has been closed."""
+
+        return self._done
+
+    def feed(self, chunk: str) -> List[StreamEvent]:
+        """Consume the next piece of model output and return any newly completed events."""
+
+        self._text += chunk
+        events: List[StreamEvent] = []
+        text = self._text
+        while self._pos < len(text) and not self._done:
+            char = text[self._pos]
+            if self._string_start is not None:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._close_string(events)
+            elif not self._stack:
+                if char == "{":
+                    self._push("{", ())
+            elif char == '"':
+                self._string_start = self._pos
+            elif char in "{[":
+                self._push(char, self._child_path())
+            elif char in "}]":
+                self._pop(events)
+            elif char == ":":
+                self._stack[-1].expect_key = False
+            elif char == ",":
+                self._stack[-1].expect_key = True
+            self._pos += 1
+        return events
+
+    def _child_path(self) -> Tuple[Any, ...]:
+        parent = self._stack[-1]
+        if parent.kind == "[":
+            parent.items += 1
+            return parent.path + (parent.items - 1,)
+        return parent.path + (parent.key,)
+
+    def _push(self, kind: str, path: Tuple[Any, ...]) -> None:
+        self._stack.append(_Frame(kind=kind, path=path, start=self._pos))
+
+    def _close_string(self, events: List[StreamEvent]) -> None:
+        raw = self._text[self._string_start : self._pos + 1]
+        self._string_start = None
+        frame = self._stack[-1]
+        try:
+            # Models emit raw newlines and tabs inside strings; repair_content accepts them too.
+            value = json.loads(raw, strict=False)
+        except ValueError as exc:
+            logger.info("Skipping undecodable streamed string: %s", exc)
+            value = None
+        if frame.kind == "{" and frame.expect_key:
+            frame.key = value
+            return
+        if frame.kind == "[":
+            frame.items += 1
+        if frame.path == () and frame.key == "analysis_summary" and value is not None:
+            events.append(StreamEvent("summary", {"analysis_summary": value}))
+
+    def _pop(self, events: List[StreamEvent]) -> None:
+        frame = self._stack.pop()
+        if not self._stack:
+            self._done = True
+            return
+        path = frame.path
+        if frame.kind == "{" and len(path) == 3 and path[0] == "interactions" and path[1] in SECTION_EVENTS:
+            event_name, model = SECTION_EVENTS[path[1]]
+            raw = self._text[frame.start : self._pos + 1]
+            try:
+                item = model.model_validate_json(raw)
+            except ValidationError as exc:
+                logger.info("Skipping invalid streamed %s item: %s", event_name, exc)
+                return
+            events.append(StreamEvent(event_name, item.model_dump(mode="json")))
+
+
+def report_events(report: SupplementInteractionResponse) -> List[StreamEvent]:
+    """Replay an already complete report as the events a live stream would have produced."""
+
+    events = [StreamEvent("summary", {"analysis_summary": report.analysis_summary})]
+    for section, (event_name, _) in SECTION_EVENTS.items():
+        for item in getattr(report.interactions, section):
+            events.append(StreamEvent(event_name, item.model_dump(mode="json")))
+    events.append(StreamEvent("report", report.model_dump(mode="json")))
+    return events
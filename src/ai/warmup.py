@@ -0,0 +1,94 @@
+"""Startup warm-up so the first user request does not pay for initialization.
+
+Loading settings, building the pooled provider clients, opening the report
+cache, knowledge base and supplement synonym index, and exercising the compiled
+schemas and prompt builder all happen once, in the application lifespan, before the readiness probe passes.
+With ``WARMUP_COMPLETION=true`` every backend is also sent a tiny completion.
+That opens its keep-alive connections (and the TLS session), and gives the
+provider's model server a chance to load, before real traffic arrives.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+from ..models import SupplementInteractionRequest
+from .cache import get_report_cache
+from .canonicalization import get_canonicalizer
+from .config import LLMProvider, load_settings
+from .knowledge_base import get_knowledge_base
+from .prompts import build_interaction_prompt_parts, build_pair_prompt, build_supplement_prompt
+from .registry import get_client_registry
+from .schema import PAIR_SCHEMA, REPORT_SCHEMA, SUPPLEMENT_SCHEMA, encode_chat_payload
+
+logger = logging.getLogger(__name__)
+
+WARMUP_PROMPT = "Reply with the single word: ready"
+_SAMPLE_REPORT = '{"analysis_summary": "", "interactions": {}}'
+
+
+@contextmanager
+def _timed(steps: Dict[str, float], name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        steps[name] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def _backend_clients(client: Any) -> List[Tuple[str, Any]]:
+    backends = getattr(client, "backends", None)
+    if backends is not None:
+        return backends()
+    return [(client.settings.provider.value, client)]
+
+
+async def _warm_completion(name: str, client: Any, timeout: float) -> str:
+    try:
+        await asyncio.wait_for(client.create_chat_completion(prompt=WARMUP_PROMPT), timeout)
+    except Exception as exc:  # noqa: BLE001 - warm-up is best effort
+        logger.warning("Warm-up completion for %s failed: %r", name, exc)
+        return f"failed: {type(exc).__name__}"
+    return "ok"
+
+
+def warm_up_local() -> Dict[str, float]:
+    """Build everything a request needs without contacting a provider; returns milliseconds per step."""
+
+    steps: Dict[str, float] = {}
+    with _timed(steps, "settings"):
+        load_settings()
+    with _timed(steps, "clients"):
+        client = get_client_registry().get_async_client()
+    with _timed(steps, "knowledge_base"):
+        get_knowledge_base()
+    with _timed(steps, "canonicalization"):
+        get_canonicalizer()
+    with _timed(steps, "report_cache"):
+        get_report_cache()
+    with _timed(steps, "schemas"):
+        # The first validation and encode through each compiled schema still builds lazy state.
+        REPORT_SCHEMA.parse(_SAMPLE_REPORT)
+        PAIR_SCHEMA.parse("{}")
+        SUPPLEMENT_SCHEMA.parse("{}")
+        parts = build_interaction_prompt_parts(SupplementInteractionRequest(supplements=["Zinc", "Copper"]))
+        build_pair_prompt("Zinc", "Copper")
+        build_supplement_prompt("Zinc")
+        for _, backend in _backend_clients(client):
+            if backend.settings.provider != LLMProvider.BEDROCK:
+                encode_chat_payload(
+                    backend.chat_completion_payload(prompt=parts.text, response_format=REPORT_SCHEMA.response_format)
+                )
+    return steps
+
+
+async def warm_up_completions(timeout: float) -> Dict[str, str]:
+    """Send :data:`WARMUP_PROMPT` to every backend concurrently; returns ``ok`` or the failure per backend."""
+
+    backends = _backend_clients(get_client_registry().get_async_client())
+    results = await asyncio.gather(*(_warm_completion(name, client, timeout) for name, client in backends))
+    return {name: result for (name, _), result in zip(backends, results)}
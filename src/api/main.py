@@ -1,16 +1,285 @@
-from fastapi import FastAPI
-from ..models import SupplementInteractionRequest, SupplementInteractionResponse
-from ..services import get_interaction_analysis
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from ..ai.admission import AdmissionRejected
+from ..ai.analysis import stream_interaction_report
+from ..ai.config import load_settings
+from ..ai.deadline import DeadlineExceeded, check_deadline, deadline_scope
+from ..ai.metrics import record_request_abort, render_metrics
+from ..ai.precompute import get_popularity_tracker, get_precomputed_store, observe_request
+from ..ai.registry import aclose_client_registry, get_client_registry
+from ..ai.router import BackendsUnavailableError
+from ..ai.streaming import StreamEvent
+from ..ai.warmup import warm_up_completions, warm_up_local
+from ..models import (
+    BatchInteractionRequest,
+    BatchInteractionResponse,
+    StackUpdateRequest,
+    SupplementInteractionRequest,
+    SupplementInteractionResponse,
+)
+from ..services import canonical_request, get_interaction_analysis_async, update_interaction_analysis_async
+from ..services.batch import run_batch
+from ..services.precompute import Precomputer
+
+logger = logging.getLogger(__name__)
+
+# Reported by /readyz; "ready" flips once startup warm-up has finished.
+_startup: Dict[str, Any] = {"ready": False}
+# Background precomputation of popular stacks, when PRECOMPUTE_ENABLED is set; see /precompute-stats.
+_precompute: Dict[str, Precomputer] = {}
+
+
+class ClientDisconnected(Exception):
+    """The caller went away before its response was ready."""
+
+
+def _caller_deadline(http_request: Request) -> Optional[float]:
+    """Monotonic time by which the caller wants an answer, from the deadline header or REQUEST_DEADLINE_DEFAULT."""
+
+    settings = get_client_registry().settings
+    header = http_request.headers.get(settings.deadline_header)
+    if header is None:
+        budget = settings.deadline_default_seconds
+    else:
+        try:
+            budget = float(header) / 1000
+        except ValueError:
+            budget = math.nan
+        if not math.isfinite(budget):
+            raise HTTPException(status_code=400, detail=f"{settings.deadline_header} must be milliseconds.")
+    return None if budget is None else time.monotonic() + budget
+
+
+@contextmanager
+def _within(deadline: Optional[float]) -> Iterator[None]:
+    """Bound provider calls in this context by ``deadline``; fail now if it has already passed."""
+
+    with deadline_scope(None if deadline is None else deadline - time.monotonic()):
+        check_deadline("request")
+        yield
+
+
+async def _disconnected(http_request: Request) -> None:
+    # The body has been read, so the next message is the disconnect (or the end of the response).
+    while (await http_request.receive())["type"] != "http.disconnect":
+        pass
+
+
+@asynccontextmanager
+async def _cancel_on_disconnect(http_request: Request) -> AsyncIterator[None]:
+    """Cancel the enclosed awaits if the caller disconnects.
+
+    Cancellation reaches the in-flight provider request, whose connection is
+    closed, so the model server stops generating for nobody. Shared
+    single-flight work is only cancelled once every caller waiting on it left.
+    """
+
+    task = asyncio.current_task()
+    assert task is not None
+    disconnected = False
+
+    async def watch() -> None:
+        nonlocal disconnected
+        await _disconnected(http_request)
+        disconnected = True
+        task.cancel()
+
+    watcher = asyncio.create_task(watch())
+    try:
+        yield
+    except asyncio.CancelledError:
+        if not disconnected or task.uncancel() > 0:
+            raise
+        record_request_abort("cancelled")
+        raise ClientDisconnected() from None
+    finally:
+        watcher.cancel()
+
+
+async def _warm_up_completions(timeout: float, started: float) -> None:
+    _startup["completions"] = await warm_up_completions(timeout)
+    _startup["ready_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    _startup["ready"] = True
+    logger.info("Warm-up completions finished: %s", _startup["completions"])
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """Warm up settings, clients, caches and schemas before serving; see ``/readyz``."""
+
+    started = time.perf_counter()
+    _startup.clear()
+    _startup.update(ready=False, steps=warm_up_local())
+    settings = load_settings()
+    warming = None
+    if settings.warmup_completion:
+        # Serve liveness while the provider warms up; /readyz stays 503 until it is done.
+        warming = asyncio.create_task(_warm_up_completions(settings.warmup_timeout_seconds, started))
+    else:
+        _startup["ready_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        _startup["ready"] = True
+    logger.info("Startup warm-up steps (ms): %s", _startup["steps"])
+    precomputing = None
+    tracker, store = get_popularity_tracker(), get_precomputed_store()
+    if tracker is not None and store is not None:
+        _precompute["precomputer"] = Precomputer(settings, tracker, store)
+        precomputing = asyncio.create_task(_precompute["precomputer"].run_forever())
+    try:
+        yield
+    finally:
+        if warming is not None:
+            warming.cancel()
+        if precomputing is not None:
+            precomputing.cancel()
+            _precompute.clear()
+        await aclose_client_registry()
+
 
 app = FastAPI(
     title="VitalStackAssist API",
     description="An API to analyze interactions between dietary supplements.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
+
+@app.exception_handler(BackendsUnavailableError)
+async def backends_unavailable(_: Request, exc: BackendsUnavailableError) -> JSONResponse:
+    """Every routed backend has an open circuit; ask clients to retry later."""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(_: Request, exc: AdmissionRejected) -> JSONResponse:
+    """Provider calls are being shed; fail fast instead of waiting out LLM_TIMEOUT."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded(_: Request, exc: DeadlineExceeded) -> JSONResponse:
+    """The caller's deadline passed; nothing more is spent on a request it no longer waits for."""
+    return JSONResponse(status_code=504, content={"detail": str(exc), "stage": exc.stage})
+
+
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected(_: Request, __: ClientDisconnected) -> Response:
+    """Nobody is left to read the response; 499 is what proxies log for a client-closed request."""
+    return Response(status_code=499)
+
 @app.post("/generate-interactions", response_model=SupplementInteractionResponse)
-def generate_interactions(request: SupplementInteractionRequest):
+async def generate_interactions(request: SupplementInteractionRequest, http_request: Request):
+    """
+    Analyzes and returns potential interactions between a given list of supplements,
+    taking any out-of-range `biomarkers` into account. An `X-Request-Timeout-Ms` header
+    bounds the time spent on the request; once it has passed the route answers 504.
+    """
+    with _within(_caller_deadline(http_request)):
+        async with _cancel_on_disconnect(http_request):
+            report = await get_interaction_analysis_async(request.supplements, request.biomarkers)
+    return report
+
+
+@app.post("/generate-interactions/update", response_model=SupplementInteractionResponse)
+async def generate_interactions_update(update: StackUpdateRequest, http_request: Request):
+    """
+    Re-analyses a stack after supplements were added or removed. Pass the previous report
+    (or its `meta.cache.key` as `previous_key`); findings for removed supplements are dropped
+    and only the new supplement's pairs and single-supplement findings are generated.
+    """
+    with _within(_caller_deadline(http_request)):
+        async with _cancel_on_disconnect(http_request):
+            report = await update_interaction_analysis_async(update)
+    return report
+
+
+@app.post("/generate-interactions/stream")
+async def generate_interactions_stream(request: SupplementInteractionRequest, http_request: Request):
+    """
+    Streams the report as server-sent events: a `summary`, then one event per conflict,
+    synergy, depletion, optimization and dosage warning as soon as each is generated,
+    and finally the validated `report` (or an `error`).
+    """
+    deadline = _caller_deadline(http_request)
+    canonical = canonical_request(request)[0]
+    observe_request(canonical)
+
+    async def events() -> AsyncIterator[bytes]:
+        stream = stream_interaction_report(canonical)
+        try:
+            with _within(deadline):
+                while True:
+                    # Watch for a disconnect only while waiting on the model, not while sending.
+                    async with _cancel_on_disconnect(http_request):
+                        event = await anext(stream, None)
+                    if event is None:
+                        break
+                    yield event.encode()
+        except ClientDisconnected:
+            return
+        except (ValueError, httpx.HTTPError, BackendsUnavailableError, AdmissionRejected, DeadlineExceeded) as exc:
+            logger.warning("Streaming interaction report failed: %s", exc)
+            yield StreamEvent("error", {"detail": str(exc)}).encode()
+        finally:
+            await stream.aclose()
+
+    with _within(deadline):  # A spent budget gets a 504 before the stream starts.
+        return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/generate-interactions/batch", response_model=BatchInteractionResponse)
+async def generate_interactions_batch(batch: BatchInteractionRequest, http_request: Request):
+    """
+    Analyzes many supplement stacks in one call; duplicate stacks are computed once.
+    """
+    settings = get_client_registry().settings
+    with _within(_caller_deadline(http_request)):
+        async with _cancel_on_disconnect(http_request):
+            results = await run_batch(batch.requests, concurrency=settings.batch_max_concurrency)
+    return BatchInteractionResponse(results=results)
+
+
+@app.get("/pool-stats")
+def pool_stats() -> Dict[str, Any]:
+    """
+    Reports open, idle and in-flight connections of the shared provider clients.
+    """
+    return get_client_registry().pool_stats()
+
+
+@app.get("/precompute-stats")
+def precompute_stats() -> JSONResponse:
+    """
+    Reports the most requested stacks and pairs, the precomputed store, and the background job's counters.
+    """
+    precomputer = _precompute.get("precomputer")
+    if precomputer is None:
+        return JSONResponse(status_code=404, content={"detail": "Precomputation is disabled (PRECOMPUTE_ENABLED)."})
+    return JSONResponse(content=precomputer.stats())
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """
+    Exposes per-stage latency histograms, token usage, cache and validation counters for Prometheus.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/readyz")
+def readyz() -> JSONResponse:
     """
-    Analyzes and returns potential interactions between a given list of supplements.
+    Readiness probe: 200 once startup warm-up has finished, 503 before, with per-step timings.
     """
-    return get_interaction_analysis(request.supplements)
+    return JSONResponse(status_code=200 if _startup.get("ready") else 503, content=_startup)
@@ -6,12 +6,18 @@ from .interaction import (
     SupplementInteractionResponse,
 )
 from .biomarkers import BiomarkerObservation
+from .batch import BatchInteractionRequest, BatchInteractionResponse, BatchInteractionResult
+from .update import StackUpdateRequest
 
 __all__ = [
+    "BatchInteractionRequest",
+    "BatchInteractionResponse",
+    "BatchInteractionResult",
     "BiomarkerObservation",
     "ConflictDetail",
     "SynergyDetail",
     "DepletionDetail",
+    "StackUpdateRequest",
     "SupplementInteractionRequest",
     "SupplementInteractionResponse",
 ]
@@ -0,0 +1,28 @@
+"""DTOs for analysing many supplement stacks in one call."""
+
+from __future__ import annotations
+
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from src.models.interaction import SupplementInteractionRequest, SupplementInteractionResponse
+
+
+class BatchInteractionRequest(BaseModel):
+    """A batch of independent interaction analyses, e.g. a re-analysis after a model change."""
+    requests: List[SupplementInteractionRequest] = Field(
+        ..., min_length=1, max_length=1000, description="Stacks to analyse; duplicates are computed once."
+    )
+
+
+class BatchInteractionResult(BaseModel):
+    """Outcome for one entry of a batch, in the same position as its request."""
+    index: int = Field(..., description="Position of the request in the batch.")
+    report: Optional[SupplementInteractionResponse] = Field(None, description="The report, if analysis succeeded.")
+    error: Optional[str] = Field(None, description="Why the analysis failed, if it did.")
+
+
+class BatchInteractionResponse(BaseModel):
+    """Results for every request in a batch, in request order."""
+    results: List[BatchInteractionResult]
@@ -25,6 +25,24 @@ class VitalityScore(BaseModel):
     level: str = Field(..., description="A descriptive level corresponding to the vitality score (e.g., 'Beginner', 'Intermediate', 'Advanced').")
     positive_factors: List[str] = Field(default_factory=list, description="List of factors the user is doing right.") 
     negative_factors: List[str] = Field(default_factory=list, description="List of factors the user can improve on.")
+
+class UserInsights(BaseModel):
+    """
+    Insights and vitality score computed for one user by src.ai.analytics.
+    """
+    user: str = Field(..., description="Identifier of the user the insights belong to.")
+    vitality_score: VitalityScore = Field(..., description="The user's current vitality score.")
+    insights: List[Insight] = Field(default_factory=list, description="The top findings, most relevant first.")
+
+class PhrasedInsight(BaseModel):
+    title: str = Field(..., description="A brief, friendly title for the finding.")
+    content: str = Field(..., description="One or two sentences explaining the finding to the user.")
+
+class InsightPhrasing(BaseModel):
+    """
+    Model output when rewording computed findings; one entry per finding, in the same order.
+    """
+    insights: List[PhrasedInsight] = Field(default_factory=list)
     
 class OptimizationSuggestion(BaseModel):
     """
@@ -45,4 +63,5 @@ class DosageWarning(BaseModel):
     warning: str = Field(..., description="The dosage warning message.")
     
 
-#TODO: Figure out what components need to be cached
\ No newline at end of file
+# Whole interaction reports are cached by src.ai.cache; each response records the
+# lookup (key, hit, cumulative hits/misses) under meta["cache"].
\ No newline at end of file
@@ -9,6 +9,20 @@ from src.enums.evidence_level import EvidenceLevel
 from src.enums.severity_level import SeverityLevel
 from src.enums.synergy_category import SynergyCategory
 from src.enums.depletion_severity import DepletionSeverity
+from src.models.biomarkers import BiomarkerObservation
+
+# Synonyms models use for enum values, mapped to the canonical value. Validators run once per
+# item, so a dict lookup replaces scanning lists of synonyms.
+EVIDENCE_ALIASES = {
+    **dict.fromkeys(["medium", "average", "fair"], "moderate"),
+    **dict.fromkeys(["strong", "very strong", "robust", "established"], "high"),
+    **dict.fromkeys(["weak", "limited", "poor", "minor", "insufficient"], "low"),
+}
+DEPLETION_SEVERITY_ALIASES = {
+    **dict.fromkeys(["minor", "negligible", "mild"], "low"),
+    **dict.fromkeys(["medium", "average"], "moderate"),
+    **dict.fromkeys(["severe", "dangerous", "serious", "significant", "critical"], "high"),
+}
 
 #Base interaction Models ---
 class InteractionBase(BaseModel):
@@ -24,12 +38,7 @@ class InteractionBase(BaseModel):
     def normalize_evidence(cls, v):
         if isinstance(v, str):
             v = v.lower().strip()
-            if v in ["medium", "average", "fair",]:
-                return "moderate"
-            if v in ["strong", "very strong", "robust", 'established']:
-                return "high"
-            if v in ["weak", "limited", "poor", "minor", "insufficient", "weak"]:
-                return "low"
+            return EVIDENCE_ALIASES.get(v, v)
         return v
                 
 class ConflictDetail(InteractionBase):
@@ -54,12 +63,7 @@ class DepletionDetail(BaseModel):
     def normalize_severity(cls, v):
         if isinstance(v, str):
             v = v.lower().strip()
-            if v in ["minor", "negligible", "mild"]:
-                return "low"
-            if v in ["medium", "average"]:
-                return "moderate"
-            if v in ["severe", "dangerous", "serious", "significant", "critical"]:
-                return "high"
+            return DEPLETION_SEVERITY_ALIASES.get(v, v)
         return v
 
 class OptimizationSuggestion(BaseModel):
@@ -76,7 +80,7 @@ class DosageWarning(BaseModel):
 # --- Main Reponse Model ---
 
 class struct_interactions(BaseModel):
-    conflicts: List[InteractionBase] = Field(default_factory=list)
+    conflicts: List[ConflictDetail] = Field(default_factory=list)
     synergies: List[SynergyDetail] = Field(default_factory=list)
     depletions: List[DepletionDetail] = Field(default_factory=list)
     optimizations: List[OptimizationSuggestion] = Field(default_factory=list)
@@ -92,4 +96,8 @@ class SupplementInteractionResponse(BaseModel):
 
 class SupplementInteractionRequest(BaseModel):
     """Request model for supplement interaction analysis."""
-    supplements: List[str] = Field(..., description="List of supplements to analyze.")
\ No newline at end of file
+    supplements: List[str] = Field(..., description="List of supplements to analyze.")
+    biomarkers: List[BiomarkerObservation] = Field(
+        default_factory=list,
+        description="Recent lab results; only values outside their reference range are considered.",
+    )
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""DTOs for re-analysing a stack after the user adds or removes supplements."""
+
+from __future__ import annotations
+
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+from src.models.interaction import SupplementInteractionResponse
+
+
+class StackUpdateRequest(BaseModel):
+    """A stack edit applied to a report analysed before, instead of re-analysing the whole stack."""
+    supplements: List[str] = Field(..., min_length=1, description="The stack the previous report was generated for.")
+    added: List[str] = Field(default_factory=list, description="Supplements added to the stack.")
+    removed: List[str] = Field(default_factory=list, description="Supplements removed from the stack.")
+    previous: Optional[SupplementInteractionResponse] = Field(None, description="The previous report.")
+    previous_key: Optional[str] = Field(
+        None, description="`meta.cache.key` of the previous report, looked up in the report cache instead."
+    )
+
+    @model_validator(mode="after")
+    def require_previous(self) -> "StackUpdateRequest":
+        if self.previous is None and self.previous_key is None:
+            raise ValueError("Provide the previous report or its previous_key.")
+        return self
@@ -1,3 +1,15 @@
-from .interaction import get_interaction_analysis
+from .interaction import (
+    canonical_request,
+    get_interaction_analysis,
+    get_interaction_analysis_async,
+    update_interaction_analysis,
+    update_interaction_analysis_async,
+)
 
-__all__ = ["get_interaction_analysis"]
+__all__ = [
+    "canonical_request",
+    "get_interaction_analysis",
+    "get_interaction_analysis_async",
+    "update_interaction_analysis",
+    "update_interaction_analysis_async",
+]
@@ -0,0 +1,332 @@
+"""Batch interaction analysis for the API and for offline re-analysis of stored stacks.
+
+Supplement names are canonicalized first, so duplicate stacks within a batch
+are analysed once even when they are spelled differently, and biomarkers are
+reduced to their out-of-range state, so stacks whose labs bucket the same are
+analysed once too. Work runs with bounded concurrency on the shared async client.
+
+The module doubles as a CLI that reads ``SupplementInteractionRequest`` JSONL
+and writes ``SupplementInteractionResponse`` JSONL. The output file is the
+checkpoint: every finished line is flushed as it completes and rerunning the
+same command skips lines already written::
+
+    python -m src.services.batch run stacks.jsonl reports.jsonl --concurrency 16
+
+For OpenAI-compatible providers the same input can go through the OpenAI Batch
+API file format instead. ``export-openai`` writes the batch input file,
+``replay`` sends it to the configured (e.g. local stand-in) server and writes a
+batch output file, and ``import-openai`` turns a batch output file back into
+report lines::
+
+    python -m src.services.batch export-openai stacks.jsonl batch_input.jsonl
+    python -m src.services.batch replay batch_input.jsonl batch_output.jsonl
+    python -m src.services.batch import-openai stacks.jsonl batch_output.jsonl reports.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from src.ai.admission import Priority, admission_priority
+from src.ai.analysis import (
+    build_report_completion_body,
+    generate_interaction_report_async,
+    parse_report_completion,
+)
+from src.ai.biomarkers import biomarker_state, flag_biomarkers
+from src.ai.cache import canonicalize_supplements
+from src.ai.config import LLMProvider
+from src.ai.registry import aclose_client_registry, get_client_registry
+from src.models import BatchInteractionResult, SupplementInteractionRequest
+from src.services.interaction import canonical_request
+
+logger = logging.getLogger(__name__)
+
+_OPENAI_BATCH_URL = "/v1/chat/completions"
+
+
+def stack_key(request: SupplementInteractionRequest) -> str:
+    """Identify a stack by its canonical labels and bucketed biomarker state, independently of order and spelling."""
+
+    key = "|".join(canonicalize_supplements(request.supplements))
+    state = biomarker_state(flag_biomarkers(request.biomarkers))
+    if state:
+        key += "#" + ";".join(",".join(flag) for flag in state)
+    return key
+
+
+async def run_batch(
+    requests: Sequence[SupplementInteractionRequest],
+    *,
+    concurrency: int,
+    on_result: Optional[Callable[[BatchInteractionResult], None]] = None,
+) -> List[BatchInteractionResult]:
+    """Analyse ``requests`` with at most ``concurrency`` stacks in flight.
+
+    Each distinct stack is analysed once and its outcome is fanned out to every
+    position that asked for it. A failing stack does not fail the batch; its
+    results carry the error instead. ``on_result`` is called once per request
+    as soon as its result is known.
+    """
+
+    requests = [canonical_request(request)[0] for request in requests]
+    groups: Dict[str, List[int]] = {}
+    for index, request in enumerate(requests):
+        groups.setdefault(stack_key(request), []).append(index)
+
+    slots = asyncio.Semaphore(concurrency)
+    results: List[Optional[BatchInteractionResult]] = [None] * len(requests)
+
+    async def analyse(indices: List[int]) -> None:
+        report, error = None, None
+        # Batch work yields provider capacity to interactive requests but is never shed for waiting.
+        with admission_priority(Priority.BATCH, queue_timeout=None):
+            async with slots:
+                try:
+                    report = await generate_interaction_report_async(requests[indices[0]])
+                # One bad stack (parse failure, provider error, timeout) must not abort the batch.
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning("Batch analysis failed for stack %r: %s", stack_key(requests[indices[0]]), exc)
+                    error = f"{type(exc).__name__}: {exc}"
+        for index in indices:
+            result = BatchInteractionResult(index=index, report=report, error=error)
+            results[index] = result
+            if on_result is not None:
+                on_result(result)
+
+    await asyncio.gather(*(analyse(indices) for indices in groups.values()))
+    return [result for result in results if result is not None]
+
+
+class _Progress:
+    """Periodic progress and throughput reporting on stderr."""
+
+    def __init__(self, total: int, *, interval: float = 2.0) -> None:
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self._interval = interval
+        self._started = time.perf_counter()
+        self._last_report = self._started
+
+    def tick(self, *, failed: bool = False) -> None:
+        self.done += 1
+        self.failed += int(failed)
+        now = time.perf_counter()
+        if now - self._last_report >= self._interval and self.done < self.total:
+            self._last_report = now
+            self.report()
+
+    def report(self) -> None:
+        elapsed = max(time.perf_counter() - self._started, 1e-9)
+        print(
+            f"[batch] {self.done}/{self.total} done, {self.failed} failed, "
+            f"{self.done / elapsed:.2f} req/s, {elapsed:.1f}s elapsed",
+            file=sys.stderr,
+        )
+
+
+def _read_requests(path: Path) -> Iterator[Tuple[int, SupplementInteractionRequest]]:
+    """Yield ``(line_number, canonical request)`` for every non-blank line of a JSONL file."""
+
+    with open(path, encoding="utf-8") as handle:
+        for line_number, line in enumerate(handle, start=1):
+            if line.strip():
+                yield line_number, canonical_request(SupplementInteractionRequest.model_validate_json(line))[0]
+
+
+def _completed_lines(path: Path) -> Set[int]:
+    """Return input line numbers already written to ``path`` by a previous run."""
+
+    if not path.exists():
+        return set()
+    done: Set[int] = set()
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                done.add(int(json.loads(line)["meta"]["batch"]["line"]))
+            except (ValueError, KeyError, TypeError):
+                # A partially written last line from an interrupted run is simply redone.
+                continue
+    return done
+
+
+async def run_file(input_path: Path, output_path: Path, *, concurrency: int) -> _Progress:
+    """Analyse every request in ``input_path`` not yet present in ``output_path``."""
+
+    done = _completed_lines(output_path)
+    pending = [(line, request) for line, request in _read_requests(input_path) if line not in done]
+    progress = _Progress(len(pending))
+    if done:
+        print(f"[batch] resuming: {len(done)} line(s) already in {output_path}", file=sys.stderr)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "a", encoding="utf-8") as out:
+
+        def write(result: BatchInteractionResult) -> None:
+            line, request = pending[result.index]
+            if result.report is not None:
+                report = result.report.model_copy(deep=True)
+                report.meta["batch"] = {"line": line, "stack": stack_key(request)}
+                out.write(report.model_dump_json() + "\n")
+                out.flush()
+            progress.tick(failed=result.report is None)
+
+        try:
+            await run_batch([request for _, request in pending], concurrency=concurrency, on_result=write)
+        finally:
+            await aclose_client_registry()
+    return progress
+
+
+def export_openai_batch(input_path: Path, output_path: Path) -> int:
+    """Write an OpenAI Batch API input file with one chat completion per distinct stack."""
+
+    client = get_client_registry().get_client()
+    if client.settings.provider == LLMProvider.BEDROCK:
+        raise ValueError("OpenAI batch files require an OpenAI-compatible provider (LLM_PROVIDER=openai|local).")
+    seen: Set[str] = set()
+    with open(output_path, "w", encoding="utf-8") as out:
+        for _, request in _read_requests(input_path):
+            key = stack_key(request)
+            if key in seen:
+                continue
+            seen.add(key)
+            line = {
+                "custom_id": key,
+                "method": "POST",
+                "url": _OPENAI_BATCH_URL,
+                "body": build_report_completion_body(request, client),
+            }
+            out.write(json.dumps(line) + "\n")
+    return len(seen)
+
+
+async def replay_openai_batch(input_path: Path, output_path: Path, *, concurrency: int) -> _Progress:
+    """Execute an OpenAI Batch API input file against the configured server.
+
+    Produces an output file in the Batch API result format, so a local
+    OpenAI-compatible server can stand in for the hosted batch service.
+    """
+
+    client = get_client_registry().get_async_client()
+    with open(input_path, encoding="utf-8") as handle:
+        lines = [json.loads(line) for line in handle if line.strip()]
+    slots = asyncio.Semaphore(concurrency)
+    progress = _Progress(len(lines))
+
+    async def replay(line: Dict[str, object]) -> Dict[str, object]:
+        with admission_priority(Priority.BATCH, queue_timeout=None):
+            async with slots:
+                try:
+                    body = await client.post_chat_completion(line["body"])  # type: ignore[arg-type]
+                    result = {
+                        "custom_id": line["custom_id"],
+                        "response": {"status_code": 200, "body": body},
+                        "error": None,
+                    }
+                except Exception as exc:  # noqa: BLE001 - recorded per line like the hosted Batch API does
+                    result = {"custom_id": line["custom_id"], "response": None, "error": {"message": str(exc)}}
+        progress.tick(failed=result["error"] is not None)
+        return result
+
+    try:
+        results = await asyncio.gather(*(replay(line) for line in lines))
+    finally:
+        await aclose_client_registry()
+    with open(output_path, "w", encoding="utf-8") as out:
+        for result in results:
+            out.write(json.dumps(result) + "\n")
+    return progress
+
+
+def import_openai_batch(input_path: Path, batch_output_path: Path, output_path: Path) -> _Progress:
+    """Turn an OpenAI Batch API output file back into report lines for the original requests."""
+
+    completions: Dict[str, Dict[str, object]] = {}
+    with open(batch_output_path, encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if response.get("status_code") == 200:
+                completions[result["custom_id"]] = response["body"]
+
+    requests = list(_read_requests(input_path))
+    progress = _Progress(len(requests))
+    with open(output_path, "w", encoding="utf-8") as out:
+        for line_number, request in requests:
+            key = stack_key(request)
+            completion = completions.get(key)
+            if completion is None:
+                progress.tick(failed=True)
+                continue
+            try:
+                report = parse_report_completion(completion)
+            except ValueError as exc:
+                logger.warning("Unparseable batch completion for line %d: %s", line_number, exc)
+                progress.tick(failed=True)
+                continue
+            report.meta["batch"] = {"line": line_number, "stack": key}
+            out.write(report.model_dump_json() + "\n")
+            progress.tick()
+    return progress
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.services.batch", description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Analyse a JSONL file of requests, resuming from the output file.")
+    run.add_argument("input", type=Path)
+    run.add_argument("output", type=Path)
+    run.add_argument("--concurrency", type=int, default=None, help="Stacks in flight (default BATCH_MAX_CONCURRENCY).")
+
+    export = commands.add_parser("export-openai", help="Write an OpenAI Batch API input file.")
+    export.add_argument("input", type=Path)
+    export.add_argument("output", type=Path)
+
+    replay = commands.add_parser("replay", help="Run an OpenAI Batch API input file against the configured server.")
+    replay.add_argument("input", type=Path)
+    replay.add_argument("output", type=Path)
+    replay.add_argument("--concurrency", type=int, default=None)
+
+    load = commands.add_parser("import-openai", help="Convert an OpenAI Batch API output file into reports.")
+    load.add_argument("input", type=Path, help="The original requests JSONL file.")
+    load.add_argument("batch_output", type=Path)
+    load.add_argument("output", type=Path)
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """CLI entry point; returns a non-zero exit code if any line failed."""
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    args = _parser().parse_args(argv)
+    concurrency = getattr(args, "concurrency", None) or get_client_registry().settings.batch_max_concurrency
+
+    if args.command == "run":
+        progress = asyncio.run(run_file(args.input, args.output, concurrency=concurrency))
+    elif args.command == "export-openai":
+        count = export_openai_batch(args.input, args.output)
+        print(f"[batch] wrote {count} distinct stack(s) to {args.output}", file=sys.stderr)
+        return 0
+    elif args.command == "replay":
+        progress = asyncio.run(replay_openai_batch(args.input, args.output, concurrency=concurrency))
+    else:
+        progress = import_openai_batch(args.input, args.batch_output, args.output)
+    progress.report()
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
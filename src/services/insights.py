@@ -0,0 +1,114 @@
+"""Insight and vitality score computation for a cohort of users, e.g. as a daily job.
+
+The cohort is a NumPy ``.npz`` file with the arrays of
+:class:`src.ai.analytics.CohortSeries` under the same names, plus ``users``
+(one identifier per row). Streaks, correlations and vitality scores are all
+computed locally by :func:`src.ai.analytics.analyse_cohort`. Only each user's
+few top findings go to the model, to be reworded, and only with
+``INSIGHTS_PHRASING=true``. One ``UserInsights`` JSON line is written per user::
+
+    python -m src.services.insights cohort.npz insights.jsonl --concurrency 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from src.ai.admission import Priority, admission_priority
+from src.ai.analytics import (
+    CohortAnalytics,
+    CohortSeries,
+    analyse_cohort,
+    phrase_insights_async,
+    top_insights,
+    vitality_score,
+)
+from src.ai.biomarkers import _numpy
+from src.ai.config import LLMSettings
+from src.ai.registry import aclose_client_registry, get_client_registry
+from src.models.insights import UserInsights
+
+
+def load_cohort(path: Path) -> Tuple[List[str], CohortSeries]:
+    """Read user identifiers and a :class:`CohortSeries` from an ``.npz`` file."""
+
+    with _numpy().load(path, allow_pickle=False) as arrays:
+        series = CohortSeries(
+            supplements=tuple(str(name) for name in arrays["supplements"]),
+            biomarkers=tuple(str(name) for name in arrays["biomarkers"]),
+            on_stack=arrays["on_stack"],
+            adherence=arrays["adherence"],
+            lab_values=arrays["lab_values"],
+            lab_days=arrays["lab_days"],
+            reference_min=arrays["reference_min"],
+            reference_max=arrays["reference_max"],
+        )
+        return [str(user) for user in arrays["users"]], series
+
+
+async def user_insights_async(
+    analytics: CohortAnalytics, row: int, user: str, settings: LLMSettings
+) -> UserInsights:
+    """Build ``UserInsights`` for one row of ``analytics``, rewording its top findings if enabled."""
+
+    insights = top_insights(
+        analytics, row, limit=settings.insights_top_findings, min_confidence=settings.insights_min_confidence
+    )
+    if settings.insights_phrasing:
+        insights = await phrase_insights_async(insights, get_client_registry().get_async_client())
+    return UserInsights(user=user, vitality_score=vitality_score(analytics, row), insights=insights)
+
+
+async def run_file(input_path: Path, output_path: Path, *, concurrency: int) -> int:
+    """Analyse the cohort in ``input_path`` and write one line per user to ``output_path``; returns the user count."""
+
+    settings = get_client_registry().settings
+    users, series = load_cohort(input_path)
+    started = time.perf_counter()
+    analytics = analyse_cohort(series)
+    print(f"[insights] analysed {len(users)} users in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def build(row: int) -> UserInsights:
+        # Phrasing is offline work: it yields provider capacity to interactive requests and is never shed.
+        with admission_priority(Priority.BATCH, queue_timeout=None):
+            async with slots:
+                return await user_insights_async(analytics, row, users[row], settings)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        results = await asyncio.gather(*(build(row) for row in range(len(users))))
+    finally:
+        await aclose_client_registry()
+    with open(output_path, "w", encoding="utf-8") as out:
+        out.writelines(result.model_dump_json() + "\n" for result in results)
+    return len(results)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """CLI entry point."""
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser(prog="python -m src.services.insights", description=__doc__.split("\n\n")[0])
+    parser.add_argument("input", type=Path, help="Cohort .npz file.")
+    parser.add_argument("output", type=Path, help="UserInsights JSONL file to write.")
+    parser.add_argument(
+        "--concurrency", type=int, default=None, help="Users phrased concurrently (default BATCH_MAX_CONCURRENCY)."
+    )
+    args = parser.parse_args(argv)
+    concurrency = args.concurrency or get_client_registry().settings.batch_max_concurrency
+    count = asyncio.run(run_file(args.input, args.output, concurrency=concurrency))
+    print(f"[insights] wrote {count} user(s) to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,100 @@
-from typing import List
-from src.models import SupplementInteractionRequest, SupplementInteractionResponse
-from src.ai.analysis import generate_interaction_report
+from typing import List, Optional, Tuple
+from src.models import (
+    BiomarkerObservation,
+    StackUpdateRequest,
+    SupplementInteractionRequest,
+    SupplementInteractionResponse,
+)
+from src.ai.analysis import (
+    generate_interaction_report,
+    generate_interaction_report_async,
+    update_interaction_report,
+    update_interaction_report_async,
+)
+from src.ai.biomarkers import flag_biomarkers
+from src.ai.canonicalization import CanonicalSupplement, canonical_labels, get_canonicalizer
+from src.ai.precompute import observe_request
 
-def get_interaction_analysis(supplements: List[str]) -> SupplementInteractionResponse:
+
+def canonical_request(
+    request: SupplementInteractionRequest,
+) -> Tuple[SupplementInteractionRequest, List[CanonicalSupplement]]:
+    """
+    Replaces free-text supplement names with their canonical labels (deduplicated, in order)
+    and keeps only the biomarkers outside their reference range, so equivalent stacks share
+    prompts and cache keys. Canonicalizing twice is harmless.
+    """
+    biomarkers = [flag.observation for flag in flag_biomarkers(request.biomarkers)]
+    canonicalizer = get_canonicalizer()
+    if canonicalizer is None:
+        return request.model_copy(update={"biomarkers": biomarkers}), []
+    names = canonicalizer.canonicalize_stack(request.supplements)
+    return SupplementInteractionRequest(supplements=canonical_labels(names), biomarkers=biomarkers), names
+
+
+def _with_canonicalization(
+    report: SupplementInteractionResponse, names: List[CanonicalSupplement]
+) -> SupplementInteractionResponse:
+    if names:
+        report.meta["canonicalization"] = [name.meta() for name in names]
+    return report
+
+
+def get_interaction_analysis(
+    supplements: List[str], biomarkers: Optional[List[BiomarkerObservation]] = None
+) -> SupplementInteractionResponse:
+    """
+    Orchestrates the interaction analysis by canonicalizing the supplement names,
+    screening the biomarkers, creating a request object and calling the AI analysis service.
+    The request is also sampled into the stack popularity used for precomputation.
+    """
+    request, names = canonical_request(
+        SupplementInteractionRequest(supplements=supplements, biomarkers=biomarkers or [])
+    )
+    observe_request(request)
+    return _with_canonicalization(generate_interaction_report(request), names)
+
+
+async def get_interaction_analysis_async(
+    supplements: List[str], biomarkers: Optional[List[BiomarkerObservation]] = None
+) -> SupplementInteractionResponse:
+    """
+    Asyncio variant of get_interaction_analysis used by the async API routes.
+    """
+    request, names = canonical_request(
+        SupplementInteractionRequest(supplements=supplements, biomarkers=biomarkers or [])
+    )
+    observe_request(request)
+    return _with_canonicalization(await generate_interaction_report_async(request), names)
+
+
+def canonical_update(update: StackUpdateRequest) -> Tuple[StackUpdateRequest, List[CanonicalSupplement]]:
+    """
+    Canonicalizes the previous stack and the added and removed supplements the same way
+    as canonical_request, so they compare equal to the names the previous report was built from.
+    """
+    canonicalizer = get_canonicalizer()
+    if canonicalizer is None:
+        return update, []
+    fields = {
+        field: canonicalizer.canonicalize_stack(getattr(update, field)) for field in ("supplements", "added", "removed")
+    }
+    canonical = update.model_copy(update={field: canonical_labels(names) for field, names in fields.items()})
+    return canonical, [*fields["added"], *fields["removed"]]
+
+
+def update_interaction_analysis(update: StackUpdateRequest) -> SupplementInteractionResponse:
+    """
+    Re-analyses a stack after supplements were added or removed, reusing the previous report
+    so only findings that involve the added supplements are generated.
+    """
+    canonical, names = canonical_update(update)
+    return _with_canonicalization(update_interaction_report(canonical), names)
+
+
+async def update_interaction_analysis_async(update: StackUpdateRequest) -> SupplementInteractionResponse:
     """
-    Orchestrates the interaction analysis by creating a request object
-    and calling the AI analysis service.
+    Asyncio variant of update_interaction_analysis used by the async API routes.
     """
-    request = SupplementInteractionRequest(supplements=supplements)
-    return generate_interaction_report(request)
+    canonical, names = canonical_update(update)
+    return _with_canonicalization(await update_interaction_report_async(canonical), names)
@@ -0,0 +1,129 @@
+"""Background precomputation of reports for the most requested stacks and pairs.
+
+:class:`Precomputer` wakes up every ``PRECOMPUTE_INTERVAL`` seconds and works
+through the top stacks and pairs of the popularity tracker in
+:mod:`src.ai.precompute`, followed by the stacks already in the store, most
+popular first. A stack whose report is stored under the current report cache
+key is skipped. The rest are generated and stored, which also refreshes the
+stored stacks after a model, prompt or output setting change.
+
+Precomputation must not compete with live traffic. Before each stack it checks
+the shared async client, and it stops the round as soon as more than
+``PRECOMPUTE_IDLE_IN_FLIGHT`` live provider calls are running or queued. Its own
+calls run one at a time at batch admission priority, so an arriving
+interactive request always goes ahead of them. The API lifespan starts it when
+``PRECOMPUTE_ENABLED=true``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from src.ai.admission import AdmissionRejected, Priority, admission_priority
+from src.ai.analysis import generate_interaction_report_async
+from src.ai.cache import build_cache_key
+from src.ai.client import AsyncLLMClient
+from src.ai.config import LLMSettings
+from src.ai.precompute import PopularityTracker, PrecomputedStore, Stack, stack_id
+from src.ai.registry import get_client_registry
+from src.ai.router import AsyncLLMRouter, BackendsUnavailableError
+from src.models import SupplementInteractionRequest
+
+logger = logging.getLogger(__name__)
+
+
+def live_provider_calls(client: Union[AsyncLLMClient, AsyncLLMRouter]) -> int:
+    """Provider calls in flight or waiting for admission on ``client`` (every backend of a router)."""
+
+    clients = [backend for _, backend in client.backends()] if isinstance(client, AsyncLLMRouter) else [client]
+    calls = 0
+    for backend in clients:
+        stats = backend.pool_stats()
+        calls += stats.get("in_flight", 0) + stats.get("admission", {}).get("queued", 0)
+    return calls
+
+
+class Precomputer:
+    """Keeps the precomputed store filled with the reports of popular stacks while the provider is idle."""
+
+    def __init__(self, settings: LLMSettings, tracker: PopularityTracker, store: PrecomputedStore) -> None:
+        self._settings = settings
+        self._tracker = tracker
+        self._store = store
+        # Keys of stacks the knowledge base answers without a model call.
+        self._skipped: Set[str] = set()
+        self._counters: Dict[str, int] = {
+            "rounds": 0,
+            "computed": 0,
+            "refreshed": 0,
+            "failed": 0,
+            "deferred_busy": 0,
+        }
+
+    def _work(self) -> List[Tuple[Stack, float, Optional[str]]]:
+        """Popular stacks with their estimate and stored key, tracked ones first, each stack once."""
+
+        stored = {stack_id(names): (names, key, estimate) for names, key, estimate in self._store.stacks()}
+        work: Dict[str, Tuple[Stack, float, Optional[str]]] = {}
+        for names, estimate in self._tracker.top():
+            identifier = stack_id(names)
+            work[identifier] = (names, estimate, stored[identifier][1] if identifier in stored else None)
+        for identifier, (names, key, estimate) in stored.items():
+            work.setdefault(identifier, (names, estimate, key))
+        return list(work.values())
+
+    async def run_once(self, client: Optional[Union[AsyncLLMClient, AsyncLLMRouter]] = None) -> int:
+        """Precompute until the work runs out or live traffic appears; return the reports stored."""
+
+        if client is None:
+            client = get_client_registry().get_async_client()
+        self._counters["rounds"] += 1
+        stored = 0
+        for names, estimate, stored_key in self._work():
+            request = SupplementInteractionRequest(supplements=list(names))
+            key = build_cache_key(request, client.settings)
+            if key == stored_key or key in self._skipped:
+                continue
+            if live_provider_calls(client) > self._settings.precompute_idle_in_flight:
+                self._counters["deferred_busy"] += 1
+                break
+            try:
+                with admission_priority(Priority.BATCH):
+                    report = await generate_interaction_report_async(request, client=client)
+            except (AdmissionRejected, BackendsUnavailableError):
+                self._counters["deferred_busy"] += 1
+                break
+            # A failing stack is retried next round; it must not stop the others.
+            except Exception as exc:  # noqa: BLE001
+                self._counters["failed"] += 1
+                logger.warning("Precomputing stack %r failed: %s", list(names), exc)
+                continue
+            if "cache" not in report.meta:
+                # Answered by the knowledge base, which the request path checks first anyway.
+                self._skipped.add(key)
+                continue
+            if report.meta.get("repair", {}).get("lossy"):
+                self._counters["failed"] += 1
+                continue
+            report.meta.pop("coalesced", None)
+            self._store.put(names, key, report.model_dump_json(), estimate)
+            self._counters["refreshed" if stored_key is not None else "computed"] += 1
+            stored += 1
+        return stored
+
+    async def run_forever(self) -> None:
+        """Run a round every ``PRECOMPUTE_INTERVAL`` seconds until cancelled."""
+
+        while True:
+            await asyncio.sleep(self._settings.precompute_interval_seconds)
+            try:
+                await self.run_once()
+            except Exception:  # noqa: BLE001 - the next round tries again
+                logger.exception("Precompute round failed")
+
+    def stats(self) -> Dict[str, Any]:
+        """Round counters, store occupancy and the current popularity ranking."""
+
+        return {**self._counters, "store": self._store.stats(), "popularity": self._tracker.stats()}
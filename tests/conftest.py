@@ -0,0 +1,37 @@
+"""Shared fixtures for the unit tests."""
+
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import pytest
+
+from src.ai.config import LLMSettings
+
+
+class FakeClock:
+    """Monotonic clock the tests advance by hand."""
+
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def make_settings() -> Callable[..., LLMSettings]:
+    """Build settings from keyword overrides (environment aliases), ignoring any local ``.env`` file."""
+
+    def build(**overrides: Any) -> LLMSettings:
+        return LLMSettings(_env_file=None, **{"LLM_PROVIDER": "local", **overrides})  # type: ignore[call-arg]
+
+    return build
@@ -0,0 +1,147 @@
+"""Tests for the admission controller, token bucket and AIMD limit in :mod:`src.ai.admission`."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Callable
+
+import pytest
+
+from src.ai.admission import AdmissionController, AdmissionRejected, AIMDLimiter, Priority, TokenBucket, admission_priority
+from src.ai.config import LLMSettings
+
+
+def _controller(make_settings: Callable[..., LLMSettings], clock: Any, **overrides: Any) -> AdmissionController:
+    settings = make_settings(
+        LLM_ADMISSION_INITIAL_CONCURRENCY=1,
+        LLM_ADMISSION_MIN_CONCURRENCY=1,
+        LLM_ADMISSION_MAX_CONCURRENCY=1,
+        **overrides,
+    )
+    return AdmissionController(settings, clock=clock)
+
+
+async def _hold(controller: AdmissionController, release: asyncio.Event) -> None:
+    async with controller.admit(100):
+        await release.wait()
+
+
+async def _call(controller: AdmissionController, priority: Priority, **options: Any) -> str:
+    with admission_priority(priority, **options):
+        async with controller.admit(100):
+            return priority.name
+
+
+def test_batch_waiter_is_evicted_for_interactive(make_settings: Callable[..., LLMSettings], clock: Any) -> None:
+    async def scenario() -> None:
+        controller = _controller(make_settings, clock, LLM_ADMISSION_MAX_QUEUE=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release))
+        await asyncio.sleep(0)
+        batch = asyncio.create_task(_call(controller, Priority.BATCH, queue_timeout=None))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(_call(controller, Priority.INTERACTIVE, queue_timeout=None))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected, match="evicted"):
+            await batch
+        release.set()
+        assert await interactive == "INTERACTIVE"
+        await holder
+        stats = controller.stats()
+        assert stats["evicted"] == 1
+        assert stats["in_flight"] == 0 and stats["queued"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_equal_priority(make_settings: Callable[..., LLMSettings], clock: Any) -> None:
+    async def scenario() -> None:
+        controller = _controller(make_settings, clock, LLM_ADMISSION_MAX_QUEUE=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(_call(controller, Priority.INTERACTIVE, queue_timeout=None))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected, match="queue full"):
+            await _call(controller, Priority.INTERACTIVE, queue_timeout=None)
+        release.set()
+        assert await queued == "INTERACTIVE"
+        await holder
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_rejects_with_retry_after(make_settings: Callable[..., LLMSettings], clock: Any) -> None:
+    async def scenario() -> None:
+        controller = _controller(make_settings, clock)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected, match="queue deadline") as rejected:
+            await _call(controller, Priority.INTERACTIVE, queue_timeout=0.01)
+        # No latency observed yet, so callers are told to come back in a second.
+        assert rejected.value.retry_after == 1.0
+        assert controller.stats()["rejected_deadline"] == 1
+        assert controller.stats()["queued"] == 0
+        release.set()
+        await holder
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_refills_with_the_clock(clock: Any) -> None:
+    async def scenario() -> None:
+        bucket = TokenBucket(600, clock=clock)  # 10 tokens per second
+        await bucket.acquire(600, deadline=None)
+        assert bucket.available == 0
+        assert bucket.wait_time(100) == pytest.approx(10.0)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await bucket.acquire(100, deadline=clock() + 5.0)
+        assert rejected.value.retry_after == pytest.approx(10.0)
+
+        clock.advance(5.0)
+        assert bucket.available == pytest.approx(50.0)
+        bucket.settle(-20)  # used 20 tokens fewer than estimated
+        assert bucket.available == pytest.approx(70.0)
+        clock.advance(3600.0)
+        assert bucket.available == 600
+
+    asyncio.run(scenario())
+
+
+def test_aimd_halves_on_overload_and_recovers_additively(clock: Any) -> None:
+    limiter = AIMDLimiter(initial=16, minimum=2, maximum=64, tolerance=2.0, clock=clock)
+    limiter.on_success(0.1)
+    assert limiter.limit == 16
+
+    limiter.on_overload()
+    assert limiter.limit == 8
+    limiter.on_overload()  # same round trip: ignored
+    assert limiter.limit == 8
+    clock.advance(0.1)
+    limiter.on_overload()
+    assert limiter.limit == 4
+
+    # One more call per window of `limit` successes.
+    for _ in range(4):
+        limiter.on_success(0.1)
+    assert limiter.limit == 4
+    limiter.on_success(0.1)
+    assert limiter.limit == 5
+    for _ in range(200):
+        limiter.on_success(0.1)
+    assert 5 < limiter.limit < 25
+
+
+def test_aimd_backs_off_when_latency_exceeds_tolerance(clock: Any) -> None:
+    limiter = AIMDLimiter(initial=10, minimum=2, maximum=64, tolerance=2.0, clock=clock)
+    limiter.on_success(0.1)
+    clock.advance(1.0)
+    limiter.on_success(0.5)
+    assert limiter.limit == 9
+    for _ in range(20):
+        clock.advance(1.0)
+        limiter.on_overload()
+    assert limiter.limit == 2
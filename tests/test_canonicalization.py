@@ -0,0 +1,114 @@
+"""Tests for supplement name canonicalization and the keys built from it."""
+
+from __future__ import annotations
+
+from typing import Callable, List
+
+import pytest
+
+from src.ai.cache import build_cache_key, canonicalize_supplements
+from src.ai.canonicalization import Canonicalizer, Dose, MatchKind, canonical_labels
+from src.ai.config import LLMSettings
+from src.ai.pairwise import plan_units
+from src.models import SupplementInteractionRequest
+
+
+@pytest.fixture(scope="module")
+def canonicalizer() -> Canonicalizer:
+    return Canonicalizer.load()
+
+
+@pytest.mark.parametrize(
+    ("raw", "label", "ingredient_id", "form", "match"),
+    [
+        ("Vit D3", "Vitamin D3", "vitamin_d", "d3", MatchKind.EXACT),
+        ("cholecalciferol", "Vitamin D3", "vitamin_d", "d3", MatchKind.EXACT),
+        ("vitamin d", "Vitamin D", "vitamin_d", None, MatchKind.EXACT),
+        ("Vitamin D 5000IU", "Vitamin D 5000 IU", "vitamin_d", None, MatchKind.EXACT),
+        ("Vitamin D3 5,000 IU softgels", "Vitamin D3 5000 IU", "vitamin_d", "d3", MatchKind.EXACT),
+        ("magnesum glycinate", "Magnesium Glycinate", "magnesium", "glycinate", MatchKind.FUZZY),
+        ("NOW Foods Zinc Picolinate 50 mg", "Zinc Picolinate 50 mg", "zinc", "picolinate", MatchKind.PARTIAL),
+        ("Tongkat Ali 400 mg", "Tongkat Ali 400 mg", None, None, MatchKind.UNKNOWN),
+    ],
+)
+def test_canonicalize(
+    canonicalizer: Canonicalizer, raw: str, label: str, ingredient_id: str, form: str, match: MatchKind
+) -> None:
+    resolved = canonicalizer.canonicalize(raw)
+    assert (resolved.label, resolved.ingredient_id, resolved.form, resolved.match) == (
+        label,
+        ingredient_id,
+        form,
+        match,
+    )
+
+
+def test_dose_units_are_normalized(canonicalizer: Canonicalizer) -> None:
+    assert canonicalizer.canonicalize("Magnesium Glycinate 0.4 g").dose == Dose(400.0, "mg")
+
+
+def test_entries_of_one_ingredient_merge(canonicalizer: Canonicalizer) -> None:
+    names = canonicalizer.canonicalize_stack(["Vitamin D 5000IU", "Zinc", "Vit D3", "vitamin d"])
+    assert canonical_labels(names) == ["Vitamin D3 5000 IU", "Zinc"]
+    unknown = canonicalizer.canonicalize_stack(["Tongkat Ali 400 mg", "tongkat ali", "Shilajit"])
+    assert canonical_labels(unknown) == ["Tongkat Ali 400 mg", "Shilajit"]
+
+
+@pytest.mark.parametrize(
+    ("stack", "labels"),
+    [
+        (["Vitamin D 5000 IU", "Vitamin D3 2000 IU"], ["Vitamin D3 7000 IU"]),
+        (
+            ["Zinc 30 mg", "zinc 30mg", "Magnesium Glycinate 0.2 g", "magnesium 200 mg"],
+            ["Zinc 30 mg", "Magnesium Glycinate 400 mg"],
+        ),
+        (["Vitamin D3 5000 IU", "Vitamin D 125 mcg"], ["Vitamin D3 5000 IU", "Vitamin D 125 mcg"]),
+    ],
+)
+def test_merged_doses_add_up(canonicalizer: Canonicalizer, stack: List[str], labels: List[str]) -> None:
+    merged = canonical_labels(canonicalizer.canonicalize_stack(stack))
+    assert merged == labels
+    assert canonical_labels(canonicalizer.canonicalize_stack(merged)) == labels
+
+
+@pytest.mark.parametrize(
+    "stack",
+    [
+        ["Vit D3", "Zinc"],
+        ["zinc", "cholecalciferol"],
+        ["Zn", "Vitamin D3 softgels", "vitamin d"],
+    ],
+)
+def test_equivalent_stacks_share_a_cache_key(make_settings: Callable[..., LLMSettings], stack: List[str]) -> None:
+    settings = make_settings()
+    expected = build_cache_key(SupplementInteractionRequest(supplements=["Vitamin D3", "Zinc"]), settings)
+    assert canonicalize_supplements(stack) == ["vitamin d3", "zinc"]
+    assert build_cache_key(SupplementInteractionRequest(supplements=stack), settings) == expected
+
+
+@pytest.mark.parametrize(
+    ("first", "second"),
+    [
+        ("Zinc", "Zinc 100 mg"),
+        ("Vitamin D 400 IU", "Vitamin D3 50000 IU"),
+        ("Magnesium Oxide", "Magnesium Glycinate"),
+    ],
+)
+def test_form_and_dose_change_the_cache_key(
+    make_settings: Callable[..., LLMSettings], first: str, second: str
+) -> None:
+    settings = make_settings()
+    keys = {
+        build_cache_key(SupplementInteractionRequest(supplements=[name, "Copper"]), settings)
+        for name in (first, second)
+    }
+    assert len(keys) == 2
+
+
+def test_no_pair_of_an_ingredient_with_itself() -> None:
+    units = plan_units(["Vitamin D3 5000 IU", "Vitamin D", "Zinc 30 mg"])
+    assert [unit.supplements for unit in units] == [
+        ("Vitamin D3 5000 IU",),
+        ("Zinc 30 mg",),
+        ("Vitamin D3 5000 IU", "Zinc 30 mg"),
+    ]
@@ -0,0 +1,54 @@
+"""Tests for :class:`src.ai.client.AsyncLLMClient` with an injected Bedrock client."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator
+
+from src.ai.client import AsyncLLMClient
+from src.ai.config import LLMSettings
+
+
+class _BlockingEventStream:
+    """Yields one delta, then blocks like a boto3 event stream until the provider sends more or it is closed."""
+
+    def __init__(self) -> None:
+        self.closed = threading.Event()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        yield {"contentBlockDelta": {"delta": {"text": "first"}}}
+        if not self.closed.wait(10):
+            yield {"contentBlockDelta": {"delta": {"text": "late"}}}
+            return
+        raise ConnectionError("stream closed")
+
+    def close(self) -> None:
+        self.closed.set()
+
+
+class _FakeBedrock:
+    def __init__(self) -> None:
+        self.stream = _BlockingEventStream()
+
+    def converse_stream(self, **_: Any) -> Dict[str, Any]:
+        return {"stream": self.stream}
+
+
+def test_bedrock_stream_closed_when_consumer_leaves(make_settings: Callable[..., LLMSettings]) -> None:
+    async def scenario() -> None:
+        settings = make_settings(LLM_PROVIDER="bedrock", BEDROCK_REGION="us-east-1", BEDROCK_MODEL_ID="fake-model")
+        bedrock = _FakeBedrock()
+        client = AsyncLLMClient(settings, bedrock_client=bedrock)
+        try:
+            stream = client.stream_chat_completion(prompt="Zinc and copper")
+            assert await stream.__anext__() == "first"
+            started = time.perf_counter()
+            await asyncio.wait_for(stream.aclose(), 2)
+            assert time.perf_counter() - started < 1
+            assert bedrock.stream.closed.is_set()
+        finally:
+            await client.aclose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,39 @@
+"""Tests for name resolution in :class:`src.ai.knowledge_base.KnowledgeBase`."""
+
+from __future__ import annotations
+
+import pytest
+
+from src.ai.canonicalization import Canonicalizer
+from src.ai.knowledge_base import KnowledgeBase
+
+
+@pytest.fixture(scope="module")
+def kb() -> KnowledgeBase:
+    return KnowledgeBase.load(canonicalizer=Canonicalizer.load())
+
+
+@pytest.mark.parametrize(
+    ("first", "second"),
+    [
+        ("Vitamin K2 MK-7", "Vitamin D3 5000 IU"),
+        ("Zinc Oxide", "Copper"),
+        ("NOW Foods Zinc Picolinate 50 mg", "Copper Bisglycinate"),
+        ("magnesum glycinate", "Zinc Oxide 50 mg"),
+    ],
+)
+def test_forms_and_spellings_reach_curated_pairs(kb: KnowledgeBase, first: str, second: str) -> None:
+    assert kb.pair(first, second) is not None
+    assert kb.pair(first, second) is kb.pair(second, first)
+
+
+def test_unknown_and_combined_names_are_not_covered(kb: KnowledgeBase) -> None:
+    assert kb.supplement("Zinc Oxide 50 mg") is kb.supplement("zinc")
+    assert kb.supplement("Tongkat Ali") is None
+    assert not kb.covers(["Zinc", "Vitamin D3 + K2"])
+
+
+def test_aliases_without_canonicalizer() -> None:
+    kb = KnowledgeBase.load()
+    assert kb.pair("zinc picolinate 30 mg", "Copper") is not None
+    assert kb.canonical("Zinc Oxide") is None
@@ -0,0 +1,110 @@
+"""Tests for local repair of malformed model output in :mod:`src.ai.repair`."""
+
+from __future__ import annotations
+
+import json
+from typing import List, Optional
+
+import pytest
+
+from src.ai.repair import RepairPath, normalize_json, repair_content
+from src.ai.schema import REPORT_SCHEMA
+
+CONFLICT = {
+    "supplements": ["Iron", "Calcium"],
+    "mechanism": "Calcium competes with iron for absorption.",
+    "severity": "moderate",
+    "management_strategy": "temporal_separation",
+    "management_instruction": "Take them two hours apart.",
+}
+REPORT = {"analysis_summary": "One conflict.", "interactions": {"conflicts": [CONFLICT]}}
+VALID = json.dumps(REPORT)
+
+
+@pytest.mark.parametrize(
+    ("text", "expected", "fixes", "cut_item"),
+    [
+        ('{"a": [1, 2,], "b": {"c": 1,},}', {"a": [1, 2], "b": {"c": 1}}, ["trailing_comma"], None),
+        ('```json\n{"a": 1}\n```', {"a": 1}, ["code_fence"], None),
+        ('Sure! Here it is: {"a": 1} Hope that helps.', {"a": 1}, ["surrounding_text"], None),
+        ("{'a': 'it\\'s \"x\"', 'b': ['c']}", {"a": "it's \"x\"", "b": ["c"]}, ["single_quotes"], None),
+        ('{"a": "line\nbreak\ttab"}', {"a": "line\nbreak\ttab"}, ["control_characters"], None),
+        ('{"a": {"b": "cut', {"a": {"b": "cut"}}, ["truncated"], None),
+        ('{"a": 1, "b"', {"a": 1, "b": None}, ["truncated"], None),
+        ('{"a": 1, "b":', {"a": 1, "b": None}, ["truncated"], None),
+        ('{"a": [{"x": 1}, {"x": 2, "y": "par', {"a": [{"x": 1}]}, ["truncated"], "a[1]"),
+        ('{"a": "it\'s", "b": [1, 2]}', {"a": "it's", "b": [1, 2]}, [], None),
+    ],
+    ids=[
+        "trailing_commas",
+        "code_fence",
+        "surrounding_text",
+        "single_quotes",
+        "control_characters",
+        "truncated_string",
+        "truncated_key",
+        "truncated_value",
+        "truncated_list_item",
+        "apostrophe_in_string",
+    ],
+)
+def test_normalize_json(text: str, expected: object, fixes: List[str], cut_item: Optional[str]) -> None:
+    cleaned, applied, cut = normalize_json(text)
+    assert json.loads(cleaned, strict=False) == expected
+    assert applied == fixes
+    assert cut == cut_item
+
+
+@pytest.mark.parametrize(
+    ("content", "path", "lossy"),
+    [
+        (VALID, RepairPath.NONE, False),
+        ("```json\n" + VALID + "\n```", RepairPath.SYNTAX, False),
+        (VALID[:-3] + ",]}}", RepairPath.SYNTAX, False),
+        (VALID.replace('"', "'"), RepairPath.SYNTAX, False),
+        (VALID.replace("One conflict.", "One\nconflict."), RepairPath.SYNTAX, False),
+        (VALID[:-3], RepairPath.SYNTAX, True),
+        (VALID[: VALID.index("two hours")], RepairPath.SALVAGE, True),
+        ("not json at all", RepairPath.FAILED, False),
+    ],
+    ids=[
+        "valid",
+        "code_fence",
+        "trailing_comma",
+        "single_quotes",
+        "control_characters",
+        "truncated_after_last_item",
+        "truncated_inside_item",
+        "unrepairable",
+    ],
+)
+def test_repair_content_paths(content: str, path: RepairPath, lossy: bool) -> None:
+    repair = repair_content(REPORT_SCHEMA, content)
+    assert repair.path == path
+    assert repair.lossy is lossy
+    assert repair.meta().get("lossy", False) is lossy
+    if path == RepairPath.FAILED:
+        assert repair.value is None
+        with pytest.raises(ValueError):
+            repair.unwrap(REPORT_SCHEMA)
+    else:
+        assert repair.value is not None
+        assert repair.value.analysis_summary.replace("\n", " ") == "One conflict."
+
+
+def test_salvage_drops_invalid_items_and_is_lossy() -> None:
+    invalid = {key: value for key, value in CONFLICT.items() if key != "management_strategy"}
+    content = json.dumps({**REPORT, "interactions": {"conflicts": [invalid, CONFLICT]}})
+    repair = repair_content(REPORT_SCHEMA, content)
+    assert repair.path == RepairPath.SALVAGE
+    assert repair.lossy
+    assert [item["path"] for item in repair.dropped] == ["interactions.conflicts[0]"]
+    assert repair.value is not None
+    assert len(repair.value.interactions.conflicts) == 1
+
+
+def test_disabled_repair_only_parses_strictly() -> None:
+    repair = repair_content(REPORT_SCHEMA, "```json\n" + VALID + "\n```", enabled=False)
+    assert repair.path == RepairPath.FAILED
+    assert repair.value is None
+    assert repair.errors
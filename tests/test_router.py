@@ -0,0 +1,81 @@
+"""Tests for backend health and the circuit breaker in :mod:`src.ai.router`."""
+
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import pytest
+
+from src.ai.config import LLMSettings
+from src.ai.router import BackendHealth
+
+
+@pytest.fixture
+def health(make_settings: Callable[..., LLMSettings], clock: Any) -> BackendHealth:
+    settings = make_settings(LLM_ROUTER_BREAKER_FAILURES=2, LLM_ROUTER_BREAKER_COOLDOWN=30.0)
+    return BackendHealth("fake", settings, clock=clock)
+
+
+def _fail(health: BackendHealth) -> None:
+    call = health.try_begin()
+    assert call is not None
+    health.finish(call, None, failed=True)
+
+
+def test_breaker_opens_half_opens_and_closes(health: BackendHealth, clock: Any) -> None:
+    _fail(health)
+    assert health.state() == "closed"
+    _fail(health)
+    assert health.state() == "open"
+    assert health.try_begin() is None
+
+    clock.advance(30.0)
+    assert health.state() == "half_open"
+    trial = health.try_begin()
+    assert trial is not None
+    assert health.try_begin() is None  # one trial at a time
+
+    health.finish(trial, 0.1)
+    assert health.state() == "closed"
+    assert health.try_begin() is not None
+
+
+def test_failed_trial_reopens_the_circuit(health: BackendHealth, clock: Any) -> None:
+    _fail(health)
+    _fail(health)
+    clock.advance(30.0)
+    _fail(health)
+    assert health.state() == "open"
+    clock.advance(29.0)
+    assert health.try_begin() is None
+    clock.advance(1.0)
+    assert health.try_begin() is not None
+
+
+def test_stale_call_does_not_end_the_trial(health: BackendHealth, clock: Any) -> None:
+    stale = health.try_begin()
+    assert stale is not None
+    _fail(health)
+    _fail(health)
+    clock.advance(30.0)
+    trial = health.try_begin()
+    assert trial is not None
+
+    # A call started before the circuit opened finishes without answering; the trial is still running.
+    health.finish(stale, None)
+    assert health.state() == "half_open"
+    assert health.try_begin() is None
+
+    health.finish(trial, 0.1)
+    assert health.state() == "closed"
+    assert health.in_flight == 0
+
+
+def test_unrelated_failures_only_release_the_slot(health: BackendHealth) -> None:
+    for _ in range(3):
+        call = health.try_begin()
+        assert call is not None
+        health.finish(call, None)
+    assert health.state() == "closed"
+    assert health.failures == 0
+    assert health.in_flight == 0
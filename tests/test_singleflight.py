@@ -0,0 +1,216 @@
+"""Tests for the single-flight groups in :mod:`src.ai.singleflight`."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import pytest
+
+from src.ai.deadline import DeadlineExceeded, deadline_scope, remaining
+from src.ai.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_callers_share_one_call() -> None:
+    group: SingleFlight[int] = SingleFlight()
+    calls = 0
+    release = threading.Event()
+
+    def compute() -> int:
+        nonlocal calls
+        calls += 1
+        release.wait(5)
+        return 42
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(group.do, "stack", compute) for _ in range(8)]
+        # Let every caller join the flight before the leader finishes.
+        time.sleep(0.1)
+        release.set()
+        results = [future.result(5) for future in futures]
+
+    assert calls == 1
+    assert [result for result, _ in results] == [42] * 8
+    assert sum(not shared for _, shared in results) == 1
+    assert group.in_flight() == 0
+
+
+def test_leader_exception_reaches_every_follower() -> None:
+    group: SingleFlight[int] = SingleFlight()
+    release = threading.Event()
+
+    def fail() -> int:
+        release.wait(5)
+        raise ValueError("provider down")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(group.do, "stack", fail) for _ in range(4)]
+        time.sleep(0.1)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="provider down"):
+                future.result(5)
+    assert group.in_flight() == 0
+
+
+def test_follower_timeout() -> None:
+    group: SingleFlight[int] = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=group.do, args=("stack", lambda: release.wait(5) and 1))
+    leader.start()
+    while group.in_flight() == 0:
+        time.sleep(0.001)
+    try:
+        with pytest.raises(TimeoutError):
+            group.do("stack", lambda: 2, timeout=0.01)
+    finally:
+        release.set()
+        leader.join(5)
+
+
+def test_async_concurrent_callers_share_one_call() -> None:
+    async def scenario() -> None:
+        group: AsyncSingleFlight[int] = AsyncSingleFlight()
+        calls = 0
+
+        async def compute() -> int:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return 42
+
+        results = await asyncio.gather(*(group.do("stack", compute) for _ in range(10)))
+        assert calls == 1
+        assert [result for result, _ in results] == [42] * 10
+        assert [shared for _, shared in results] == [False] + [True] * 9
+        assert group.in_flight() == 0
+
+    asyncio.run(scenario())
+
+
+def test_async_leader_exception_reaches_every_follower() -> None:
+    async def scenario() -> None:
+        group: AsyncSingleFlight[int] = AsyncSingleFlight()
+
+        async def fail() -> int:
+            await asyncio.sleep(0.01)
+            raise ValueError("provider down")
+
+        results = await asyncio.gather(*(group.do("stack", fail) for _ in range(5)), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert group.in_flight() == 0
+
+    asyncio.run(scenario())
+
+
+def test_async_cancelled_follower_does_not_cancel_leader() -> None:
+    async def scenario() -> None:
+        group: AsyncSingleFlight[int] = AsyncSingleFlight()
+        finished: List[int] = []
+
+        async def compute() -> int:
+            await asyncio.sleep(0.05)
+            finished.append(1)
+            return 42
+
+        leader = asyncio.create_task(group.do("stack", compute))
+        follower = asyncio.create_task(group.do("stack", compute))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        assert await leader == (42, False)
+        assert finished == [1]
+
+    asyncio.run(scenario())
+
+
+def test_async_cancelled_leader_keeps_call_for_followers() -> None:
+    async def scenario() -> None:
+        group: AsyncSingleFlight[int] = AsyncSingleFlight()
+
+        async def compute() -> int:
+            await asyncio.sleep(0.05)
+            return 42
+
+        leader = asyncio.create_task(group.do("stack", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(group.do("stack", compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == (42, True)
+
+    asyncio.run(scenario())
+
+
+def test_async_call_cancelled_once_every_waiter_left() -> None:
+    async def scenario() -> None:
+        group: AsyncSingleFlight[int] = AsyncSingleFlight()
+        cancelled = asyncio.Event()
+
+        async def compute() -> int:
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return 42
+
+        waiters = [asyncio.create_task(group.do("stack", compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        assert group.in_flight() == 0
+
+    asyncio.run(scenario())
+
+
+def test_async_timeout_bounds_shared_call() -> None:
+    async def scenario() -> None:
+        group: AsyncSingleFlight[int] = AsyncSingleFlight()
+
+        async def slow() -> int:
+            await asyncio.sleep(5)
+            return 42
+
+        results = await asyncio.gather(
+            *(group.do("stack", slow, timeout=0.02) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+
+    asyncio.run(scenario())
+
+
+def test_async_leader_deadline_does_not_bound_followers() -> None:
+    async def scenario() -> None:
+        group: AsyncSingleFlight[int] = AsyncSingleFlight()
+        budgets: List[object] = []
+
+        async def compute() -> int:
+            budgets.append(remaining())
+            await asyncio.sleep(0.1)
+            return 42
+
+        async def leader() -> Tuple[int, bool]:
+            with deadline_scope(0.02):
+                return await group.do("stack", compute)
+
+        async def follower() -> Tuple[int, bool]:
+            with deadline_scope(10):
+                return await group.do("stack", compute)
+
+        first = asyncio.create_task(leader())
+        await asyncio.sleep(0)
+        second = asyncio.create_task(follower())
+        with pytest.raises(DeadlineExceeded):
+            await first
+        assert await second == (42, True)
+        assert budgets == [None]
+
+    asyncio.run(scenario())
@@ -0,0 +1,58 @@
+"""Tests for :class:`src.ai.streaming.IncrementalReportParser`."""
+
+from __future__ import annotations
+
+import json
+from typing import List
+
+from src.ai.streaming import IncrementalReportParser, StreamEvent
+
+CONFLICT = {
+    "supplements": ["Iron", "Calcium"],
+    "mechanism": "Calcium competes with iron for absorption.",
+    "severity": "moderate",
+    "management_strategy": "temporal_separation",
+    "management_instruction": "Take them two hours apart.",
+}
+
+
+def _feed(text: str, chunk: int = 7) -> List[StreamEvent]:
+    parser = IncrementalReportParser()
+    events: List[StreamEvent] = []
+    for start in range(0, len(text), chunk):
+        events.extend(parser.feed(text[start : start + chunk]))
+    assert parser.complete
+    return events
+
+
+def test_items_and_summary_surface_as_they_close() -> None:
+    document = json.dumps(
+        {"analysis_summary": "One conflict.", "interactions": {"conflicts": [CONFLICT], "synergies": []}}
+    )
+    events = _feed("Here is the report:\n```json\n" + document + "\n```")
+    assert [event.event for event in events] == ["summary", "conflict"]
+    assert events[0].data == {"analysis_summary": "One conflict."}
+    assert events[1].data["supplements"] == ["Iron", "Calcium"]
+
+
+def test_raw_control_characters_in_strings_do_not_abort_the_stream() -> None:
+    document = '{"analysis_summary": "line one\nline\ttwo", "interactions": {"conflicts": [%s]}}' % json.dumps(
+        CONFLICT
+    )
+    events = _feed(document)
+    assert events[0].data == {"analysis_summary": "line one\nline\ttwo"}
+    assert [event.event for event in events] == ["summary", "conflict"]
+
+
+def test_raw_control_characters_in_keys_are_decoded() -> None:
+    parser = IncrementalReportParser()
+    events = parser.feed('{"x\ny": 1, "analysis_summary": "ok"}')
+    assert parser.complete
+    assert [event.data for event in events] == [{"analysis_summary": "ok"}]
+
+
+def test_invalid_items_are_skipped() -> None:
+    invalid = {**CONFLICT, "supplements": ["Iron"]}
+    document = json.dumps({"interactions": {"conflicts": [invalid, CONFLICT]}})
+    events = _feed(document)
+    assert [event.event for event in events] == ["conflict"]
@@ -0,0 +1,77 @@
+"""Tests for incremental stack updates and the report cache in :mod:`src.ai.analysis`."""
+
+from __future__ import annotations
+
+from typing import Callable
+
+import pytest
+
+from src.ai import analysis, pairwise
+from src.ai.cache import MemoryReportCache, build_cache_key, build_update_key
+from src.ai.client import LLMClient
+from src.ai.config import LLMSettings
+from src.models import StackUpdateRequest, SupplementInteractionRequest, SupplementInteractionResponse
+
+STACK = ["Zinc", "Copper", "Magnesium"]
+NEW_STACK = ["Zinc", "Copper"]
+
+
+def _forged_report() -> SupplementInteractionResponse:
+    return SupplementInteractionResponse.model_validate(
+        {
+            "analysis_summary": "forged",
+            "interactions": {
+                "conflicts": [
+                    {
+                        "supplements": ["Zinc", "Copper"],
+                        "mechanism": "Made up by the client.",
+                        "evidence_level": "high",
+                        "severity": "high",
+                        "management_strategy": "discontinuation",
+                        "management_instruction": "Never take together.",
+                    }
+                ]
+            },
+        }
+    )
+
+
+@pytest.fixture
+def cache(monkeypatch: pytest.MonkeyPatch) -> MemoryReportCache:
+    cache = MemoryReportCache(max_entries=16, ttl_seconds=60)
+    for module in (analysis, pairwise):
+        monkeypatch.setattr(module, "get_report_cache", lambda: cache)
+        monkeypatch.setattr(module, "get_knowledge_base", lambda: None)
+    monkeypatch.setattr(analysis, "get_precomputed_store", lambda: None)
+    return cache
+
+
+def test_client_supplied_previous_is_not_cached(
+    cache: MemoryReportCache, make_settings: Callable[..., LLMSettings]
+) -> None:
+    client = LLMClient(make_settings())
+    update = StackUpdateRequest(supplements=STACK, removed=["Magnesium"], previous=_forged_report())
+
+    report = analysis.update_interaction_report(update, client=client)
+
+    assert report.interactions.conflicts
+    assert report.meta["cache"]["stored"] is False
+    request = SupplementInteractionRequest(supplements=NEW_STACK)
+    assert cache.get(build_cache_key(request, client.settings)) is None
+    assert cache.get(build_update_key(request, client.settings)) is None
+
+
+def test_update_from_previous_key_is_cached_under_its_own_key(
+    cache: MemoryReportCache, make_settings: Callable[..., LLMSettings]
+) -> None:
+    client = LLMClient(make_settings())
+    previous_key = build_cache_key(SupplementInteractionRequest(supplements=STACK), client.settings)
+    cache.set(previous_key, _forged_report().model_dump_json())
+    update = StackUpdateRequest(supplements=STACK, removed=["Magnesium"], previous_key=previous_key)
+
+    report = analysis.update_interaction_report(update, client=client)
+
+    request = SupplementInteractionRequest(supplements=NEW_STACK)
+    assert report.meta["cache"]["key"] == build_update_key(request, client.settings)
+    assert cache.get(build_update_key(request, client.settings)) is not None
+    assert cache.get(build_cache_key(request, client.settings)) is None